@@ -0,0 +1,91 @@
+"""
+Benchmark of the git backends of boardlessify on a synthetic repository: wall time of each operation of
+a boardlessify run (open, branch and checkout, status, staging, commit) per backend.
+
+    python3 benchmarks/bench_backends.py --files 100000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_staging import create_repo, git  # noqa: E402
+from git_backend import BACKENDS, open_backend  # noqa: E402
+
+STEPS = ("open", "branch", "status", "stage", "commit")
+
+
+def run_backend(repo_dir, backend_name):
+    """
+    Function to run the operations of boardlessify with one backend. Returns {step: seconds}.
+    """
+    times = {}
+    start = time.perf_counter()
+    # The first open of GitPython includes importing it, as it does in boardlessify
+    backend = open_backend(backend_name, repo_dir)
+    times["open"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    backend.create_branch(f"bench-{backend_name}")
+    backend.checkout(f"bench-{backend_name}")
+    times["branch"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    plan = backend.status()
+    times["status"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with backend.transaction() as transaction:
+        transaction.add(plan.untracked)
+        transaction.remove(plan.deleted)
+        transaction.add(plan.modified)
+    times["stage"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    backend.commit("bench")
+    times["commit"] = time.perf_counter() - start
+    return times
+
+
+def run(files, changes, backends=tuple(BACKENDS)):
+    """
+    Function to time each backend on the same changes. Returns {backend: {step: seconds}}.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as repo_dir:
+        create_repo(repo_dir, files, changes)
+        branch = git(repo_dir, "symbolic-ref", "HEAD").strip()
+        base = git(repo_dir, "rev-parse", "HEAD").strip()
+        for name in backends:
+            # Back on the base commit with an index matching it, the working tree changes stay
+            git(repo_dir, "symbolic-ref", "HEAD", branch)
+            git(repo_dir, "reset", "-q", base)
+            results[name] = run_backend(repo_dir, name)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=100000, help="index entries")
+    parser.add_argument(
+        "--changes", type=int, default=100, help="files of each kind of change"
+    )
+    parser.add_argument("--backend", action="append", choices=sorted(BACKENDS))
+    args = parser.parse_args()
+
+    results = run(args.files, args.changes, args.backend or tuple(BACKENDS))
+    print(f"{'backend':<12}" + "".join(f"{step:>10}" for step in STEPS + ("total",)))
+    for name, times in results.items():
+        print(
+            f"{name:<12}"
+            + "".join(f"{times[step]:>9.2f}s" for step in STEPS)
+            + f"{sum(times.values()):>9.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark of the orphaned component search on a generated SDK-scale catalog: boards requiring their
+drivers, drivers and services requiring lower level ones through features, and a project keeping some of
+them.
+
+    python3 benchmarks/bench_graph.py --components 20000
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from component_graph import find_orphaned_components  # noqa: E402
+from sdk_catalog import SdkCatalog  # noqa: E402
+
+
+def generate_catalog(components, requires=4, seed=0):
+    """
+    Function to build a catalog of the given number of components, a tenth of them boards. Each
+    component requires up to 'requires' features provided by components of lower rank, some features
+    having several providers. Returns the catalog and the board ids.
+    """
+    generator = random.Random(seed)
+    entries = {}
+    boards = set()
+    for index in range(components):
+        if index % 10 == 9:
+            component_id = f"brd{4000 + index}"
+            boards.add(component_id)
+        else:
+            component_id = f"component_{index}"
+        requires_list = [
+            [f"feature_{generator.randrange(index)}", []]
+            for _ in range(min(index, generator.randrange(requires + 1)))
+        ]
+        entries[f"{component_id}.slcc"] = {
+            "component": {
+                "id": component_id,
+                "category": "Platform|Board|" if component_id in boards else "",
+                "root_path": "",
+                "provides": [f"feature_{index}", f"feature_{index // 2}_shared"],
+                "requires": requires_list,
+                "board": component_id in boards,
+            }
+        }
+    return SdkCatalog("bench_sdk", "0", entries), sorted(boards)
+
+
+def run(components, kept=200, seed=0):
+    """
+    Function to time the orphan search for a project keeping 'kept' components and removing as many
+    boards. Returns the graph size (nodes, edges), the seconds taken to index the features of the catalog
+    and to search, and the number of orphans.
+    """
+    catalog, boards = generate_catalog(components, seed=seed)
+    generator = random.Random(seed + 1)
+    others = sorted(set(catalog.components) - set(boards))
+    kept_ids = generator.sample(others, min(kept, len(others)))
+    removed_ids = generator.sample(boards, min(kept, len(boards)))
+
+    # As timeit does, the collector would otherwise scan the whole catalog at random points
+    gc.disable()
+    try:
+        # Built once per catalog on first use, shared by every search
+        start = time.perf_counter()
+        catalog.providers("")
+        index_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        orphans = find_orphaned_components(catalog, kept_ids, removed_ids)
+        seconds = time.perf_counter() - start
+    finally:
+        gc.enable()
+
+    edges = sum(
+        len(catalog.providers(feature))
+        for component in catalog.components.values()
+        for feature, _ in component["requires"]
+    )
+    return (len(catalog.components), edges), (index_seconds, seconds), len(orphans)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--components", type=int, nargs="+", default=[1000, 10000, 20000]
+    )
+    parser.add_argument(
+        "--kept", type=int, default=200, help="components the project keeps and removes"
+    )
+    args = parser.parse_args()
+
+    for components in args.components:
+        (nodes, edges), (index_seconds, seconds), orphans = run(components, args.kept)
+        print(
+            f"{nodes} components, {edges} edges: index {index_seconds * 1000:.1f} ms, "
+            f"search {seconds * 1000:.1f} ms, "
+            f"{orphans} orphans"
+        )
+
+
+if __name__ == "__main__":
+    main()
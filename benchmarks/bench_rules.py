@@ -0,0 +1,136 @@
+"""
+Benchmark of the component removal rules: compile time of 10k rules into one pattern, and matching time
+of 5k component ids against it, compared with trying each rule in turn.
+
+    python3 benchmarks/bench_rules.py --rules 10000 --components 5000
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from component_rules import ComponentRules  # noqa: E402
+
+PART_FAMILIES = ("EFR32MG", "EFR32BG", "EFR32FG", "EFR32ZG", "BGM", "MGM", "SiWG917")
+
+
+def generate_rules(count, seed=0):
+    """
+    Function to generate a rules dictionary of about count rules: part number prefixes mostly, exact ids,
+    a few regexes, and keep exclusions.
+    """
+    generator = random.Random(seed)
+    prefixes = {"brd"}
+    exact = set()
+    while len(prefixes) + len(exact) < count * 0.98:
+        family = generator.choice(PART_FAMILIES)
+        part = f"{family}{generator.randrange(10, 100)}{generator.choice('ABCP')}{generator.randrange(10000)}"
+        (prefixes if generator.random() < 0.7 else exact).add(part)
+    regexes = [
+        rf"board_{index}_(?:radio|sensor)_\d+"
+        for index in range(count - len(prefixes) - len(exact))
+    ]
+    return {
+        "remove": {
+            "prefixes": sorted(prefixes),
+            "exact": sorted(exact),
+            "regexes": regexes,
+        },
+        "keep": {"prefixes": ["brd_keep"], "exact": [], "regexes": []},
+    }
+
+
+def generate_components(count, seed=1):
+    """
+    Function to generate component ids, a mix of board parts, instance-qualified ids and SDK components.
+    """
+    generator = random.Random(seed)
+    ids = []
+    for index in range(count):
+        kind = index % 4
+        if kind == 0:
+            family = generator.choice(PART_FAMILIES)
+            ids.append(
+                f"{family}{generator.randrange(10, 100)}A{generator.randrange(10000)}F1024"
+            )
+        elif kind == 1:
+            ids.append(f"brd{generator.randrange(4000, 5000)}a")
+        elif kind == 2:
+            ids.append(f"simple_button_inst{index}")
+        else:
+            ids.append(f"sl_component_{index}")
+    return ids
+
+
+def naive_matches(rules, id_value):
+    """
+    Function to try every rule in turn, the reference the compiled pattern is compared with.
+    """
+    remove = rules["remove"]
+    keep = rules["keep"]
+    if any(id_value.startswith(prefix) for prefix in keep["prefixes"]):
+        return False
+    return (
+        any(id_value.startswith(prefix) for prefix in remove["prefixes"])
+        or id_value in remove["exact"]
+        or any(re.match(regex, id_value) for regex in remove["regexes"])
+    )
+
+
+def run(rule_count, component_count, naive=True):
+    """
+    Function to time compiling the rules and matching the components. Returns the compile seconds,
+    the compiled and naive matching seconds (None when skipped), and the number of matches.
+    """
+    rules = generate_rules(rule_count)
+    ids = generate_components(component_count)
+
+    start = time.perf_counter()
+    compiled = ComponentRules(rules, source="bench")
+    compile_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matches = [compiled.matches(id_value) for id_value in ids]
+    match_seconds = time.perf_counter() - start
+
+    naive_seconds = None
+    if naive:
+        start = time.perf_counter()
+        expected = [naive_matches(rules, id_value) for id_value in ids]
+        naive_seconds = time.perf_counter() - start
+        if expected != matches:
+            raise AssertionError("the compiled rules disagree with the naive ones")
+    return compile_seconds, match_seconds, naive_seconds, sum(matches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rules", type=int, default=10000)
+    parser.add_argument("--components", type=int, default=5000)
+    parser.add_argument(
+        "--no-naive", action="store_true", help="skip the rule by rule reference"
+    )
+    args = parser.parse_args()
+
+    compile_seconds, match_seconds, naive_seconds, matched = run(
+        args.rules, args.components, not args.no_naive
+    )
+    print(f"{args.rules} rules compiled in {compile_seconds * 1000:.1f} ms")
+    print(
+        f"{args.components} components matched in {match_seconds * 1000:.1f} ms "
+        f"({matched} removed)"
+    )
+    if naive_seconds is not None:
+        print(
+            f"Rule by rule: {naive_seconds * 1000:.1f} ms, "
+            f"{naive_seconds / match_seconds:.0f}x slower"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Benchmark of the target selection on a generated repository of 10k commits: projects, each with a few
+targets, a shared directory the projects build from, and commits changing their files. Targets are last
+good at various depths of history, the selection diffs each base with HEAD.
+
+    python3 benchmarks/bench_selector.py --commits 10000
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from target_matrix import target_key  # noqa: E402
+from target_selector import LastGoodState, select_targets  # noqa: E402
+
+TARGETS = ("EFR32MG24B310F1536IM48", "EFR32BG22C224F512IM40", "EFR32MG21A020F1024IM32")
+
+
+def slcp_text(name):
+    return (
+        f"project_name: {name}\n"
+        "sdk: {id: simplicity_sdk, version: 2024.6.2}\n"
+        "source:\n- {path: src/app.c}\n- {path: ../common/shared.c}\n"
+        "include:\n- path: inc\n"
+    )
+
+
+def create_repo(repo_dir, commits, projects, seed=0):
+    """
+    Function to write the history with git fast-import, every commit changing one file of a project, of
+    a target directory of a project, of the shared directory or of the documentation.
+    Returns the commit marks, oldest first.
+    """
+    generator = random.Random(seed)
+    subprocess.run(["git", "init", "-q", "-b", "main", repo_dir], check=True)
+    lines = []
+
+    def blob(path, content):
+        data = content.encode()
+        lines.append(f"M 100644 inline {path}\ndata {len(data)}\n".encode() + data)
+
+    marks = []
+    for index in range(commits):
+        lines.append(
+            f"commit refs/heads/main\nmark :{index + 1}\n"
+            f"committer bench <bench@example.com> {1700000000 + index} +0000\n"
+            f"data 8\ncommit {index % 10}".encode()
+        )
+        if index:
+            lines.append(f"from :{index}".encode())
+        if index == 0:
+            for project in range(projects):
+                name = f"project{project}"
+                blob(f"{name}/{name}.slcp", slcp_text(name))
+                blob(f"{name}/src/app.c", "int main(void) { return 0; }\n")
+                for target in TARGETS:
+                    blob(f"{name}/{target.lower()}/board.h", "#define BOARD 1\n")
+            blob("common/shared.c", "int shared;\n")
+            blob("README.md", "bench\n")
+        else:
+            project = f"project{generator.randrange(projects)}"
+            kind = generator.random()
+            if kind < 0.6:
+                path = f"{project}/src/file{generator.randrange(50)}.c"
+            elif kind < 0.9:
+                target = generator.choice(TARGETS).lower()
+                path = f"{project}/{target}/board.h"
+            elif kind < 0.98:
+                path = "README.md"
+            else:
+                path = "common/shared.c"
+            blob(path, f"// {index}\n")
+        marks.append(f":{index + 1}")
+    subprocess.run(
+        ["git", "fast-import", "--quiet", "--export-marks=marks"],
+        cwd=repo_dir,
+        input=b"\n".join(lines) + b"\n",
+        check=True,
+    )
+    subprocess.run(["git", "checkout", "-q", "main"], cwd=repo_dir, check=True)
+    with open(os.path.join(repo_dir, "marks")) as file:
+        commits_by_mark = dict(line.split() for line in file)
+    os.unlink(os.path.join(repo_dir, "marks"))
+    return [commits_by_mark[mark] for mark in marks]
+
+
+def make_matrix(projects):
+    targets = [
+        {
+            "slcp": f"project{project}/project{project}.slcp",
+            "target_opn": target,
+            "configs": "",
+        }
+        for project in range(projects)
+        for target in TARGETS
+    ]
+    return {"include": [{"shard": "bench", "targets": targets}]}
+
+
+def run(commits, projects, depths=(1, 10, 100, 1000), seed=0):
+    """
+    Function to time the selection with the targets last good 'depth' commits before HEAD, for each depth.
+    Returns {depth: (seconds, selected targets, total targets)}.
+    """
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as repo_dir:
+        history = create_repo(repo_dir, commits, projects, seed)
+        matrix = make_matrix(projects)
+        # The matrix paths are relative to the repository, as in CI
+        os.chdir(repo_dir)
+        try:
+            for depth in depths:
+                state = LastGoodState(os.path.join(repo_dir, ".state.json"))
+                base = history[max(0, len(history) - 1 - depth)]
+                state.mark_good(
+                    [
+                        target_key(target["slcp"], target["target_opn"])
+                        for target in matrix["include"][0]["targets"]
+                    ],
+                    base,
+                )
+                start = time.perf_counter()
+                _, selected = select_targets(repo_dir, matrix, state)
+                results[depth] = (
+                    time.perf_counter() - start,
+                    len(selected),
+                    len(matrix["include"][0]["targets"]),
+                )
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--commits", type=int, default=10000)
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument(
+        "--depth",
+        type=int,
+        nargs="+",
+        default=[1, 10, 100, 1000],
+        help="commits between the last good one and HEAD",
+    )
+    args = parser.parse_args()
+
+    for depth, (seconds, selected, total) in run(
+        args.commits, args.projects, args.depth
+    ).items():
+        print(
+            f"last good {depth} commits ago: {selected}/{total} targets selected "
+            f"in {seconds * 1000:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
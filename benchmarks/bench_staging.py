@@ -0,0 +1,134 @@
+"""
+Benchmark of the staging step of boardlessify on a synthetic repository: index writes and wall time of
+the single update-index transaction against one GitPython index call per kind of change.
+
+    python3 benchmarks/bench_staging.py --files 100000
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from git_backend import IndexTransaction, get_status_plan  # noqa: E402
+
+
+def git(repo_dir, *args):
+    return subprocess.run(
+        ["git", *args], cwd=repo_dir, check=True, stdout=subprocess.PIPE
+    ).stdout.decode()
+
+
+def create_repo(repo_dir, files, changes):
+    """
+    Function to commit a repository of the given number of files, 1000 per directory, then modify,
+    delete and add the given number of files each.
+    """
+    git(repo_dir, "init", "-q")
+    for index in range(files):
+        directory = os.path.join(repo_dir, f"d{index // 1000}")
+        if index % 1000 == 0:
+            os.makedirs(directory)
+        with open(os.path.join(directory, f"f{index}.c"), "w") as file:
+            file.write(f"int f{index};\n")
+    git(repo_dir, "config", "user.name", "bench")
+    git(repo_dir, "config", "user.email", "bench@example.com")
+    git(repo_dir, "add", "-A")
+    git(repo_dir, "commit", "-q", "-m", "base")
+    for index in range(changes):
+        path = os.path.join(repo_dir, f"d{index // 1000}", f"f{index}.c")
+        with open(path, "a") as file:
+            file.write("// changed\n")
+        os.unlink(
+            os.path.join(
+                repo_dir, f"d{(files - 1 - index) // 1000}", f"f{files - 1 - index}.c"
+            )
+        )
+        with open(os.path.join(repo_dir, f"new{index}.c"), "w") as file:
+            file.write("new\n")
+
+
+class IndexWatcher:
+    """
+    Counts the rewrites of .git/index: git writes a new file and renames it over the old one.
+    """
+
+    def __init__(self, repo_dir):
+        self.path = os.path.join(repo_dir, ".git", "index")
+        self.writes = 0
+        self._inode = os.stat(self.path).st_ino
+
+    def check(self):
+        inode = os.stat(self.path).st_ino
+        if inode != self._inode:
+            self.writes += 1
+            self._inode = inode
+
+
+def stage_with_transaction(repo_dir, plan, watcher):
+    with IndexTransaction(repo_dir) as transaction:
+        transaction.add(plan.untracked)
+        transaction.remove(plan.deleted)
+        transaction.add(plan.modified)
+    watcher.check()
+
+
+def stage_with_gitpython(repo_dir, plan, watcher):
+    from git import Repo
+
+    index = Repo(repo_dir).index
+    for paths, operation in (
+        (plan.untracked, index.add),
+        (plan.deleted, index.remove),
+        (plan.modified, index.add),
+    ):
+        if paths:
+            operation(paths)
+            watcher.check()
+
+
+STRATEGIES = {
+    "transaction": stage_with_transaction,
+    "gitpython": stage_with_gitpython,
+}
+
+
+def run(files, changes, strategies=tuple(STRATEGIES)):
+    """
+    Function to time each strategy on the same changes. Returns {strategy: (seconds, index writes)}.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as repo_dir:
+        create_repo(repo_dir, files, changes)
+        for name in strategies:
+            # Back to an index matching HEAD, the working tree changes stay
+            git(repo_dir, "reset", "-q")
+            plan = get_status_plan(repo_dir)
+            watcher = IndexWatcher(repo_dir)
+            start = time.perf_counter()
+            STRATEGIES[name](repo_dir, plan, watcher)
+            results[name] = (time.perf_counter() - start, watcher.writes)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=100000, help="index entries")
+    parser.add_argument(
+        "--changes", type=int, default=100, help="files of each kind of change"
+    )
+    parser.add_argument("--strategy", action="append", choices=sorted(STRATEGIES))
+    args = parser.parse_args()
+
+    for name, (seconds, writes) in run(
+        args.files, args.changes, args.strategy or tuple(STRATEGIES)
+    ).items():
+        print(f"{name}: {seconds:.2f}s, {writes} index writes")
+
+
+if __name__ == "__main__":
+    main()
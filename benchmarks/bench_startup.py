@@ -0,0 +1,103 @@
+"""
+Startup benchmark of boardlessify: runs it with -X importtime and checks the fast paths against a budget,
+wall time and the import time of the modules the script itself imports (site excluded), and that they
+do not import heavy modules.
+
+    python3 benchmarks/bench_startup.py --budget-ms 50
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+SCRIPT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "boardlessify.py"
+)
+# Modules the fast paths must not import, directly or not
+HEAVY_MODULES = {
+    ("--version",): ("yaml", "git", "re", "shutil", "argparse"),
+    ("--check",): ("yaml", "git", "re", "shutil", "importlib.util"),
+}
+
+
+def parse_importtime(stderr):
+    """
+    Function to read the -X importtime report as {top-level module: cumulative microseconds}, leaving out
+    site and what it imports.
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        # Nested imports are indented under the module importing them, and reported first
+        if name.startswith("  "):
+            continue
+        modules[name.strip()] = int(cumulative)
+    modules.pop("site", None)
+    return modules
+
+
+def measure(args, runs=5):
+    """
+    Function to run boardlessify with args. Returns the best wall time in seconds, the import report of
+    that run, and the modules the run imported.
+    """
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", SCRIPT, *args],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        seconds = time.perf_counter() - start
+        if best is None or seconds < best[0]:
+            best = (seconds, result.stderr)
+    imported = {
+        line.rpartition("|")[2].strip()
+        for line in best[1].splitlines()
+        if line.startswith("import time:")
+    }
+    return best[0], parse_importtime(best[1]), imported
+
+
+def check(budget_ms, runs=5):
+    """
+    Function to measure every fast path. Returns (args, wall ms, import ms, problems) per path.
+    """
+    results = []
+    for args, heavy in HEAVY_MODULES.items():
+        seconds, modules, imported = measure(args, runs)
+        wall_ms = seconds * 1000
+        import_ms = sum(modules.values()) / 1000
+        problems = [f"imports {name}" for name in heavy if name in imported]
+        if wall_ms > budget_ms:
+            problems.append(f"{wall_ms:.1f} ms over the {budget_ms} ms budget")
+        results.append((args, wall_ms, import_ms, problems))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--budget-ms", type=float, default=50, help="wall time budget of a fast path"
+    )
+    parser.add_argument("--runs", type=int, default=5, help="best of this many runs")
+    args = parser.parse_args()
+
+    failed = False
+    for path_args, wall_ms, import_ms, problems in check(args.budget_ms, args.runs):
+        print(
+            f"boardlessify.py {' '.join(path_args)}: {wall_ms:.1f} ms, "
+            f"{import_ms:.1f} ms importing" + "".join(f", {p}" for p in problems)
+        )
+        failed = failed or bool(problems)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark of the YAML implementations on generated .slcp files: load and dump time with the libyaml
+CSafeLoader/CSafeDumper against the pure Python SafeLoader/SafeDumper, from 10 to 5000 components.
+
+    python3 benchmarks/bench_yaml.py --components 10 100 1000 5000
+"""
+
+import argparse
+import time
+
+
+def generate_slcp(components):
+    """
+    Function to write the text of a .slcp file with the given number of components, a quarter of them
+    instance-qualified, plus the other sections of a typical project.
+    """
+    lines = [
+        "project_name: bench",
+        "label: bench",
+        "description: |",
+        "  Generated project for the YAML benchmark.",
+        "category: Example|Platform",
+        "quality: production",
+        "sdk: {id: simplicity_sdk, version: 2024.6.2}",
+        "source:",
+        "- {path: app.c}",
+        "- {path: main.c}",
+        "include:",
+        "- path: .",
+        "  file_list:",
+        "  - {path: app.h}",
+        "component:",
+    ]
+    for index in range(components):
+        if index % 4 == 0:
+            lines.append(f"- instance: [inst{index}]")
+            lines.append(f"  id: component_{index}")
+        else:
+            lines.append(f"- {{id: component_{index}}}")
+    lines += [
+        "configuration:",
+        "- {name: SL_STACK_SIZE, value: '2752'}",
+        "define:",
+        "- {name: DEBUG_EFM}",
+        "ui_hints:",
+        "  highlight:",
+        "  - {path: readme.md, focus: true}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def yaml_implementations():
+    """
+    Function to list the (loader, dumper) pairs available, by name.
+    """
+    import yaml
+
+    implementations = {"pure Python": (yaml.SafeLoader, yaml.SafeDumper)}
+    try:
+        from yaml import CSafeDumper, CSafeLoader
+
+        implementations["libyaml"] = (CSafeLoader, CSafeDumper)
+    except ImportError:
+        pass
+    return implementations
+
+
+def time_round_trip(text, loader, dumper, repeat=3):
+    """
+    Function to time loading text and dumping it back. Returns the best (load, dump) seconds.
+    """
+    import yaml
+
+    best_load = best_dump = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = yaml.load(text, Loader=loader)
+        middle = time.perf_counter()
+        yaml.dump(data, Dumper=dumper, sort_keys=False)
+        end = time.perf_counter()
+        if best_load is None or middle - start < best_load:
+            best_load = middle - start
+        if best_dump is None or end - middle < best_dump:
+            best_dump = end - middle
+    return best_load, best_dump
+
+
+def run(component_counts, repeat=3):
+    """
+    Function to time every implementation on every project size.
+    Returns {components: {implementation: (load seconds, dump seconds)}}.
+    """
+    implementations = yaml_implementations()
+    results = {}
+    for components in component_counts:
+        text = generate_slcp(components)
+        results[components] = {
+            name: time_round_trip(text, loader, dumper, repeat)
+            for name, (loader, dumper) in implementations.items()
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--components", type=int, nargs="+", default=[10, 100, 1000, 5000]
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="best of this many runs")
+    args = parser.parse_args()
+
+    for components, timings in run(args.components, args.repeat).items():
+        line = f"{components:>6} components:"
+        for name, (load, dump) in timings.items():
+            line += f"  {name} load {load * 1000:.1f} ms, dump {dump * 1000:.1f} ms;"
+        if "libyaml" in timings:
+            pure = sum(timings["pure Python"])
+            line += f"  libyaml {pure / sum(timings['libyaml']):.1f}x faster"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,41 @@
 import os
-import shutil
-import yaml
-from git import Repo, GitCommandError
+import sys
+
+# yaml_io and git_backend (and GitPython behind it) are imported on first use only, so
+# that --version and --check start fast; so is shutil, which pulls in fnmatch and re
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Files and directory copied from 'si_gh_actions/' to the root of the project
+FILES_TO_COPY = [
+    "CHANGELOG.md",
+    "VERSION.md",
+    ".gitignore",
+    "target_info.yaml",
+    "component_rules.yaml",
+]
+DIR_TO_COPY = ".github"
+
+# Directories skipped when .slcp files have to be searched without git
+PRUNED_DIRS = {".git", "node_modules", "__pycache__", "dependencies", "tools"}
+
+# Loaded on first use from component_rules.yaml, see get_component_rules
+_component_rules = None
+# SDK whose component catalog decides what is board specific, see configure_cleanup
+_sdk_dir = None
+_sdk_catalog = None
+# Whether components only required by board components are removed as well
+_prune_orphans = False
 
 
 def copy_files_to_root():
     """
     Function to copy files and directories from 'si_gh_actions/' to the root of the current working directory.
     """
-    files_to_copy = [
-        "si_gh_actions/CHANGELOG.md",
-        "si_gh_actions/VERSION.md",
-        "si_gh_actions/.gitignore",
-        "si_gh_actions/target_info.yaml",
-    ]
-    dir_to_copy = "si_gh_actions/.github/"
+    import shutil
+
+    files_to_copy = [f"si_gh_actions/{file_name}" for file_name in FILES_TO_COPY]
+    dir_to_copy = f"si_gh_actions/{DIR_TO_COPY}/"
 
     # Copy individual files
     for file_path in files_to_copy:
@@ -40,127 +61,494 @@ def copy_files_to_root():
         print(f"Error copying directory {dir_to_copy}: {e}")
 
 
-def stage_and_commit(repo, commit_message):
+def stage_and_commit(backend, commit_message):
     """
     Function to stage untracked and modified files, handle deleted files, and create a commit.
     This function respects .gitignore.
     """
-    # List untracked files, excluding ignored files based on .gitignore
-    untracked_files = repo.git.ls_files("--others", "--exclude-standard").splitlines()
-    if untracked_files:
-        print("Staging untracked files (excluding ignored files):")
-        print(untracked_files)
-        repo.index.add(untracked_files)
-
-    # List modified files (added, modified, or deleted)
-    modified_files = [item.a_path for item in repo.index.diff(None)]
-    deleted_files = [
-        item.a_path for item in repo.index.diff(None) if item.change_type == "D"
-    ]
+    from git_backend import iter_batches
 
-    # Remove deleted files from the index
-    if deleted_files:
-        print("Staging deleted files:")
-        print(deleted_files)
-        repo.index.remove(deleted_files)
-
-    # Handle files newly filtered out by .gitignore
-    ignored_files = repo.git.ls_files(
-        "--ignored", "--cached", "--exclude-standard"
-    ).splitlines()
-
-    # Remove deleted files from the index
-    if ignored_files:
-        print("Staging ignored files:")
-        print(ignored_files)
-        repo.index.remove(ignored_files)
-
-    # Stage the remaining modified files
-    remaining_modified_files = [
-        file for file in modified_files if file not in deleted_files
-    ]
-    if remaining_modified_files:
-        print("Staging modified files (excluding ignored files):")
-        print(remaining_modified_files)
-        repo.index.add(remaining_modified_files)
-
-    # Create a commit
-    if untracked_files or modified_files or deleted_files:
-        repo.index.commit(commit_message)
+    plan = backend.status()
+
+    with backend.transaction() as transaction:
+        # Stage untracked files, excluding ignored files based on .gitignore
+        if plan.untracked:
+            print("Staging untracked files (excluding ignored files):")
+            print(plan.untracked)
+            transaction.add(plan.untracked)
+
+        # Handle files newly filtered out by .gitignore, streamed in batches
+        for ignored_files in iter_batches(plan.iter_ignored()):
+            print("Staging ignored files:")
+            print(ignored_files)
+            transaction.remove(ignored_files)
+
+        # Remove deleted files from the index
+        if plan.deleted:
+            print("Staging deleted files:")
+            print(plan.deleted)
+            transaction.remove(plan.deleted)
+
+        # Stage the remaining modified files
+        if plan.modified:
+            print("Staging modified files (excluding ignored files):")
+            print(plan.modified)
+            transaction.add(plan.modified)
+
+    # Create a commit, unless staging left the tree of HEAD unchanged
+    if not plan.is_empty() and backend.commit(commit_message):
         print(f"Commit made: {commit_message}")
     else:
         print("No changes to commit.")
 
 
+def get_component_rules():
+    """
+    Function to load the component removal rules once, from the project root (next to target_info.yaml)
+    or from this script's directory.
+    """
+    global _component_rules
+    if _component_rules is None:
+        from component_rules import load_component_rules
+
+        _component_rules = load_component_rules([".", SCRIPT_DIR])
+    return _component_rules
+
+
+def configure_cleanup(sdk_dir, prune_orphans=False):
+    """
+    Function to select the SDK whose .slcc metadata tells which components are board specific,
+    and whether the components only they require are removed too.
+    Also used as process pool initializer, so that workers clean files the same way.
+    """
+    global _sdk_dir, _sdk_catalog, _prune_orphans
+    _prune_orphans = prune_orphans
+    if sdk_dir != _sdk_dir:
+        _sdk_dir = sdk_dir
+        _sdk_catalog = None
+
+
+def get_sdk_catalog():
+    """
+    Function to load the SDK component catalog once, from its on-disk index. None when no SDK is configured.
+    """
+    global _sdk_catalog
+    if _sdk_catalog is None and _sdk_dir is not None:
+        from sdk_catalog import load_catalog
+
+        _sdk_catalog = load_catalog(_sdk_dir)
+    return _sdk_catalog
+
+
+def is_board_component(id_value):
+    """
+    Function to tell whether a component id is board specific, from the SDK catalog when one is configured
+    and knows the component, otherwise from the component rules.
+    """
+    rules = get_component_rules()
+    catalog = get_sdk_catalog()
+    if catalog is not None and not rules.is_kept(id_value):
+        board = catalog.is_board_component(id_value)
+        if board is not None:
+            return board
+    return rules.matches(id_value)
+
+
+def remove_board_components(yaml_data, should_remove=is_board_component):
+    """
+    Function to remove board specific entries from the 'component' list of parsed .slcp data.
+    Returns the ids of the removed components.
+    """
+    removed_ids = []
+    # Step 6b and 6c: Modify the 'component' list by removing entries that have a board specific 'id'
+    if "component" in yaml_data and isinstance(yaml_data["component"], list):
+        updated_component_list = []
+        for item in yaml_data["component"]:
+            # Check if the item is a dictionary with an 'id' key
+            if isinstance(item, dict) and "id" in item:
+                id_value = item["id"]
+                if should_remove(id_value):
+                    removed_ids.append(id_value)
+                    continue
+            # Keep the item if it does not match the removal criteria
+            updated_component_list.append(item)
+
+        # Update the YAML data
+        yaml_data["component"] = updated_component_list
+
+    return removed_ids
+
+
+def remove_slcp_components(slcp_text, should_remove):
+    """
+    Function to remove the components matching should_remove from .slcp file content.
+    Matching entries are deleted in place, so comments, key order and formatting are kept.
+    """
+    from slcp_editor import remove_components
+
+    edited = remove_components(slcp_text, should_remove)
+    if edited is not None:
+        return edited
+
+    # Fall back on a full YAML round trip for layouts the editor does not handle
+    from yaml_io import safe_dump, safe_load
+
+    yaml_data = safe_load(slcp_text)
+    removed_ids = remove_board_components(yaml_data, should_remove)
+    return safe_dump(yaml_data), removed_ids
+
+
+def clean_slcp_text(slcp_text):
+    """
+    Function to return the boardless version of the given .slcp file content, along with the removed
+    board component ids and the ids of the components only required by them.
+    Those are removed as well when orphan pruning is enabled.
+    """
+    project_ids = []
+
+    def should_remove(id_value):
+        project_ids.append(id_value)
+        return is_board_component(id_value)
+
+    cleaned_text, removed_ids = remove_slcp_components(slcp_text, should_remove)
+
+    # Step 6d: Look for the components only pulled in by the removed board components
+    orphan_ids = []
+    catalog = get_sdk_catalog()
+    if catalog is not None and removed_ids:
+        from component_graph import find_orphaned_components
+
+        removed = set(removed_ids)
+        kept_ids = [id_value for id_value in project_ids if id_value not in removed]
+        orphans = find_orphaned_components(catalog, kept_ids, removed)
+        orphan_ids = [id_value for id_value in kept_ids if id_value in orphans]
+        if orphan_ids and _prune_orphans:
+            cleaned_text, _ = remove_slcp_components(cleaned_text, orphans.__contains__)
+
+    return cleaned_text, removed_ids, orphan_ids
+
+
+def print_cleanup_report(removed_ids, orphan_ids):
+    """
+    Function to print the components removed from a .slcp file, and the ones only they required.
+    """
+    for id_value in removed_ids:
+        print(f"Removing component with id: {id_value}")
+    for id_value in orphan_ids:
+        if _prune_orphans:
+            print(f"Removing component only required by board components: {id_value}")
+        else:
+            print(
+                f"Component only required by board components, kept (see --prune-orphans): {id_value}"
+            )
+
+
+def _scan_slcp_files(directory):
+    found = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                # Generated <project>_cmake trees never hold project files
+                if entry.name not in PRUNED_DIRS and not entry.name.endswith("_cmake"):
+                    found.extend(_scan_slcp_files(entry.path))
+            elif entry.name.endswith(".slcp"):
+                found.append(entry.path)
+    return found
+
+
+def find_slcp_files(root="."):
+    """
+    Function to list every .slcp file of the project, from git (respecting .gitignore) when possible,
+    otherwise from a directory walk that skips build outputs and dependencies.
+    """
+    if os.path.exists(os.path.join(root, ".git")):
+        from subprocess import CalledProcessError
+        from git_backend import iter_git_records
+
+        try:
+            slcp_files = set()
+            for record in iter_git_records(
+                root,
+                "ls-files",
+                "-z",
+                "--cached",
+                "--others",
+                "--exclude-standard",
+                "--",
+                "*.slcp",
+                # The directories the scan prunes, wherever they are
+                *(f":(exclude,glob)**/{name}/**" for name in sorted(PRUNED_DIRS)),
+                ":(exclude,glob)**/*_cmake/**",
+            ):
+                slcp_file = os.path.join(root, os.fsdecode(record))
+                # The index can still list files deleted from the working tree
+                if os.path.isfile(slcp_file):
+                    slcp_files.add(slcp_file)
+            return sorted(slcp_files)
+        except (OSError, CalledProcessError) as e:
+            print(f"Error listing .slcp files with git, scanning instead: {e}")
+    return sorted(_scan_slcp_files(root))
+
+
+def clean_slcp_file(slcp_file):
+    """
+    Function to remove the board components from one .slcp file.
+    Returns the file, the removed component ids, the ids only they required and the error message if it failed.
+    """
+    try:
+        with open(slcp_file, "r") as file:
+            slcp_text = file.read()
+        cleaned_text, removed_ids, orphan_ids = clean_slcp_text(slcp_text)
+        # Files without board components are left untouched
+        if removed_ids:
+            with open(slcp_file, "w") as file:
+                file.write(cleaned_text)
+        return slcp_file, removed_ids, orphan_ids, None
+    except Exception as e:
+        return slcp_file, [], [], str(e)
+
+
 def cleanup_yaml_and_files():
     """
-    Function to clean up the 'component' list in .slcp (YAML) files by removing entries where 'id' starts with 'brd' or 'EFR32'.
+    Function to clean up the 'component' list in .slcp (YAML) files by removing entries matching the component rules.
     """
-    # Step 6a: Look for a .slcp file
-    slcp_file = None
-    for root, _, files in os.walk("."):
-        for file in files:
-            if file.endswith(".slcp"):
-                slcp_file = os.path.join(root, file)
-                break
-        if slcp_file:
-            break
+    # Step 6a: Look for every .slcp file
+    slcp_files = find_slcp_files()
+    if not slcp_files:
+        print("No .slcp file found.")
+        return
+
+    # Step 6b and 6c: Clean the files, in parallel when there are several projects
+    if len(slcp_files) == 1:
+        results = [clean_slcp_file(slcp_files[0])]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(
+            initializer=configure_cleanup, initargs=(_sdk_dir, _prune_orphans)
+        ) as pool:
+            results = list(pool.map(clean_slcp_file, slcp_files))
 
-    if slcp_file:
+    for slcp_file, removed_ids, orphan_ids, error in results:
         print(f"Found .slcp file: {slcp_file}")
+        if error:
+            print(f"Error updating {slcp_file}: {error}")
+            continue
+        print_cleanup_report(removed_ids, orphan_ids)
+        if removed_ids:
+            print("Updated .slcp file.")
+        else:
+            print("No board component found, .slcp file left unchanged.")
 
-        # Read the .slcp file
-        with open(slcp_file, "r") as file:
-            yaml_data = yaml.safe_load(file)
 
-        # Step 6b and 6c: Modify the 'component' list by removing entries that have 'id' starting with 'brd' or 'EFR32'
-        if "component" in yaml_data and isinstance(yaml_data["component"], list):
-            updated_component_list = []
-            for item in yaml_data["component"]:
-                # Check if the item is a dictionary with an 'id' key
-                if isinstance(item, dict) and "id" in item:
-                    id_value = item["id"]
-                    if id_value.startswith("brd") or id_value.startswith("EFR32"):
-                        print(f"Removing component with id: {id_value}")
-                        continue
-                # Keep the item if it does not match the removal criteria
-                updated_component_list.append(item)
+def create_boardless_commit_tree_only(backend, branch_name, commit_message):
+    """
+    Function to create the boardless branch from HEAD without checking it out.
+    The commit is built in a temporary index, only the copied files and the cleaned .slcp
+    file are hashed and the working tree is never touched, so this also works on bare repositories.
+    """
+    from git_backend import iter_batches
+
+    # Files copied to the root are read from this script's own checkout
+    source_dir = SCRIPT_DIR
+    source_files = {}
+    for file_name in FILES_TO_COPY:
+        file_path = os.path.join(source_dir, file_name)
+        if os.path.exists(file_path):
+            source_files[file_name] = file_path
+        else:
+            print(f"File not found: {file_path}")
+    for root, _, files in os.walk(os.path.join(source_dir, DIR_TO_COPY)):
+        for file in files:
+            file_path = os.path.join(root, file)
+            index_path = os.path.relpath(file_path, source_dir).replace(os.sep, "/")
+            source_files[index_path] = file_path
+    entries = backend.hash_files(source_files)
+    print(f"Copied {len(entries)} files to root directory.")
+
+    # Clean the committed content of every .slcp file
+    for mode, sha, path in backend.list_tree("HEAD"):
+        if path.endswith(".slcp"):
+            print(f"Found .slcp file: {path}")
+            slcp_text = backend.read_blob(sha).decode()
+            cleaned_text, removed_ids, orphan_ids = clean_slcp_text(slcp_text)
+            print_cleanup_report(removed_ids, orphan_ids)
+            if removed_ids:
+                cleaned_sha = backend.hash_data(cleaned_text.encode(), path)
+                entries.append((mode, cleaned_sha, path))
+                print("Updated .slcp file.")
+
+    head = backend.head_commit()
+    with backend.temporary_index() as index:
+        index.read_tree(head)
+        with index.transaction() as transaction:
+            # Handle files newly filtered out by the copied .gitignore
+            gitignore = source_files.get(".gitignore")
+            if gitignore:
+                for ignored_files in iter_batches(index.iter_ignored(gitignore)):
+                    print("Staging ignored files:")
+                    print(ignored_files)
+                    transaction.remove(ignored_files)
+            transaction.add_entries(entries)
+        tree = index.write_tree()
+
+    commit = backend.commit_tree(tree, head, commit_message)
+    backend.create_branch(branch_name, commit)
+    print(f"Created branch '{branch_name}' at {commit[:7]}: {commit_message}")
+
+
+def read_version():
+    """
+    Function to read the version of si_gh_actions from its VERSION.md file.
+    """
+    try:
+        with open(os.path.join(SCRIPT_DIR, "VERSION.md"), "r") as file:
+            return file.read().strip()
+    except OSError:
+        return "unknown"
+
 
-            # Update the YAML data
-            yaml_data["component"] = updated_component_list
+def _module_found(name):
+    # importlib.util.find_spec for a top-level module, without importing importlib.util
+    return any(
+        hasattr(finder, "find_spec") and finder.find_spec(name, None) is not None
+        for finder in sys.meta_path
+    )
 
-        # Write the updated YAML back to the file
-        with open(slcp_file, "w") as file:
-            yaml.safe_dump(yaml_data, file)
 
-        print("Updated .slcp file.")
+def _program_found(name):
+    # shutil.which, without importing shutil and the modules it imports
+    return any(
+        os.path.isfile(os.path.join(directory, name))
+        and os.access(os.path.join(directory, name), os.X_OK)
+        for directory in os.get_exec_path()
+    )
+
+
+def check_environment():
+    """
+    Function to report whether the tools and modules needed by boardlessify are available, without importing them.
+    """
+    checks = [
+        ("git", _program_found("git"), True),
+        ("pyyaml", _module_found("yaml"), True),
+        ("gitpython", _module_found("git"), False),
+    ]
+    ready = True
+    for name, found, required in checks:
+        state = "found" if found else "missing"
+        print(f"{name}: {state}" + ("" if required else " (optional)"))
+        ready = ready and (found or not required)
+    return ready
 
 
 def main():
+    # Answer the bare --version and --check calls before argparse, which pulls in re
+    if sys.argv[1:] == ["--version"]:
+        print(read_version())
+        return
+    if sys.argv[1:] == ["--check"]:
+        sys.exit(0 if check_environment() else 1)
+
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Commit the current project, then create a boardless 'dev' branch."
+    )
+    parser.add_argument("--version", action="version", version=read_version())
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="only check that git and the required Python modules are available",
+    )
+    parser.add_argument(
+        "--backend",
+        default="cli",
+        help="git implementation to use, cli or gitpython (default: cli)",
+    )
+    parser.add_argument(
+        "--tree-only",
+        action="store_true",
+        help="create the 'dev' commit without checking it out or touching the working tree",
+    )
+    parser.add_argument(
+        "--sdk",
+        metavar="SDK_DIR",
+        help="SDK checkout whose component metadata tells which components are board specific",
+    )
+    parser.add_argument(
+        "--prune-orphans",
+        action="store_true",
+        help="with --sdk, also remove the components only required by the removed board components",
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="print implementation details"
+    )
+    args = parser.parse_args()
+    if args.prune_orphans and not args.sdk:
+        parser.error("--prune-orphans requires --sdk")
+    if args.check:
+        sys.exit(0 if check_environment() else 1)
+    if args.verbose:
+        from yaml_io import yaml_backend_name
+
+        print(f"YAML implementation: {yaml_backend_name()}")
+        print(f"Component rules: {get_component_rules().source}")
+    if args.sdk:
+        # Build or refresh the index before the .slcp files are cleaned
+        configure_cleanup(args.sdk, args.prune_orphans)
+        catalog = get_sdk_catalog()
+        if args.verbose:
+            print(
+                f"SDK catalog: {catalog.sdk_id} {catalog.sdk_version}, "
+                f"{len(catalog.components)} components"
+            )
+
+    from git_backend import BACKENDS, CliGitBackend, GitBackendError, open_backend
+
+    if args.backend not in BACKENDS:
+        parser.error(
+            f"unknown backend {args.backend!r}, choose from {sorted(BACKENDS)}"
+        )
+    if args.tree_only and args.backend != CliGitBackend.name:
+        parser.error("--tree-only requires the cli backend")
+
     try:
         # Initialize the repository
-        repo = Repo(os.getcwd())
-        assert not repo.bare
-    except GitCommandError as e:
+        backend = open_backend(args.backend, os.getcwd())
+        bare = backend.is_bare()
+        assert args.tree_only or not bare
+    except GitBackendError as e:
         print(f"Error accessing the repository: {e}")
         return
 
     # Step 1: Print the current branch name
-    current_branch = repo.active_branch.name
+    current_branch = backend.current_branch()
     print(f"Current branch: {current_branch}")
 
     # Step 2, 3, 4: Stage files and commit with "Initial Boardful commit"
-    stage_and_commit(repo, "Initial Boardful commit")
+    if not bare:
+        stage_and_commit(backend, "Initial Boardful commit")
+
+    if args.tree_only:
+        # Step 5 to 9 without a checkout
+        try:
+            create_boardless_commit_tree_only(
+                backend, "dev", "Initial Boardless commit"
+            )
+        except GitBackendError as e:
+            print(f"Error creating the 'dev' branch: {e}")
+        return
 
     # Extra Step: Copy files and directories to root
     copy_files_to_root()
 
     # Step 5: Create a new local branch named "dev" and check out to it
     try:
-        dev_branch = repo.create_head("dev")
-        dev_branch.checkout()
+        backend.create_branch("dev")
+        backend.checkout("dev")
         print("Created and switched to branch 'dev'.")
-    except GitCommandError as e:
+    except GitBackendError as e:
         print(f"Error creating or checking out the 'dev' branch: {e}")
         return
 
@@ -168,7 +556,7 @@ def main():
     cleanup_yaml_and_files()
 
     # Step 7, 8, 9: Stage files and commit with "Initial Boardless commit"
-    stage_and_commit(repo, "Initial Boardless commit")
+    stage_and_commit(backend, "Initial Boardless commit")
 
 
 if __name__ == "__main__":
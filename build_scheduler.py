@@ -0,0 +1,300 @@
+import argparse
+import heapq
+import os
+import statistics
+import sys
+import time
+
+from cache_utils import atomic_write_json, cache_root, read_json
+from target_matrix import (
+    add_matrix_arguments,
+    flatten_matrix,
+    load_matrix,
+    target_key,
+    write_matrix,
+)
+
+HISTORY_FORMAT = 1
+HISTORY_FILE_NAME = "build_history.json"
+
+# Timed steps of a target build, in order
+STEPS = ("generate", "cmake")
+# Durations kept per target and step, older ones are dropped
+MAX_SAMPLES = 10
+# Estimate of a step never recorded for any target
+DEFAULT_STEP_SECONDS = 60.0
+# Bound on the moves and swaps tried after the greedy assignment
+MAX_IMPROVEMENTS = 1000
+
+
+def default_history_file():
+    return os.path.join(cache_root(), HISTORY_FILE_NAME)
+
+
+class BuildHistory:
+    """
+    Recent 'slc generate' and 'cmake' durations of each target, stored in a small JSON file.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_history_file()
+        data = read_json(self.path, {})
+        if data.get("format") != HISTORY_FORMAT:
+            data = {}
+        self.targets = data.get("targets", {})
+
+    def record(self, key, step, seconds):
+        samples = self.targets.setdefault(key, {}).setdefault(step, [])
+        samples.append(round(seconds, 3))
+        del samples[:-MAX_SAMPLES]
+
+    def save(self):
+        atomic_write_json(
+            self.path, {"format": HISTORY_FORMAT, "targets": self.targets}
+        )
+
+    def step_estimates(self):
+        """
+        Function to return the typical duration of each step over every target, used for targets
+        without history yet.
+        """
+        estimates = {}
+        for step in STEPS:
+            medians = [
+                statistics.median(steps[step])
+                for steps in self.targets.values()
+                if steps.get(step)
+            ]
+            estimates[step] = (
+                statistics.median(medians) if medians else DEFAULT_STEP_SECONDS
+            )
+        return estimates
+
+    def estimate(self, key, defaults=None):
+        """
+        Function to predict the duration of a target build, as the sum of the median duration of each step.
+        """
+        defaults = defaults or self.step_estimates()
+        steps = self.targets.get(key, {})
+        return sum(
+            statistics.median(steps[step]) if steps.get(step) else defaults[step]
+            for step in STEPS
+        )
+
+
+def schedule_lpt(jobs, runner_count):
+    """
+    Function to assign (key, duration) jobs to runners, longest processing time first: each job goes to
+    the least loaded runner. Returns the list of jobs of each runner.
+    """
+    runners = [[] for _ in range(max(1, runner_count))]
+    loads = [(0.0, index) for index in range(len(runners))]
+    for key, duration in sorted(jobs, key=lambda job: (-job[1], job[0])):
+        load, index = heapq.heappop(loads)
+        runners[index].append((key, duration))
+        heapq.heappush(loads, (load + duration, index))
+    return runners
+
+
+def _load(runner):
+    return sum(duration for _, duration in runner)
+
+
+def improve_schedule(runners):
+    """
+    Function to refine an assignment with moves and swaps of jobs off the most loaded runner, as long as
+    they lower its load without making the other runner the new bottleneck.
+    """
+    for _ in range(MAX_IMPROVEMENTS):
+        loads = [_load(runner) for runner in runners]
+        busiest = max(range(len(runners)), key=loads.__getitem__)
+        best = None
+        for other in range(len(runners)):
+            if other == busiest:
+                continue
+            gap = loads[busiest] - loads[other]
+            for i, (_, duration) in enumerate(runners[busiest]):
+                # Moving a job shorter than the gap, or swapping it for a shorter one, balances the pair
+                candidates = [(None, 0.0)] + [
+                    (j, other_duration)
+                    for j, (_, other_duration) in enumerate(runners[other])
+                ]
+                for j, other_duration in candidates:
+                    delta = duration - other_duration
+                    if 0 < delta < gap:
+                        gain = min(delta, gap - delta)
+                        if best is None or gain > best[0]:
+                            best = (gain, other, i, j)
+        if best is None or best[0] < 1e-9:
+            break
+        _, other, i, j = best
+        job = runners[busiest].pop(i)
+        if j is not None:
+            runners[busiest].append(runners[other].pop(j))
+        runners[other].append(job)
+    return runners
+
+
+def schedule(jobs, runner_count):
+    """
+    Function to assign jobs to runners, greedy longest processing time first then refined.
+    Returns the jobs of each runner and the predicted makespan.
+    """
+    runners = improve_schedule(schedule_lpt(jobs, runner_count))
+    runners = [runner for runner in runners if runner]
+    return runners, max((_load(runner) for runner in runners), default=0.0)
+
+
+def schedule_matrix(matrix, history, runner_count):
+    """
+    Function to turn the per-target matrix entries into one matrix entry per runner.
+    """
+    entries = {}
+    for entry in flatten_matrix(matrix)["include"]:
+        entries[target_key(entry["slcp"], entry["target_opn"], entry["configs"])] = (
+            entry
+        )
+    defaults = history.step_estimates()
+    jobs = [(key, history.estimate(key, defaults)) for key in entries]
+    runners, makespan = schedule(jobs, runner_count)
+    include = [
+        {
+            "runner": index,
+            "predicted_seconds": round(_load(runner), 1),
+            "targets": [entries[key] for key, _ in runner],
+        }
+        for index, runner in enumerate(runners)
+    ]
+    return {"include": include}, makespan
+
+
+def simulate(target_count, runner_count, trials, seed=0):
+    """
+    Function to compare the predicted makespan of a naive even split of the targets in file order with the
+    scheduler, on synthetic histories where a fifth of the targets take about four times longer.
+    """
+    import random
+
+    generator = random.Random(seed)
+    totals = {"naive split": 0.0, "lpt": 0.0, "lpt + refine": 0.0, "lower bound": 0.0}
+    for _ in range(trials):
+        jobs = []
+        for index in range(target_count):
+            duration = generator.lognormvariate(5.0, 0.3)
+            if generator.random() < 0.2:
+                duration *= 4
+            jobs.append((f"target{index}", duration))
+
+        chunk = -(-target_count // runner_count)
+        naive = [jobs[start : start + chunk] for start in range(0, len(jobs), chunk)]
+        lpt = schedule_lpt(jobs, runner_count)
+        totals["naive split"] += max(_load(runner) for runner in naive)
+        totals["lpt"] += max(_load(runner) for runner in lpt)
+        totals["lpt + refine"] += schedule(jobs, runner_count)[1]
+        totals["lower bound"] += max(
+            _load(jobs) / runner_count, max(duration for _, duration in jobs)
+        )
+    return {name: total / trials for name, total in totals.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Record target build durations and spread the targets over CI runners."
+    )
+    parser.add_argument("--history", help="history file (default: in the cache)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_target_arguments(subparser):
+        subparser.add_argument("--slcp", required=True, help="project file")
+        subparser.add_argument("--target", required=True, help="target OPN")
+        subparser.add_argument("--configs", default="", help="target configs")
+        subparser.add_argument("--step", required=True, choices=STEPS)
+
+    record_parser = subparsers.add_parser("record", help="record a duration")
+    add_target_arguments(record_parser)
+    record_parser.add_argument("--seconds", type=float, required=True)
+
+    time_parser = subparsers.add_parser(
+        "time", help="run a command and record its duration when it succeeds"
+    )
+    add_target_arguments(time_parser)
+    time_parser.add_argument("run", nargs=argparse.REMAINDER, help="-- command")
+
+    schedule_parser = subparsers.add_parser(
+        "schedule", help="assign the targets of the project to runners"
+    )
+    schedule_parser.add_argument("-n", "--runners", type=int, required=True)
+    schedule_parser.add_argument(
+        "--json", action="store_true", help="print the runner matrix as JSON"
+    )
+    add_matrix_arguments(schedule_parser)
+
+    simulate_parser = subparsers.add_parser(
+        "simulate", help="evaluate the scheduler on synthetic history"
+    )
+    simulate_parser.add_argument("--targets", type=int, default=30)
+    simulate_parser.add_argument("-n", "--runners", type=int, default=4)
+    simulate_parser.add_argument("--trials", type=int, default=200)
+    simulate_parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "simulate":
+        results = simulate(args.targets, args.runners, args.trials, args.seed)
+        print(
+            f"{args.targets} targets on {args.runners} runners, mean predicted makespan over {args.trials} trials:"
+        )
+        for name, makespan in results.items():
+            print(f"  {name}: {makespan:.1f}s")
+        return
+
+    history = BuildHistory(args.history)
+
+    if args.command in ("record", "time"):
+        try:
+            key = target_key(args.slcp, args.target, args.configs)
+        except ValueError as e:
+            print(f"Error parsing configs: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    if args.command == "record":
+        history.record(key, args.step, args.seconds)
+        history.save()
+        return
+
+    if args.command == "time":
+        import subprocess
+
+        command = args.run[1:] if args.run[:1] == ["--"] else args.run
+        if not command:
+            parser.error("time requires a command after --")
+        start = time.monotonic()
+        returncode = subprocess.call(command)
+        seconds = time.monotonic() - start
+        if returncode == 0:
+            history.record(key, args.step, seconds)
+            history.save()
+            print(f"{args.target} {args.step}: {seconds:.1f}s")
+        sys.exit(returncode)
+
+    try:
+        matrix = load_matrix(args.target_info, args.toolchains, args.slcp, args.sdk)
+    except (OSError, ValueError) as e:
+        print(f"Error building the target matrix: {e}", file=sys.stderr)
+        sys.exit(1)
+    runner_matrix, makespan = schedule_matrix(matrix, history, args.runners)
+
+    # The JSON goes to stdout on its own, so the report goes to stderr
+    report = sys.stderr if args.json or args.github_output else sys.stdout
+    for runner in runner_matrix["include"]:
+        targets = ", ".join(target["target_opn"] for target in runner["targets"])
+        print(
+            f"Runner {runner['runner']}: {runner['predicted_seconds']}s, {targets}",
+            file=report,
+        )
+    print(f"Predicted makespan: {makespan:.1f}s", file=report)
+    if args.json or args.github_output:
+        write_matrix(runner_matrix, args.github_output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+# Units of the sizes read by parse_size, powers of 1024
+SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+# FICLONE ioctl, copy-on-write clone of a whole file (btrfs, XFS)
+FICLONE = 0x40049409
+
+
+def cache_root(*parts):
+    """
+    Function to return a directory under the si_gh_actions cache, creating it if needed.
+    SI_GH_ACTIONS_CACHE overrides the default XDG cache location.
+    """
+    root = os.environ.get("SI_GH_ACTIONS_CACHE") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+        "si_gh_actions",
+    )
+    path = os.path.join(root, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def atomic_write_json(path, data):
+    """
+    Function to write data as JSON so that readers only ever see the old or the new file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(handle, "w") as file:
+            json.dump(data, file, separators=(",", ":"))
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def read_json(path, default=None):
+    """
+    Function to read a JSON file, returning default when it is missing or unreadable.
+    """
+    try:
+        with open(path, "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return default
+
+
+@contextmanager
+def file_lock(path, shared=False, blocking=True):
+    """
+    Context manager holding an advisory lock on path, shared between processes and runners of the machine.
+    Yields False instead of waiting when blocking is False and the lock is taken.
+    """
+    import fcntl
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a") as file:
+        operation = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        if not blocking:
+            operation |= fcntl.LOCK_NB
+        try:
+            fcntl.flock(file, operation)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def parse_size(text):
+    """
+    Function to parse sizes such as "500M" or "20G" into bytes.
+    """
+    text = text.strip().upper().rstrip("B")
+    unit = text[-1:] if text[-1:] in SIZE_UNITS else ""
+    return int(float(text[: len(text) - len(unit)]) * SIZE_UNITS[unit])
+
+
+def format_size(size):
+    for unit in ("K", "M", "G", "T"):
+        size /= 1024
+        if size < 1024:
+            break
+    return f"{size:.1f}{unit}B"
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """
+    Function to hash a file by chunks. Returns the hashlib object.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest
+
+
+def tree_digest(root):
+    """
+    Function to hash a directory tree from its paths, modes, symlink targets and file contents.
+    Returns the hex digest and the size in bytes of the tree.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    for directory, dirs, files in os.walk(root):
+        dirs.sort()
+        relative_dir = os.path.relpath(directory, root)
+        for name in sorted(
+            files + [d for d in dirs if os.path.islink(os.path.join(directory, d))]
+        ):
+            path = os.path.join(directory, name)
+            relative = os.path.normpath(os.path.join(relative_dir, name)).replace(
+                os.sep, "/"
+            )
+            info = os.lstat(path)
+            size += info.st_size
+            if os.path.islink(path):
+                digest.update(f"L\0{relative}\0{os.readlink(path)}\n".encode())
+                continue
+            file_digest = file_sha256(path)
+            executable = "x" if info.st_mode & 0o111 else "-"
+            digest.update(
+                f"F\0{relative}\0{executable}\0{file_digest.hexdigest()}\n".encode()
+            )
+    return digest.hexdigest(), size
+
+
+def reflink_or_copy(source, destination):
+    """
+    Function to copy a file as a copy-on-write clone when the file system supports it.
+    Returns the method used.
+    """
+    import fcntl
+    import shutil
+
+    with open(source, "rb") as source_file, open(destination, "wb") as target_file:
+        try:
+            fcntl.ioctl(target_file.fileno(), FICLONE, source_file.fileno())
+            return "reflink"
+        except OSError:
+            shutil.copyfileobj(source_file, target_file, 1 << 20)
+            return "copy"
@@ -0,0 +1,55 @@
+from collections import deque
+
+
+class ComponentGraph:
+    """
+    Dependency graph of SDK components: an edge goes from a component to every component
+    providing one of the features it requires.
+    Conditional requirements are always followed, which only ever keeps more components.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._edges = {}
+
+    def dependencies(self, component_id):
+        edges = self._edges.get(component_id)
+        if edges is None:
+            component = self.catalog.get(component_id)
+            edges = set()
+            if component is not None:
+                for feature, _ in component["requires"]:
+                    edges.update(self.catalog.providers(feature))
+            edges.discard(component_id)
+            self._edges[component_id] = edges
+        return edges
+
+    def reachable(self, start_ids):
+        """
+        Function to return every component reachable from start_ids, start_ids included.
+        Each component and edge is visited once.
+        """
+        seen = set(start_ids)
+        queue = deque(seen)
+        while queue:
+            for dependency in self.dependencies(queue.popleft()):
+                if dependency not in seen:
+                    seen.add(dependency)
+                    queue.append(dependency)
+        return seen
+
+
+def find_orphaned_components(catalog, kept_ids, removed_ids):
+    """
+    Function to find the components only pulled in through the removed components.
+    A kept component stays a root of its own unless a removed component requires it directly,
+    in which case it only stays when another root requires it.
+    Returns the orphans as a set, removed_ids excluded. Linear in the size of the graph.
+    """
+    graph = ComponentGraph(catalog)
+    removed = set(removed_ids)
+    required_by_removed = set()
+    for component_id in removed:
+        required_by_removed.update(graph.dependencies(component_id))
+    roots = set(kept_ids) - required_by_removed - removed
+    return graph.reachable(removed) - graph.reachable(roots) - removed
@@ -0,0 +1,107 @@
+import os
+import re
+
+RULES_FILE_NAME = "component_rules.yaml"
+
+# Used when no rules file is found, matches the historical behaviour
+DEFAULT_RULES = {"remove": {"prefixes": ["brd", "EFR32"]}}
+
+RULE_SECTIONS = ("remove", "keep")
+RULE_KINDS = ("prefixes", "exact", "regexes")
+
+# Trie node markers, they cannot collide with the single characters used as keys
+_PREFIX_END = "prefix_end"
+_EXACT_END = "exact_end"
+
+
+def _trie_pattern(node):
+    """
+    Function to turn a trie node into a regex fragment, so that ids are matched character by
+    character instead of trying every rule in turn.
+    """
+    if _PREFIX_END in node:
+        # Anything may follow, longer words below this node are redundant
+        return ""
+    alternatives = [
+        re.escape(char) + _trie_pattern(child)
+        for char, child in sorted(node.items())
+        if char != _EXACT_END
+    ]
+    if _EXACT_END in node:
+        alternatives.append(r"\Z")
+    if len(alternatives) == 1:
+        return alternatives[0]
+    return "(?:" + "|".join(alternatives) + ")"
+
+
+def compile_rules(prefixes=(), exact=(), regexes=()):
+    """
+    Function to compile prefix, exact and regex rules into a single pattern matched from the
+    start of a component id. Returns None when there is no rule.
+    """
+    trie = {}
+    for words, marker in ((prefixes, _PREFIX_END), (exact, _EXACT_END)):
+        for word in words or ():
+            node = trie
+            for char in str(word):
+                node = node.setdefault(char, {})
+            node[marker] = True
+
+    alternatives = []
+    if trie:
+        alternatives.append(_trie_pattern(trie))
+    alternatives.extend(f"(?:{regex})" for regex in regexes or ())
+    if not alternatives:
+        return None
+    return re.compile("|".join(alternatives))
+
+
+class ComponentRules:
+    """
+    Decides which .slcp components are board specific, from 'remove' rules and 'keep' exclusions.
+    """
+
+    def __init__(self, rules, source=None):
+        self.source = source
+        for section, kinds in rules.items():
+            if section not in RULE_SECTIONS:
+                raise ValueError(f"Unknown rule section '{section}' in {source}")
+            for kind in kinds or {}:
+                if kind not in RULE_KINDS:
+                    raise ValueError(
+                        f"Unknown rule kind '{section}.{kind}' in {source}"
+                    )
+        try:
+            self.remove_pattern = compile_rules(**(rules.get("remove") or {}))
+            self.keep_pattern = compile_rules(**(rules.get("keep") or {}))
+        except re.error as e:
+            raise ValueError(f"Invalid regex in {source}: {e}") from e
+
+    def is_kept(self, id_value):
+        """
+        Function to tell whether the component id is excluded from removal by a 'keep' rule.
+        """
+        return self.keep_pattern is not None and bool(self.keep_pattern.match(id_value))
+
+    def matches(self, id_value):
+        """
+        Function to tell whether the component id has to be removed.
+        """
+        if self.remove_pattern is None or not self.remove_pattern.match(id_value):
+            return False
+        return self.keep_pattern is None or not self.keep_pattern.match(id_value)
+
+
+def load_component_rules(search_dirs):
+    """
+    Function to load the rules from the first component_rules.yaml found in search_dirs,
+    falling back on the default 'brd' and 'EFR32' prefixes.
+    """
+    for directory in search_dirs:
+        rules_file = os.path.join(directory, RULES_FILE_NAME)
+        if os.path.isfile(rules_file):
+            from yaml_io import safe_load
+
+            with open(rules_file, "r") as file:
+                return ComponentRules(safe_load(file) or {}, source=rules_file)
+    return ComponentRules(DEFAULT_RULES, source="defaults")
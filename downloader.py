@@ -0,0 +1,299 @@
+import argparse
+import http.client
+import os
+import sys
+import threading
+import time
+from urllib.parse import urljoin, urlsplit
+
+from cache_utils import file_sha256
+
+# Redirects followed per request, download pages of tool vendors usually redirect to a CDN
+MAX_REDIRECTS = 5
+CHUNK_SIZE = 1 << 20
+TIMEOUT_SECONDS = 60
+RETRIES = 5
+# First delay between attempts, doubled after each failure
+RETRY_DELAY_SECONDS = 1.0
+
+
+class DownloadError(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    HTTP(S) connections kept open per worker thread and host, so that consecutive downloads from the same
+    server skip the TCP and TLS handshakes.
+    """
+
+    def __init__(self, timeout=TIMEOUT_SECONDS):
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connections(self):
+        if not hasattr(self._local, "connections"):
+            self._local.connections = {}
+        return self._local.connections
+
+    def get(self, scheme, netloc):
+        connections = self._connections()
+        connection = connections.get((scheme, netloc))
+        if connection is None:
+            if scheme == "https":
+                connection = http.client.HTTPSConnection(netloc, timeout=self.timeout)
+            elif scheme == "http":
+                connection = http.client.HTTPConnection(netloc, timeout=self.timeout)
+            else:
+                raise DownloadError(f"Unsupported URL scheme '{scheme}'")
+            connections[(scheme, netloc)] = connection
+        return connection
+
+    def discard(self, scheme, netloc):
+        connection = self._connections().pop((scheme, netloc), None)
+        if connection is not None:
+            connection.close()
+
+    def close(self):
+        for connection in self._connections().values():
+            connection.close()
+        self._connections().clear()
+
+
+def open_url(pool, url, headers=None):
+    """
+    Function to send a GET request through the pool, following redirects.
+    Returns the response, which has to be read to the end before the connection is reused.
+    """
+    for _ in range(MAX_REDIRECTS + 1):
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        connection = pool.get(parts.scheme, parts.netloc)
+        try:
+            connection.request("GET", path, headers=headers or {})
+            response = connection.getresponse()
+        except Exception:
+            # A kept-alive connection may have been closed by the server meanwhile
+            pool.discard(parts.scheme, parts.netloc)
+            raise
+        if response.status in (301, 302, 303, 307, 308):
+            location = response.getheader("Location")
+            response.read()
+            if not location:
+                raise DownloadError(f"Redirect without location from {url}")
+            url = urljoin(url, location)
+            continue
+        if response.getheader("Connection", "").lower() == "close":
+            # Do not hand a connection the server is about to close to the next download
+            pool.discard(parts.scheme, parts.netloc)
+        return response
+    raise DownloadError(f"Too many redirects from {url}")
+
+
+def download_file(pool, entry, dest_dir, retries=RETRIES):
+    """
+    Function to download one manifest entry into dest_dir, resuming from the partial file of an earlier
+    attempt with an HTTP range request, and checking its sha256 when pinned.
+    Returns a dict describing the transfer.
+    """
+    path = os.path.join(dest_dir, entry["name"])
+    part_path = path + ".part"
+    expected = entry.get("sha256")
+    result = {"name": entry["name"], "path": path, "bytes": 0, "resumed": 0}
+    start = time.monotonic()
+
+    if expected and os.path.isfile(path):
+        if file_sha256(path).hexdigest() == expected:
+            result.update(status="cached", sha256=expected, seconds=0.0)
+            return result
+
+    for attempt in range(1, retries + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        try:
+            response = open_url(pool, entry["url"], headers)
+            if response.status == 416 and offset:
+                # The partial file of an earlier attempt already holds the whole file
+                response.read()
+            elif response.status in (200, 206):
+                if response.status == 200:
+                    # The server ignored the range, start over
+                    offset = 0
+                result["resumed"] = offset
+                with open(part_path, "ab" if offset else "wb") as file:
+                    for chunk in iter(lambda: response.read(CHUNK_SIZE), b""):
+                        file.write(chunk)
+                        result["bytes"] += len(chunk)
+                length = response.getheader("Content-Length")
+                received = os.path.getsize(part_path) - offset
+                if length is not None and received < int(length):
+                    raise ConnectionError(
+                        f"connection dropped after {received} of {length} bytes"
+                    )
+            else:
+                response.read()
+                if response.status < 500:
+                    raise DownloadError(f"HTTP {response.status} for {entry['url']}")
+                raise ConnectionError(f"HTTP {response.status}")
+        except (OSError, http.client.HTTPException) as e:
+            # The connection may be in any state, do not reuse it
+            pool.close()
+            if attempt == retries:
+                raise DownloadError(f"{e} after {attempt} attempts") from e
+            print(
+                f"{entry['name']}: attempt {attempt} failed ({e!r}), retrying",
+                file=sys.stderr,
+            )
+            time.sleep(min(2 ** (attempt - 1), 30) * RETRY_DELAY_SECONDS)
+            continue
+
+        digest = file_sha256(part_path).hexdigest()
+        if expected and digest != expected:
+            os.unlink(part_path)
+            raise DownloadError(f"sha256 {digest} does not match the pinned {expected}")
+        os.replace(part_path, path)
+        result.update(
+            status="downloaded",
+            sha256=digest,
+            seconds=time.monotonic() - start,
+            attempts=attempt,
+        )
+        return result
+
+
+def load_manifest(path, variables=None):
+    """
+    Function to read the list of artifacts to download from a YAML manifest:
+    'downloads' entries with a 'url', a pinned 'sha256' and an optional file 'name'.
+    Archives with an 'extract' directory are extracted while downloading, 'strip_components' leading
+    path components dropped. '{key}' placeholders in URLs, names and directories are replaced by variables.
+    """
+    from yaml_io import safe_load
+
+    with open(path, "r") as file:
+        data = safe_load(file) or {}
+    entries = []
+    for index, item in enumerate(data.get("downloads") or []):
+        if not isinstance(item, dict) or not item.get("url"):
+            raise ValueError(f"downloads[{index}]: missing 'url'")
+        try:
+            url = str(item["url"]).format(**(variables or {}))
+            name = str(item.get("name") or "").format(**(variables or {}))
+            extract = str(item.get("extract") or "").format(**(variables or {}))
+        except KeyError as e:
+            raise ValueError(f"downloads[{index}]: no value for {e}") from e
+        entries.append(
+            {
+                "name": name or os.path.basename(urlsplit(url).path),
+                "url": url,
+                "sha256": (
+                    str(item["sha256"]).lower()
+                    if item.get("sha256") is not None
+                    else None
+                ),
+                "extract": extract or None,
+                "strip_components": int(item.get("strip_components") or 0),
+            }
+        )
+    return entries
+
+
+def download_all(entries, dest_dir, jobs=4, retries=RETRIES):
+    """
+    Function to download every entry concurrently. Returns the results and the errors.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    from stream_extract import download_and_extract
+
+    os.makedirs(dest_dir, exist_ok=True)
+    pool = ConnectionPool()
+    results = []
+    errors = []
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(
+                download_and_extract if entry["extract"] else download_file,
+                pool,
+                entry,
+                dest_dir,
+                retries,
+            ): entry
+            for entry in entries
+        }
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                errors.append(f"{futures[future]['name']}: {e}")
+    return results, errors
+
+
+def format_result(result):
+    if result["status"] == "cached":
+        return f"{result['name']}: already downloaded"
+    megabytes = result["bytes"] / (1 << 20)
+    rate = megabytes / result["seconds"] if result["seconds"] else 0.0
+    resumed = f", resumed at {result['resumed']} bytes" if result["resumed"] else ""
+    return (
+        f"{result['name']}: {megabytes:.1f} MB in {result['seconds']:.1f}s "
+        f"({rate:.1f} MB/s, {result['attempts']} attempt(s){resumed})"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Download build dependencies concurrently, with resume and sha256 verification."
+    )
+    parser.add_argument("manifest", help="YAML file listing the downloads")
+    parser.add_argument("-o", "--output-dir", default=".", help="where to download")
+    parser.add_argument("-j", "--jobs", type=int, default=4)
+    parser.add_argument("--retries", type=int, default=RETRIES)
+    parser.add_argument(
+        "--var",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="value of a {KEY} placeholder of the manifest, e.g. gcc=12.2.Rel1",
+    )
+    parser.add_argument(
+        "--allow-unpinned",
+        action="store_true",
+        help="download entries without sha256 and print their hash, to pin them",
+    )
+    args = parser.parse_args()
+
+    variables = {}
+    for item in args.var:
+        key, separator, value = item.partition("=")
+        if not separator:
+            parser.error(f"--var expects KEY=VALUE, got '{item}'")
+        variables[key] = value
+
+    try:
+        entries = load_manifest(args.manifest, variables)
+    except (OSError, ValueError) as e:
+        print(f"Error reading {args.manifest}: {e}", file=sys.stderr)
+        sys.exit(1)
+    unpinned = [entry["name"] for entry in entries if not entry["sha256"]]
+    if unpinned and not args.allow_unpinned:
+        print(f"No pinned sha256 for: {', '.join(unpinned)}", file=sys.stderr)
+        sys.exit(1)
+
+    start = time.monotonic()
+    results, errors = download_all(entries, args.output_dir, args.jobs, args.retries)
+    for result in sorted(results, key=lambda result: result["name"]):
+        print(format_result(result))
+        if result["name"] in unpinned:
+            print(f"  sha256: {result['sha256']}")
+    total = sum(result["bytes"] for result in results) / (1 << 20)
+    print(f"{total:.1f} MB in {time.monotonic() - start:.1f}s")
+    for error in errors:
+        print(f"Error downloading {error}", file=sys.stderr)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,435 @@
+import argparse
+import hashlib
+import os
+import shlex
+import stat
+import subprocess
+import sys
+import time
+
+from cache_utils import (
+    atomic_write_json,
+    cache_root,
+    file_lock,
+    file_sha256,
+    format_size,
+    parse_size,
+    read_json,
+    reflink_or_copy,
+)
+
+# Bumped whenever what goes into the key or the layout of a manifest changes
+KEY_FORMAT = 2
+# Files next to the .slcp slc reads too (.slpb, .slps, .pintool...), the generate stage of pipeline.yaml
+# hashes the same
+PROJECT_FILE_PATTERNS = ("*.slc*", "*.slp*", "*.pintool")
+SLC_GENERATE = (
+    "slc generate {slcp} -cpsdk -tlcn gcc -o cmake --with {target_opn} "
+    "--configuration={configs}"
+)
+# Never part of what the generator produced
+SKIPPED_DIRS = {".git", "build"}
+
+
+def file_digest(path):
+    return file_sha256(path).hexdigest()
+
+
+def sdk_commit(sdk_dir):
+    """
+    Function to return the commit an SDK checkout is at, or "" when it is not a git checkout.
+    """
+    from git_backend import run_git
+
+    if not sdk_dir or not os.path.exists(os.path.join(sdk_dir, ".git")):
+        return ""
+    return run_git(sdk_dir, "rev-parse", "HEAD").decode().strip()
+
+
+def project_config_files(slcp_file, slcp_data):
+    """
+    Function to list the config files a project brings (its 'config_file' entries) that exist.
+    """
+    project_dir = os.path.dirname(os.path.abspath(slcp_file))
+    paths = []
+    for item in slcp_data.get("config_file") or []:
+        if isinstance(item, dict) and item.get("path"):
+            path = os.path.join(project_dir, str(item["path"]))
+            if os.path.isfile(path):
+                paths.append(path)
+    return sorted(paths)
+
+
+def project_files(slcp_file):
+    """
+    Function to list the project files next to a .slcp, itself included.
+    """
+    import glob
+
+    project_dir = os.path.dirname(os.path.abspath(slcp_file))
+    paths = set()
+    for pattern in PROJECT_FILE_PATTERNS:
+        paths.update(
+            path
+            for path in glob.glob(os.path.join(glob.escape(project_dir), pattern))
+            if os.path.isfile(path)
+        )
+    return sorted(paths)
+
+
+def generation_key(slcp_file, target_opn, configs, sdk_dir=None, command=SLC_GENERATE):
+    """
+    Function to hash everything the generated project depends on: the project files (the .slcp and the
+    ones next to it), the config files it brings, the SDK id, version and commit, the target OPN and
+    configs (in canonical form), and the generator command. Returns the key and the parts it was computed
+    from.
+    """
+    from target_configs import parse_configs
+    from target_matrix import load_yaml_file, read_project_sdk
+
+    slcp_data = load_yaml_file(slcp_file)
+    sdk_id, sdk_version = read_project_sdk(slcp_data)
+    project_dir = os.path.dirname(os.path.abspath(slcp_file))
+    parts = {
+        "format": KEY_FORMAT,
+        "project_files": {
+            os.path.relpath(path, project_dir): file_digest(path)
+            for path in project_files(slcp_file)
+        },
+        "slcp": os.path.basename(slcp_file),
+        "config_files": {
+            os.path.relpath(path, project_dir): file_digest(path)
+            for path in project_config_files(slcp_file, slcp_data)
+        },
+        "sdk": [sdk_id, sdk_version, sdk_commit(sdk_dir)],
+        "target": parse_configs(configs).target_hash(target_opn),
+        "command": command,
+    }
+    files = ("config_files", "project_files")
+    text = "\0".join(
+        f"{name}={parts[name]}" for name in sorted(parts) if name not in files
+    )
+    for name in files:
+        text += f"\0{name}" + "".join(
+            f"\0{path}={digest}" for path, digest in sorted(parts[name].items())
+        )
+    return hashlib.sha256(text.encode()).hexdigest(), parts
+
+
+def snapshot(root):
+    """
+    Function to record the files of a tree as {relative path: (size, mtime, mode)}.
+    """
+    files = {}
+    for directory, dirs, names in os.walk(root):
+        dirs[:] = [name for name in dirs if name not in SKIPPED_DIRS]
+        for name in dirs + names:
+            path = os.path.join(directory, name)
+            info = os.lstat(path)
+            if stat.S_ISDIR(info.st_mode):
+                continue
+            files[os.path.relpath(path, root)] = (
+                info.st_size,
+                info.st_mtime_ns,
+                info.st_mode,
+            )
+    return files
+
+
+class GeneratedCache:
+    """
+    Generated projects stored by generation key: a manifest per key listing the files the generator wrote,
+    and the content of every file once (objects named by their sha256), shared by all manifests.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or cache_root("generated")
+        self.objects = os.path.join(self.root, "objects")
+        self.manifests = os.path.join(self.root, "manifests")
+        self.lock_path = os.path.join(self.root, "cache.lock")
+
+    def _manifest_path(self, key):
+        return os.path.join(self.manifests, f"{key}.json")
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects, digest[:2], digest)
+
+    def _written_path(self, root):
+        name = hashlib.sha256(os.path.abspath(root).encode()).hexdigest()
+        return os.path.join(self.root, "projects", f"{name}.json")
+
+    def _record_written(self, root, entries):
+        """
+        Function to remember the content the cache or the generator last left in the files of a project,
+        to tell them from edits.
+        """
+        written_path = self._written_path(root)
+        written = read_json(written_path, {})
+        written.update({path: target for path, _, target in entries})
+        atomic_write_json(written_path, written)
+
+    def edited_files(self, key, root):
+        """
+        Function to list the files stored under key that exist in root with a content neither stored under
+        key nor last written by the cache or the generator, which restoring would overwrite.
+        Returns None when key is not in the cache.
+        """
+        manifest = read_json(self._manifest_path(key))
+        if manifest is None:
+            return None
+        written = read_json(self._written_path(root), {})
+        edited = []
+        for path, mode, target in manifest["files"]:
+            full_path = os.path.join(root, path)
+            if not os.path.lexists(full_path):
+                continue
+            if os.path.islink(full_path):
+                current = os.readlink(full_path) if mode == "link" else None
+            elif os.path.isfile(full_path):
+                current = file_digest(full_path)
+            else:
+                current = None
+            if current != target and (current is None or current != written.get(path)):
+                edited.append(path)
+        return edited
+
+    def store(self, key, root, paths):
+        """
+        Function to store the files paths (relative to root) under key.
+        Returns the bytes written and the bytes already stored.
+        """
+        entries = []
+        written = 0
+        shared = 0
+        with file_lock(self.lock_path, shared=True):
+            for path in sorted(paths):
+                full_path = os.path.join(root, path)
+                info = os.lstat(full_path)
+                if stat.S_ISLNK(info.st_mode):
+                    entries.append([path, "link", os.readlink(full_path)])
+                    continue
+                digest = file_digest(full_path)
+                object_path = self._object_path(digest)
+                if os.path.exists(object_path):
+                    shared += info.st_size
+                else:
+                    # A copy, the generated file may be edited or rewritten in place later
+                    temp_path = f"{object_path}.{os.getpid()}.tmp"
+                    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                    reflink_or_copy(full_path, temp_path)
+                    os.replace(temp_path, object_path)
+                    written += info.st_size
+                entries.append([path, oct(info.st_mode & 0o777), digest])
+            atomic_write_json(
+                self._manifest_path(key), {"created": time.time(), "files": entries}
+            )
+            self._record_written(root, entries)
+        return written, shared
+
+    def restore(self, key, root):
+        """
+        Function to write the files stored under key into root. Returns the number of files restored,
+        or None when key is not in the cache.
+        """
+        with file_lock(self.lock_path, shared=True):
+            manifest = read_json(self._manifest_path(key))
+            if manifest is None:
+                return None
+            for path, mode, target in manifest["files"]:
+                full_path = os.path.join(root, path)
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                if os.path.lexists(full_path):
+                    os.unlink(full_path)
+                if mode == "link":
+                    os.symlink(target, full_path)
+                    continue
+                reflink_or_copy(self._object_path(target), full_path)
+                os.chmod(full_path, int(mode, 8))
+            os.utime(self._manifest_path(key))
+            self._record_written(root, manifest["files"])
+        return len(manifest["files"])
+
+    def evict(self, max_size):
+        """
+        Function to drop the least recently restored manifests, then the objects no manifest lists, until
+        the objects fit in max_size bytes. Returns the number of manifests dropped.
+        """
+        dropped = 0
+        os.makedirs(self.manifests, exist_ok=True)
+        with file_lock(self.lock_path):
+            manifests = sorted(
+                (os.path.getmtime(os.path.join(self.manifests, name)), name)
+                for name in os.listdir(self.manifests)
+                if name.endswith(".json")
+            )
+            while True:
+                referenced = set()
+                for _, name in manifests:
+                    manifest = read_json(os.path.join(self.manifests, name), {})
+                    referenced.update(
+                        target
+                        for _, mode, target in manifest.get("files", [])
+                        if mode != "link"
+                    )
+                size = 0
+                for directory, _, names in os.walk(self.objects):
+                    for name in names:
+                        path = os.path.join(directory, name)
+                        if name not in referenced:
+                            os.unlink(path)
+                        else:
+                            size += os.path.getsize(path)
+                if size <= max_size or not manifests:
+                    return dropped
+                _, name = manifests.pop(0)
+                os.unlink(os.path.join(self.manifests, name))
+                dropped += 1
+
+
+def generate(cache, slcp_file, target_opn, configs, sdk_dir, command):
+    """
+    Function to generate a project, from the cache when it holds the same inputs, otherwise by running the
+    generator and storing the files it wrote. Generated files edited since they were written are never
+    overwritten from the cache: the generator runs instead, and its result is not stored as it depends on
+    the edits. Returns 'hit' or 'miss', and a message.
+    """
+    project_dir = os.path.dirname(os.path.abspath(slcp_file))
+    key, _ = generation_key(slcp_file, target_opn, configs, sdk_dir, command)
+    edited = cache.edited_files(key, project_dir)
+    if edited == []:
+        restored = cache.restore(key, project_dir)
+        if restored is not None:
+            return "hit", f"restored {restored} files ({key[:12]})"
+
+    before = snapshot(project_dir)
+    arguments = {
+        "slcp": shlex.quote(os.path.basename(slcp_file)),
+        "target_opn": shlex.quote(target_opn),
+        "configs": shlex.quote(configs),
+        "sdk": shlex.quote(os.path.abspath(sdk_dir)) if sdk_dir else "",
+    }
+    returncode = subprocess.call(
+        command.format(**arguments), shell=True, cwd=project_dir
+    )
+    if returncode != 0:
+        raise RuntimeError(f"the generator exited with {returncode}")
+    if edited:
+        return "miss", (
+            f"{len(edited)} generated files edited ({', '.join(edited)}), "
+            "generated without the cache"
+        )
+    after = snapshot(project_dir)
+    written = [path for path, info in after.items() if before.get(path) != info]
+    new_bytes, shared_bytes = cache.store(key, project_dir, written)
+    return "miss", (
+        f"stored {len(written)} files ({key[:12]}), {format_size(new_bytes)} new, "
+        f"{format_size(shared_bytes)} already in the cache"
+    )
+
+
+def stub_generate(slcp_file, target_opn, configs):
+    """
+    Function standing in for slc generate without an SDK: writes a <project>_cmake tree and autogen files
+    derived from the project, the target and its configs. As slc does, config files are only written when
+    missing.
+    """
+    from target_matrix import load_yaml_file
+
+    slcp_data = load_yaml_file(slcp_file)
+    project_dir = os.path.dirname(os.path.abspath(slcp_file))
+    name = str(slcp_data.get("project_name") or "project")
+    components = sorted(
+        str(item["id"])
+        for item in slcp_data.get("component") or []
+        if isinstance(item, dict) and item.get("id")
+    )
+    files = {
+        f"{name}_cmake/CMakeLists.txt": f"project({name})\ninclude({name}.cmake)\n",
+        f"{name}_cmake/{name}.cmake": "".join(
+            f"# component {component}\n" for component in components
+        ),
+        f"{name}_cmake/CMakePresets.json": '{"version": 3}\n',
+        "autogen/sl_component_catalog.h": "".join(
+            f"#define SL_CATALOG_{component.upper()}_PRESENT\n"
+            for component in components + [target_opn]
+        ),
+        "autogen/sl_event_handler.c": "void sl_platform_init(void) {}\n",
+        "config/sl_board_control_config.h": "".join(
+            f"#define {item.partition(':')[0]} {item.partition(':')[2]}\n"
+            for item in configs.split(",")
+            if item
+        ),
+    }
+    for path, content in files.items():
+        full_path = os.path.join(project_dir, path)
+        if path.startswith("config/") and os.path.exists(full_path):
+            continue
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w") as file:
+            file.write(content)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate projects with slc, restoring them from the cache when the inputs did not change."
+    )
+    parser.add_argument("--cache-dir", help="store location (default: in the cache)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser("generate", help="generate a project")
+    stub_parser = subparsers.add_parser(
+        "stub-generate", help="write a fake generated project, standing in for slc"
+    )
+    for subparser in (generate_parser, stub_parser):
+        subparser.add_argument("slcp", help="project file")
+        subparser.add_argument("--with", dest="target_opn", required=True)
+        subparser.add_argument("--configuration", default="", help="target configs")
+    generate_parser.add_argument("--sdk", help="SDK checkout, for its commit")
+    generate_parser.add_argument(
+        "--generator",
+        default=SLC_GENERATE,
+        help="generator command, with {slcp}, {target_opn}, {configs} and {sdk} placeholders",
+    )
+    generate_parser.add_argument(
+        "--stub", action="store_true", help="generate with stub-generate instead of slc"
+    )
+    generate_parser.add_argument("--max-size", help="evict down to this size, e.g. 5G")
+
+    evict_parser = subparsers.add_parser(
+        "evict", help="drop least recently used projects"
+    )
+    evict_parser.add_argument("--max-size", required=True, help="e.g. 5G")
+    args = parser.parse_args()
+
+    if args.command == "stub-generate":
+        stub_generate(args.slcp, args.target_opn, args.configuration)
+        return
+
+    cache = GeneratedCache(args.cache_dir)
+    if args.command == "evict":
+        print(f"Dropped {cache.evict(parse_size(args.max_size))} projects")
+        return
+
+    command = args.generator
+    if args.stub:
+        command = (
+            f"{shlex.quote(sys.executable)} {shlex.quote(os.path.abspath(__file__))} "
+            "stub-generate {slcp} --with {target_opn} --configuration={configs}"
+        )
+    start = time.monotonic()
+    try:
+        result, message = generate(
+            cache, args.slcp, args.target_opn, args.configuration, args.sdk, command
+        )
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"Error generating {args.slcp}: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(
+        f"{args.slcp} {args.target_opn}: {result}, {message} in {time.monotonic() - start:.2f}s"
+    )
+    if args.max_size:
+        cache.evict(parse_size(args.max_size))
+
+
+if __name__ == "__main__":
+    main()
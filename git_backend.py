@@ -0,0 +1,627 @@
+import itertools
+import os
+import stat
+import subprocess
+import tempfile
+
+
+class GitBackendError(Exception):
+    """
+    Raised when a git backend operation fails, whatever the backend.
+    """
+
+
+# Number of paths handed to the index in one batch when streaming git output
+STAGING_BATCH_SIZE = 1000
+
+
+def run_git(repo_dir, *args, input=None, env=None):
+    """
+    Function to run a git command in repo_dir and return its raw stdout bytes.
+    """
+    result = subprocess.run(
+        ["git", *args],
+        cwd=repo_dir,
+        input=input,
+        env=env,
+        stdout=subprocess.PIPE,
+        check=True,
+    )
+    return result.stdout
+
+
+def iter_git_records(repo_dir, *args, read_size=64 * 1024, env=None):
+    """
+    Generator yielding the NUL-delimited records printed by a `-z` git command.
+    Output is read in bounded chunks so the full listing is never held in memory.
+    """
+    process = subprocess.Popen(
+        ["git", *args], cwd=repo_dir, env=env, stdout=subprocess.PIPE
+    )
+    try:
+        pending = b""
+        while True:
+            chunk = process.stdout.read1(read_size)
+            if not chunk:
+                break
+            *records, pending = (pending + chunk).split(b"\0")
+            yield from records
+        if pending:
+            yield pending
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, process.args)
+
+
+def iter_batches(items, batch_size=STAGING_BATCH_SIZE):
+    """
+    Generator splitting any iterable into lists of at most batch_size items.
+    """
+    items = iter(items)
+    while True:
+        batch = list(itertools.islice(items, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class StatusPlan:
+    """
+    Classification of the working tree changes found by a single status pass.
+    Every staging action taken by stage_and_commit is driven from this object.
+    """
+
+    def __init__(self, repo_dir, list_ignored=None):
+        self.repo_dir = repo_dir
+        self.list_ignored = list_ignored or self._list_ignored
+        self.untracked = []
+        self.modified = []
+        self.deleted = []
+        self.renamed = []
+        self.staged = []
+        self.ignored_count = 0
+
+    def _list_ignored(self):
+        for record in iter_git_records(
+            self.repo_dir,
+            "ls-files",
+            "-z",
+            "--ignored",
+            "--cached",
+            "--exclude-standard",
+        ):
+            yield os.fsdecode(record)
+
+    def iter_ignored(self):
+        """
+        Generator over tracked files newly matched by .gitignore, streamed from the index.
+        Those paths are dropped from the modified and deleted buckets once consumed.
+        """
+        modified = set(self.modified)
+        deleted = set(self.deleted)
+        for path in self.list_ignored():
+            self.ignored_count += 1
+            modified.discard(path)
+            deleted.discard(path)
+            yield path
+        self.modified = [path for path in self.modified if path in modified]
+        self.deleted = [path for path in self.deleted if path in deleted]
+
+    def is_empty(self):
+        return not (
+            self.untracked
+            or self.modified
+            or self.deleted
+            or self.renamed
+            or self.staged
+            or self.ignored_count
+        )
+
+
+class IndexTransaction:
+    """
+    Streams index additions and removals into a single
+    `git update-index -z --index-info` process, so .git/index is rewritten once.
+    Entries are applied in order, a later entry for a path wins over an earlier one.
+    """
+
+    def __init__(self, repo_dir, env=None):
+        self.repo_dir = repo_dir
+        self.env = env
+        self.index_writes = 0
+        self._process = None
+        self._null_sha = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+    def _write_entry(self, mode, sha, path):
+        if self._process is None:
+            self._process = subprocess.Popen(
+                ["git", "update-index", "-z", "--index-info"],
+                cwd=self.repo_dir,
+                env=self.env,
+                stdin=subprocess.PIPE,
+            )
+        self._process.stdin.write(
+            f"{mode} {sha}\t".encode() + os.fsencode(path) + b"\0"
+        )
+
+    def _hash_blob(self, *args, input=None):
+        return run_git(self.repo_dir, "hash-object", "-w", *args, input=input)
+
+    def _index_entries(self, paths):
+        """
+        Function to hash the given working tree paths into the object database and
+        return their (mode, sha, path) index entries.
+        """
+        entries = []
+        batched_files = []
+        for path in paths:
+            full_path = os.path.join(self.repo_dir, path)
+            info = os.lstat(full_path)
+            if stat.S_ISLNK(info.st_mode):
+                link_target = os.fsencode(os.readlink(full_path))
+                sha = self._hash_blob("--stdin", "--no-filters", input=link_target)
+                entries.append(("120000", sha.strip().decode(), path))
+            elif stat.S_ISDIR(info.st_mode):
+                # Nested repository, recorded as a gitlink. git status lists untracked
+                # ones with a trailing slash, which update-index would ignore
+                sha = run_git(full_path, "rev-parse", "HEAD")
+                entries.append(("160000", sha.strip().decode(), path.rstrip("/")))
+            else:
+                mode = "100755" if info.st_mode & stat.S_IXUSR else "100644"
+                if "\n" in path:
+                    with open(full_path, "rb") as file:
+                        sha = self._hash_blob(
+                            f"--path={path}", "--stdin", input=file.read()
+                        )
+                    entries.append((mode, sha.strip().decode(), path))
+                else:
+                    batched_files.append((mode, path))
+
+        if batched_files:
+            # --stdin-paths is newline delimited, hence the fallback above
+            shas = self._hash_blob(
+                "--stdin-paths",
+                input=b"".join(os.fsencode(path) + b"\n" for _, path in batched_files),
+            ).split()
+            for (mode, path), sha in zip(batched_files, shas):
+                entries.append((mode, sha.decode(), path))
+
+        return entries
+
+    def add(self, paths):
+        for batch in iter_batches(paths):
+            self.add_entries(self._index_entries(batch))
+
+    def add_entries(self, entries):
+        """
+        Function to stage (mode, sha, path) entries whose objects already exist.
+        """
+        for mode, sha, path in entries:
+            self._write_entry(mode, sha, path)
+
+    def remove(self, paths):
+        if self._null_sha is None:
+            object_format = run_git(self.repo_dir, "rev-parse", "--show-object-format")
+            self._null_sha = "0" * (64 if object_format.strip() == b"sha256" else 40)
+        for path in paths:
+            self._write_entry("0", self._null_sha, path)
+
+    def commit(self):
+        """
+        Function to let update-index write every streamed change to the index.
+        """
+        if self._process is None:
+            return
+        process, self._process = self._process, None
+        process.stdin.close()
+        if process.wait():
+            raise subprocess.CalledProcessError(process.returncode, process.args)
+        self.index_writes += 1
+
+    def abort(self):
+        """
+        Function to discard the pending changes without touching the index.
+        """
+        if self._process is None:
+            return
+        process, self._process = self._process, None
+        # SIGTERM lets git remove its index.lock before exiting
+        process.terminate()
+        process.wait()
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+
+class TemporaryIndex:
+    """
+    Throwaway index file, used to build trees without touching .git/index or the
+    working tree. Works on bare repositories.
+    """
+
+    def __init__(self, repo_dir, git_dir):
+        self.repo_dir = repo_dir
+        self.git_dir = git_dir
+        self.env = None
+        self._temp_dir = None
+
+    def __enter__(self):
+        # Kept inside the git directory so it lives on the same filesystem
+        self._temp_dir = tempfile.TemporaryDirectory(
+            prefix="tmp_index_", dir=self.git_dir
+        )
+        self.env = dict(
+            os.environ, GIT_INDEX_FILE=os.path.join(self._temp_dir.name, "index")
+        )
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._temp_dir.cleanup()
+
+    def read_tree(self, rev):
+        try:
+            run_git(self.repo_dir, "read-tree", rev, env=self.env)
+        except subprocess.CalledProcessError as e:
+            raise GitBackendError(e) from e
+
+    def iter_ignored(self, exclude_from):
+        """
+        Generator over the entries matched by the patterns in the exclude_from file.
+        """
+        # ls-files --ignored needs a work tree, an empty one is enough on bare repositories
+        env = dict(self.env, GIT_WORK_TREE=self._temp_dir.name)
+        try:
+            for record in iter_git_records(
+                self.repo_dir,
+                "ls-files",
+                "-z",
+                "--cached",
+                "--ignored",
+                f"--exclude-from={exclude_from}",
+                env=env,
+            ):
+                yield os.fsdecode(record)
+        except subprocess.CalledProcessError as e:
+            raise GitBackendError(e) from e
+
+    def transaction(self):
+        return IndexTransaction(self.repo_dir, env=self.env)
+
+    def write_tree(self):
+        try:
+            tree = run_git(self.repo_dir, "write-tree", env=self.env)
+        except subprocess.CalledProcessError as e:
+            raise GitBackendError(e) from e
+        return tree.strip().decode()
+
+
+def _classify_worktree_change(plan, path, xy, submodule_state):
+    """
+    Function to sort a tracked entry into the plan based on its XY status pair.
+    """
+    index_status, worktree_status = xy[0], xy[1]
+    if index_status != ".":
+        plan.staged.append(path)
+    # Submodules only need restaging when their checked out commit moved
+    if submodule_state.startswith("S") and submodule_state[1] != "C":
+        return
+    if worktree_status == "D":
+        plan.deleted.append(path)
+    elif worktree_status != ".":
+        plan.modified.append(path)
+
+
+def get_status_plan(repo_dir):
+    """
+    Function to build a StatusPlan from one `git status --porcelain=v2 -z` pass.
+    Tracked files newly matched by .gitignore are not reported by git status, they
+    are streamed from the index by StatusPlan.iter_ignored instead.
+    """
+    plan = StatusPlan(repo_dir)
+
+    records = iter_git_records(
+        repo_dir, "status", "--porcelain=v2", "-z", "--untracked-files=all"
+    )
+    for record in records:
+        entry = os.fsdecode(record)
+        kind = entry[0]
+        if kind == "1":
+            # 1 <XY> <sub> <mH> <mI> <mW> <hH> <hI> <path>
+            fields = entry.split(" ", 8)
+            _classify_worktree_change(plan, fields[8], fields[1], fields[2])
+        elif kind == "2":
+            # 2 <XY> <sub> <mH> <mI> <mW> <hH> <hI> <X><score> <path>, then <origPath>
+            fields = entry.split(" ", 9)
+            original_path = os.fsdecode(next(records))
+            plan.renamed.append((original_path, fields[9]))
+            _classify_worktree_change(plan, fields[9], fields[1], fields[2])
+        elif kind == "u":
+            # u <XY> <sub> <m1> <m2> <m3> <mW> <h1> <h2> <h3> <path>
+            fields = entry.split(" ", 10)
+            plan.modified.append(fields[10])
+        elif kind == "?":
+            plan.untracked.append(entry[2:])
+
+    return plan
+
+
+class GitBackend:
+    """
+    Interface for the git operations needed by boardlessify.
+    """
+
+    name = None
+
+    def __init__(self, repo_dir):
+        self.repo_dir = repo_dir
+
+    def is_bare(self):
+        raise NotImplementedError
+
+    def current_branch(self):
+        raise NotImplementedError
+
+    def status(self):
+        """
+        Function returning a StatusPlan for the working tree.
+        """
+        raise NotImplementedError
+
+    def transaction(self):
+        """
+        Function returning a context manager with add(paths) and remove(paths),
+        applied to the index when the block exits without error.
+        """
+        raise NotImplementedError
+
+    def commit(self, message):
+        """
+        Function to commit the index. Returns False, without committing, when the index holds the same
+        tree as HEAD.
+        """
+        raise NotImplementedError
+
+    def create_branch(self, branch_name, start_point="HEAD"):
+        raise NotImplementedError
+
+    def checkout(self, branch_name):
+        raise NotImplementedError
+
+
+class CliGitBackend(GitBackend):
+    """
+    Backend driving the git command line, mostly through plumbing commands.
+    """
+
+    name = "cli"
+
+    def __init__(self, repo_dir):
+        super().__init__(repo_dir)
+        self._git("rev-parse", "--git-dir")
+
+    def _git(self, *args, input=None):
+        try:
+            return run_git(self.repo_dir, *args, input=input)
+        except (OSError, subprocess.CalledProcessError) as e:
+            raise GitBackendError(e) from e
+
+    def _head_commit(self):
+        try:
+            head = run_git(self.repo_dir, "rev-parse", "--verify", "-q", "HEAD")
+        except subprocess.CalledProcessError:
+            # Unborn branch, no commit yet
+            return None
+        return head.strip().decode()
+
+    def is_bare(self):
+        return self._git("rev-parse", "--is-bare-repository").strip() == b"true"
+
+    def current_branch(self):
+        return os.fsdecode(self._git("symbolic-ref", "--short", "HEAD").strip())
+
+    def status(self):
+        try:
+            return get_status_plan(self.repo_dir)
+        except subprocess.CalledProcessError as e:
+            raise GitBackendError(e) from e
+
+    def transaction(self):
+        return IndexTransaction(self.repo_dir)
+
+    def commit(self, message):
+        tree = self._git("write-tree").strip().decode()
+        parent = self._head_commit()
+        if parent is not None:
+            head_tree = self._git("rev-parse", f"{parent}^{{tree}}").strip().decode()
+            if tree == head_tree:
+                return False
+        commit = self.commit_tree(tree, parent, message)
+        # An empty old value makes update-ref check the branch is still unborn
+        self._git(
+            "update-ref", "-m", f"commit: {message}", "HEAD", commit, parent or ""
+        )
+        return True
+
+    def create_branch(self, branch_name, start_point="HEAD"):
+        # An empty old value makes update-ref refuse to overwrite an existing branch
+        self._git("update-ref", f"refs/heads/{branch_name}", start_point, "")
+
+    def checkout(self, branch_name):
+        self._git("checkout", "-q", branch_name)
+
+    def head_commit(self):
+        return self._head_commit()
+
+    def temporary_index(self):
+        git_dir = os.fsdecode(self._git("rev-parse", "--absolute-git-dir").strip())
+        return TemporaryIndex(self.repo_dir, git_dir)
+
+    def list_tree(self, rev):
+        """
+        Generator over the (mode, sha, path) blobs and gitlinks recorded in rev.
+        """
+        try:
+            for record in iter_git_records(self.repo_dir, "ls-tree", "-r", "-z", rev):
+                info, path = os.fsdecode(record).split("\t", 1)
+                mode, _, sha = info.split(" ")
+                yield mode, sha, path
+        except subprocess.CalledProcessError as e:
+            raise GitBackendError(e) from e
+
+    def read_blob(self, sha):
+        return self._git("cat-file", "blob", sha)
+
+    def hash_data(self, data, path):
+        """
+        Function to write data as a blob, filtered as if it was stored at path.
+        """
+        sha = self._git("hash-object", "-w", "--stdin", f"--path={path}", input=data)
+        return sha.strip().decode()
+
+    def hash_files(self, files):
+        """
+        Function to write files outside the working tree as blobs, given a mapping of
+        index path to file path, and return their (mode, sha, path) entries.
+        """
+        index_paths = list(files)
+        shas = self._git(
+            "hash-object",
+            "-w",
+            "--no-filters",
+            "--stdin-paths",
+            input=b"".join(os.fsencode(files[path]) + b"\n" for path in index_paths),
+        ).split()
+        entries = []
+        for path, sha in zip(index_paths, shas):
+            executable = os.stat(files[path]).st_mode & stat.S_IXUSR
+            entries.append(("100755" if executable else "100644", sha.decode(), path))
+        return entries
+
+    def commit_tree(self, tree, parent, message):
+        parent_args = ["-p", parent] if parent else []
+        commit = self._git("commit-tree", tree, *parent_args, input=message.encode())
+        return commit.strip().decode()
+
+
+class _GitPythonTransaction:
+    """
+    Index transaction on top of GitPython, applied as one remove and one add.
+    """
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.to_add = []
+        self.to_remove = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+
+    def add(self, paths):
+        self.to_add.extend(paths)
+
+    def remove(self, paths):
+        self.to_remove.extend(paths)
+
+    def commit(self):
+        if self.to_remove:
+            self.repo.index.remove(self.to_remove)
+        if self.to_add:
+            self.repo.index.add(self.to_add)
+
+
+class GitPythonBackend(GitBackend):
+    """
+    Fallback backend on top of GitPython.
+    """
+
+    name = "gitpython"
+
+    def __init__(self, repo_dir):
+        super().__init__(repo_dir)
+        from git import GitCommandError, InvalidGitRepositoryError, Repo
+
+        self._errors = (GitCommandError, InvalidGitRepositoryError)
+        try:
+            self.repo = Repo(repo_dir)
+        except (OSError, *self._errors) as e:
+            raise GitBackendError(e) from e
+
+    def is_bare(self):
+        return self.repo.bare
+
+    def current_branch(self):
+        return self.repo.active_branch.name
+
+    def status(self):
+        plan = StatusPlan(
+            self.repo_dir,
+            list_ignored=lambda: self.repo.git.ls_files(
+                "--ignored", "--cached", "--exclude-standard"
+            ).splitlines(),
+        )
+        plan.untracked = self.repo.git.ls_files(
+            "--others", "--exclude-standard"
+        ).splitlines()
+        for item in self.repo.index.diff(None):
+            if item.change_type == "D":
+                plan.deleted.append(item.a_path)
+            else:
+                plan.modified.append(item.a_path)
+        if self.repo.head.is_valid():
+            plan.staged = [item.a_path for item in self.repo.index.diff("HEAD")]
+        return plan
+
+    def transaction(self):
+        return _GitPythonTransaction(self.repo)
+
+    def commit(self, message):
+        try:
+            if self.repo.head.is_valid():
+                tree = self.repo.index.write_tree()
+                if tree.binsha == self.repo.head.commit.tree.binsha:
+                    return False
+            self.repo.index.commit(message)
+        except self._errors as e:
+            raise GitBackendError(e) from e
+        return True
+
+    def create_branch(self, branch_name, start_point="HEAD"):
+        try:
+            self.repo.create_head(branch_name, start_point)
+        except (OSError, *self._errors) as e:
+            raise GitBackendError(e) from e
+
+    def checkout(self, branch_name):
+        try:
+            self.repo.heads[branch_name].checkout()
+        except self._errors as e:
+            raise GitBackendError(e) from e
+
+
+BACKENDS = {
+    CliGitBackend.name: CliGitBackend,
+    GitPythonBackend.name: GitPythonBackend,
+}
+
+
+def open_backend(backend_name, repo_dir):
+    """
+    Function to open repo_dir with the backend registered under backend_name.
+    """
+    return BACKENDS[backend_name](repo_dir)
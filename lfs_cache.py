@@ -0,0 +1,291 @@
+import argparse
+import errno
+import os
+import re
+import shutil
+import sys
+import time
+
+from cache_utils import (
+    atomic_write_json,
+    cache_root,
+    file_lock,
+    file_sha256,
+    format_size,
+    parse_size,
+    read_json,
+    reflink_or_copy,
+)
+from git_backend import iter_git_records, run_git
+
+# Git LFS pointer files are small text files, anything larger is content
+MAX_POINTER_SIZE = 1024
+POINTER = re.compile(
+    rb"version https://git-lfs\.github\.com/spec/v1\n"
+    rb"oid sha256:([0-9a-f]{64})\n"
+    rb"size (\d+)\n"
+)
+
+
+def read_pointer(path):
+    """
+    Function to parse a Git LFS pointer file. Returns (oid, size), or None for any other file.
+    """
+    try:
+        if os.path.islink(path) or os.path.getsize(path) > MAX_POINTER_SIZE:
+            return None
+        with open(path, "rb") as file:
+            match = POINTER.match(file.read())
+    except OSError:
+        return None
+    return (match.group(1).decode(), int(match.group(2))) if match else None
+
+
+def list_pointers(repo_dir):
+    """
+    Function to list the LFS pointers checked out in a repository, as {oid: size}.
+    Files outside a sparse checkout are not there and so not listed.
+    """
+    pointers = {}
+    for record in iter_git_records(repo_dir, "ls-files", "-z"):
+        pointer = read_pointer(os.path.join(repo_dir, os.fsdecode(record)))
+        if pointer:
+            pointers[pointer[0]] = pointer[1]
+    return pointers
+
+
+def lfs_storage(repo_dir):
+    """
+    Function to return the LFS object directory of a repository, shared by its worktrees.
+    """
+    try:
+        storage = run_git(repo_dir, "config", "lfs.storage").decode().strip()
+    except Exception:
+        storage = ""
+    common_dir = run_git(repo_dir, "rev-parse", "--git-common-dir").decode().strip()
+    common_dir = os.path.join(repo_dir, common_dir)
+    if storage:
+        return os.path.join(common_dir, storage, "objects")
+    return os.path.join(common_dir, "lfs", "objects")
+
+
+def object_path(root, oid):
+    return os.path.join(root, oid[:2], oid[2:4], oid)
+
+
+def link_file(source, destination):
+    """
+    Function to place source at destination without copying its data when possible: hard link, then
+    reflink, then copy. Returns the method used.
+    """
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    temp_path = f"{destination}.{os.getpid()}.tmp"
+    try:
+        os.link(source, temp_path)
+        method = "link"
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+        method = reflink_or_copy(source, temp_path)
+    os.replace(temp_path, destination)
+    return method
+
+
+class LfsCache:
+    """
+    Git LFS objects shared by every checkout of the machine, stored once under their oid (the sha256 of
+    their content) in the layout of .git/lfs/objects, and linked into the LFS store of each checkout so
+    that git lfs pull only downloads the objects no checkout had yet.
+    stats.json keeps the hit and byte counts since the cache was created.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or cache_root("lfs_objects")
+        self.objects = os.path.join(self.root, "objects")
+        self.lock_path = os.path.join(self.root, "cache.lock")
+        self.stats_path = os.path.join(self.root, "stats.json")
+
+    def populate(self, repo_dir, pointers):
+        """
+        Function to link the cached objects of pointers into the LFS store of repo_dir.
+        Returns the run statistics: hits, misses, and bytes saved (not downloaded again).
+        """
+        storage = lfs_storage(repo_dir)
+        stats = {"hits": 0, "misses": 0, "bytes_saved": 0, "methods": {}}
+        with file_lock(self.lock_path, shared=True):
+            for oid, size in sorted(pointers.items()):
+                target = object_path(storage, oid)
+                if os.path.exists(target):
+                    continue
+                cached = object_path(self.objects, oid)
+                if not os.path.exists(cached):
+                    stats["misses"] += 1
+                    continue
+                method = link_file(cached, target)
+                stats["methods"][method] = stats["methods"].get(method, 0) + 1
+                os.utime(cached)
+                stats["hits"] += 1
+                stats["bytes_saved"] += size
+        return stats
+
+    def store(self, repo_dir, pointers):
+        """
+        Function to add the objects of pointers found in the LFS store of repo_dir to the cache, after
+        checking their hash. Returns the number of objects and bytes added.
+        """
+        storage = lfs_storage(repo_dir)
+        added = 0
+        added_bytes = 0
+        with file_lock(self.lock_path, shared=True):
+            for oid, size in sorted(pointers.items()):
+                source = object_path(storage, oid)
+                cached = object_path(self.objects, oid)
+                if os.path.exists(cached) or not os.path.isfile(source):
+                    continue
+                if file_sha256(source).hexdigest() != oid:
+                    print(f"Not caching corrupt LFS object {oid}", file=sys.stderr)
+                    continue
+                link_file(source, cached)
+                added += 1
+                added_bytes += size
+        return added, added_bytes
+
+    def record(self, run_stats):
+        with file_lock(self.lock_path):
+            totals = read_json(self.stats_path, {})
+            for key in ("hits", "misses", "bytes_saved"):
+                totals[key] = totals.get(key, 0) + run_stats[key]
+            atomic_write_json(self.stats_path, totals)
+        return totals
+
+    def entries(self):
+        """
+        Function to list the cached objects as (oid, size, last used, links), links counting the
+        checkouts still holding the object.
+        """
+        entries = []
+        for directory, _, files in os.walk(self.objects):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                info = os.stat(os.path.join(directory, name))
+                entries.append((name, info.st_size, info.st_mtime, info.st_nlink))
+        return entries
+
+    def evict(self, max_size):
+        """
+        Function to drop least recently used objects until the cache fits in max_size bytes.
+        Objects still linked from a checkout go last, removing them does not free their space.
+        Returns the evicted oids.
+        """
+        evicted = []
+        with file_lock(self.lock_path):
+            entries = self.entries()
+            total = sum(entry[1] for entry in entries)
+            for oid, size, _, _ in sorted(
+                entries, key=lambda entry: (entry[3] > 1, entry[2])
+            ):
+                if total <= max_size:
+                    break
+                os.unlink(object_path(self.objects, oid))
+                total -= size
+                evicted.append(oid)
+        return evicted
+
+
+def hit_rate(stats):
+    lookups = stats.get("hits", 0) + stats.get("misses", 0)
+    return 100.0 * stats.get("hits", 0) / lookups if lookups else 0.0
+
+
+def print_stats(label, stats):
+    print(
+        f"{label}: {stats.get('hits', 0)} hits, {stats.get('misses', 0)} misses "
+        f"({hit_rate(stats):.0f}% hit rate), {format_size(stats.get('bytes_saved', 0))} "
+        "not downloaded again"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Share Git LFS objects between SDK checkouts, linked into each one by oid."
+    )
+    parser.add_argument("--cache-dir", help="store location (default: in the cache)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    pull_parser = subparsers.add_parser(
+        "pull",
+        help="link the cached objects of a checkout, git lfs pull the others and cache them",
+    )
+    populate_parser = subparsers.add_parser(
+        "populate", help="only link the cached objects into a checkout"
+    )
+    store_parser = subparsers.add_parser(
+        "store", help="only add the objects of a checkout to the cache"
+    )
+    for subparser in (pull_parser, populate_parser, store_parser):
+        subparser.add_argument(
+            "repo", help="checkout, e.g. dependencies/simplicity_sdk"
+        )
+    for subparser in (pull_parser, store_parser):
+        subparser.add_argument("--max-size", help="evict down to this size, e.g. 20G")
+
+    subparsers.add_parser("stats", help="print the hit rate and size of the cache")
+    evict_parser = subparsers.add_parser(
+        "evict", help="drop least recently used objects"
+    )
+    evict_parser.add_argument("--max-size", required=True, help="e.g. 20G")
+    args = parser.parse_args()
+
+    cache = LfsCache(args.cache_dir)
+
+    if args.command == "stats":
+        entries = cache.entries()
+        print_stats("Total", read_json(cache.stats_path, {}))
+        shared = sum(1 for entry in entries if entry[3] > 1)
+        print(
+            f"{len(entries)} objects ({shared} linked into checkouts), "
+            f"{format_size(sum(entry[1] for entry in entries))}"
+        )
+        return
+
+    if args.command == "evict":
+        evicted = cache.evict(parse_size(args.max_size))
+        print(f"Evicted {len(evicted)} objects")
+        return
+
+    try:
+        pointers = list_pointers(args.repo)
+        if args.command in ("pull", "populate"):
+            stats = cache.populate(args.repo, pointers)
+            print_stats("This run", stats)
+            if stats["methods"]:
+                print(
+                    "Placed by "
+                    + ", ".join(
+                        f"{method} ({count})"
+                        for method, count in sorted(stats["methods"].items())
+                    )
+                )
+            print_stats("Total", cache.record(stats))
+        if args.command == "pull":
+            if shutil.which("git-lfs") is None:
+                print("git-lfs is not installed, missing objects were not pulled")
+            else:
+                start = time.monotonic()
+                run_git(args.repo, "lfs", "pull")
+                print(f"git lfs pull took {time.monotonic() - start:.1f}s")
+        if args.command in ("pull", "store"):
+            added, added_bytes = cache.store(args.repo, pointers)
+            print(f"Cached {added} new objects, {format_size(added_bytes)}")
+            if args.max_size:
+                evicted = cache.evict(parse_size(args.max_size))
+                if evicted:
+                    print(f"Evicted {len(evicted)} objects")
+    except Exception as e:
+        print(f"Error with the LFS objects of {args.repo}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
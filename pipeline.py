@@ -0,0 +1,541 @@
+import argparse
+import glob
+import hashlib
+import os
+import subprocess
+import sys
+import time
+
+from cache_utils import atomic_write_json, file_sha256, read_json, tree_digest
+
+PIPELINE_FILE = "pipeline.yaml"
+STATE_FILE = ".pipeline_state.json"
+LOG_DIR = "pipeline_logs"
+# Lines of the log of a failed stage printed with the error
+FAILURE_LOG_LINES = 20
+
+
+def expand(text, variables, where):
+    try:
+        return str(text).format(**variables)
+    except KeyError as e:
+        raise ValueError(f"{where}: no value for {e}") from e
+
+
+def resolve_variables(defined, given):
+    """
+    Function to resolve the variables of a pipeline, which may refer to the given ones and to the ones
+    defined before them. Given values take precedence.
+    """
+    variables = dict(given)
+    for name, value in (defined or {}).items():
+        if name not in given:
+            variables[name] = expand(value, variables, f"variables.{name}")
+    return variables
+
+
+def load_pipeline(path, variables):
+    """
+    Function to read the stages of a pipeline file, with their placeholders replaced.
+    Returns the stages, {name: stage}, in file order, each with the names of the stages it depends on:
+    its 'needs' and the stages producing its inputs. Raises ValueError for unknown or cyclic dependencies.
+    """
+    from yaml_io import safe_load
+
+    with open(path, "r") as file:
+        data = safe_load(file) or {}
+    variables = resolve_variables(data.get("variables"), variables)
+
+    stages = {}
+    for index, item in enumerate(data.get("stages") or []):
+        if not isinstance(item, dict) or not item.get("name") or not item.get("run"):
+            raise ValueError(f"stages[{index}]: a stage needs a 'name' and a 'run'")
+        name = str(item["name"])
+        if name in stages:
+            raise ValueError(f"stages[{index}]: duplicate stage '{name}'")
+        stages[name] = {
+            "name": name,
+            "run": expand(item["run"], variables, name),
+            "stub": (
+                expand(item["stub"], variables, name)
+                if item.get("stub") is not None
+                else None
+            ),
+            "inputs": [
+                expand(path, variables, name) for path in item.get("inputs") or []
+            ],
+            "outputs": [
+                expand(path, variables, name) for path in item.get("outputs") or []
+            ],
+            "exclude": [
+                expand(path, variables, name) for path in item.get("exclude") or []
+            ],
+            "needs": [str(need) for need in item.get("needs") or []],
+        }
+
+    for stage in stages.values():
+        for need in stage["needs"]:
+            if need not in stages:
+                raise ValueError(f"{stage['name']}: unknown stage '{need}' in needs")
+        depends = set(stage["needs"])
+        for path in stage["inputs"]:
+            producer = find_producer(stages, path)
+            if producer is not None and producer != stage["name"]:
+                depends.add(producer)
+        stage["depends"] = sorted(depends)
+    topological_order(stages)
+    return stages, variables
+
+
+def _normalize(path):
+    return os.path.normpath(path.rstrip("/"))
+
+
+def find_producer(stages, path):
+    """
+    Function to return the name of the stage whose outputs contain path, the one with the deepest output
+    when outputs are nested, or None.
+    """
+    path = _normalize(path)
+    producer = None
+    depth = -1
+    for stage in stages.values():
+        for output in stage["outputs"]:
+            output = _normalize(output)
+            if path == output or path.startswith(output + os.sep):
+                if len(output) > depth:
+                    producer, depth = stage["name"], len(output)
+    return producer
+
+
+def topological_order(stages):
+    """
+    Function to order the stages so that each comes after the stages it depends on.
+    Raises ValueError on a cycle.
+    """
+    order = []
+    state = {}
+
+    def visit(name, path):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"Dependency cycle: {' -> '.join(path + [name])}")
+        state[name] = "visiting"
+        for depend in stages[name]["depends"]:
+            visit(depend, path + [name])
+        state[name] = "done"
+        order.append(name)
+
+    for name in stages:
+        visit(name, [])
+    return order
+
+
+def upstream_stages(stages, name):
+    """
+    Function to return the names of the stages a stage depends on, directly or not.
+    """
+    upstream = set()
+    todo = list(stages[name]["depends"])
+    while todo:
+        depend = todo.pop()
+        if depend not in upstream:
+            upstream.add(depend)
+            todo.extend(stages[depend]["depends"])
+    return upstream
+
+
+def _is_excluded(path, excluded):
+    return any(path == item or path.startswith(item + os.sep) for item in excluded)
+
+
+def _contains_excluded(path, excluded):
+    return any(item.startswith(path + os.sep) for item in excluded)
+
+
+def path_digest(path, excluded=()):
+    """
+    Function to hash a file or directory input, or the glob pattern it is, leaving out the excluded
+    files and directories.
+    """
+    excluded = [_normalize(item) for item in excluded]
+    digest = hashlib.sha256()
+    matches = sorted(glob.glob(path.rstrip("/"), recursive=True))
+    while matches:
+        match = matches.pop(0)
+        if _is_excluded(os.path.normpath(match), excluded):
+            continue
+        if os.path.isdir(match):
+            # Only the directories holding an excluded path are listed, the others are hashed whole
+            if _contains_excluded(os.path.normpath(match), excluded):
+                matches[:0] = [
+                    os.path.join(match, name) for name in sorted(os.listdir(match))
+                ]
+                continue
+            digest.update(f"D\0{match}\0{tree_digest(match)[0]}\n".encode())
+        elif os.path.isfile(match):
+            digest.update(f"F\0{match}\0{file_sha256(match).hexdigest()}\n".encode())
+    return digest.hexdigest()
+
+
+def stage_key(stages, name, keys, command):
+    """
+    Function to hash what a stage's result depends on: its command, the keys of the stages it depends on,
+    and the content of its inputs no stage produces (those are covered by their producer's key).
+    Inputs are hashed without the stage's own outputs and 'exclude' paths, which it rewrites, nor the
+    outputs of the stages that do not run before it; outputs of the stages it depends on are hashed as found.
+    """
+    stage = stages[name]
+    upstream = upstream_stages(stages, name)
+    excluded = stage["exclude"] + [
+        output
+        for other in stages.values()
+        if other["name"] not in upstream
+        for output in other["outputs"]
+    ]
+    digest = hashlib.sha256(command.encode())
+    for depend in stage["depends"]:
+        digest.update(f"S\0{depend}\0{keys[depend]}\n".encode())
+    for path in stage["inputs"]:
+        if find_producer(stages, path) is None:
+            digest.update(f"I\0{path}\0{path_digest(path, excluded)}\n".encode())
+    return digest.hexdigest()
+
+
+def outputs_exist(stage):
+    return all(os.path.exists(path.rstrip("/")) for path in stage["outputs"])
+
+
+def stub_outputs(stage):
+    """
+    Function to create the outputs of a stage in place of running it: directories for the outputs ending
+    with '/', files holding the stage name otherwise.
+    """
+    for path in stage["outputs"]:
+        if path.endswith("/"):
+            os.makedirs(path, exist_ok=True)
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "w") as file:
+                file.write(f"{stage['name']}\n")
+
+
+def run_stage(stage, command, log_path, variables, stub=False):
+    """
+    Function to run the command of a stage with sh, its output going to log_path.
+    Returns the exit code.
+    """
+    if stub and command is None:
+        stub_outputs(stage)
+        return 0
+    env = dict(
+        os.environ, **{name.upper(): str(value) for name, value in variables.items()}
+    )
+    with open(log_path, "w") as log:
+        returncode = subprocess.call(
+            ["sh", "-c", command], stdout=log, stderr=subprocess.STDOUT, env=env
+        )
+    if returncode == 0 and stub:
+        stub_outputs(stage)
+    return returncode
+
+
+def run_pipeline(
+    stages,
+    variables,
+    jobs=4,
+    stub=False,
+    force=(),
+    state_file=STATE_FILE,
+    log_dir=LOG_DIR,
+):
+    """
+    Function to run the stages, each once the stages it depends on succeeded, at most jobs at a time.
+    A stage whose key matches the one of its last successful run, and whose outputs exist, is skipped.
+    Returns {name: result} with the status ('ran', 'skipped', 'failed', 'not run') and timings of each.
+    """
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+    os.makedirs(log_dir, exist_ok=True)
+    state = read_json(state_file, {})
+    keys = {}
+    results = {}
+    pending = list(topological_order(stages))
+    running = {}
+    start = time.monotonic()
+
+    def ready(name):
+        return all(
+            results.get(depend, {}).get("status") in ("ran", "skipped")
+            for depend in stages[name]["depends"]
+        )
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while pending or running:
+            for name in list(pending):
+                stage = stages[name]
+                if any(
+                    results.get(depend, {}).get("status") in ("failed", "not run")
+                    for depend in stage["depends"]
+                ):
+                    pending.remove(name)
+                    results[name] = {"status": "not run", "start": 0.0, "end": 0.0}
+                    continue
+                if not ready(name) or len(running) >= jobs:
+                    continue
+                pending.remove(name)
+                command = stage["stub"] if stub else stage["run"]
+                # Stubbed runs are keyed apart, a real run never skips a stage only stubbed
+                keys[name] = stage_key(
+                    stages, name, keys, ("stub\0" if stub else "") + stage["run"]
+                )
+                now = time.monotonic() - start
+                if (
+                    name not in force
+                    and state.get(name) == keys[name]
+                    and outputs_exist(stage)
+                ):
+                    results[name] = {"status": "skipped", "start": now, "end": now}
+                    continue
+                log_path = os.path.join(log_dir, f"{name}.log")
+                future = executor.submit(
+                    run_stage, stage, command, log_path, variables, stub
+                )
+                running[future] = (name, now, log_path)
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, started, log_path = running.pop(future)
+                try:
+                    returncode = future.result()
+                except OSError as e:
+                    print(f"{name}: {e}", file=sys.stderr)
+                    returncode = -1
+                end = time.monotonic() - start
+                results[name] = {
+                    "status": "ran" if returncode == 0 else "failed",
+                    "start": started,
+                    "end": end,
+                    "log": log_path,
+                }
+                if returncode == 0:
+                    state[name] = keys[name]
+                else:
+                    state.pop(name, None)
+                    results[name]["returncode"] = returncode
+                atomic_write_json(state_file, state)
+                print(
+                    f"{name}: {results[name]['status']} in {end - started:.1f}s",
+                    flush=True,
+                )
+    return results
+
+
+def critical_path(stages, results):
+    """
+    Function to find the chain of dependent stages with the longest total duration, which bounds the
+    duration of the pipeline whatever the concurrency. Returns the stage names and the total seconds.
+    """
+    finish = {}
+    previous = {}
+    for name in topological_order(stages):
+        result = results.get(name, {})
+        duration = result.get("end", 0.0) - result.get("start", 0.0)
+        best = max(
+            stages[name]["depends"], key=lambda depend: finish[depend], default=None
+        )
+        previous[name] = best
+        finish[name] = (finish[best] if best else 0.0) + duration
+    if not finish:
+        return [], 0.0
+    name = max(finish, key=finish.get)
+    total = finish[name]
+    path = []
+    while name:
+        path.append(name)
+        name = previous[name]
+    return path[::-1], total
+
+
+def write_report(stages, results, wall_seconds, report_file=None):
+    """
+    Function to print the critical path of a run, and write it with the timings of every stage as JSON.
+    """
+    path, total = critical_path(stages, results)
+    serial = sum(result["end"] - result["start"] for result in results.values())
+    counts = {}
+    for result in results.values():
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    print(", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+    print(f"Critical path ({total:.1f}s): {' -> '.join(path)}")
+    for name in path:
+        result = results[name]
+        print(f"  {name}: {result['end'] - result['start']:.1f}s ({result['status']})")
+    print(
+        f"Wall time {wall_seconds:.1f}s, {serial:.1f}s of stages "
+        f"({serial / wall_seconds if wall_seconds else 0.0:.1f}x concurrency)"
+    )
+    if report_file:
+        atomic_write_json(
+            report_file,
+            {
+                "wall_seconds": wall_seconds,
+                "critical_path": path,
+                "critical_path_seconds": total,
+                "stages": results,
+            },
+        )
+
+
+def project_variables(slcp_file, target_info_file, toolchain_file):
+    """
+    Function to read the variables the workflow takes from the project: SDK, project name, GCC version
+    and the first target of target_info.yaml.
+    """
+    from target_matrix import load_targets, load_yaml_file, read_project_sdk
+    from toolchain_resolver import load_resolver
+
+    slcp_data = load_yaml_file(slcp_file)
+    sdk_id, sdk_version = read_project_sdk(slcp_data)
+    variables = {
+        "slcp_file": os.path.basename(slcp_file),
+        "project_name": str(
+            slcp_data.get("project_name")
+            or os.path.splitext(os.path.basename(slcp_file))[0]
+        ),
+        "sdk_id": sdk_id,
+        "sdk_version": sdk_version,
+    }
+    if os.path.isfile(toolchain_file):
+        gcc = load_resolver(toolchain_file).lookup(sdk_id, sdk_version)
+        if gcc:
+            variables["gcc"] = gcc
+    if os.path.isfile(target_info_file):
+        targets = load_targets(load_yaml_file(target_info_file))
+        if targets:
+            variables["target_opn"] = targets[0]["target_opn"]
+            variables["target_configs"] = targets[0]["configs"].configuration()
+    return variables
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the build stages in dependency order, independent ones concurrently, "
+        "skipping those whose inputs did not change."
+    )
+    parser.add_argument(
+        "--pipeline",
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), PIPELINE_FILE),
+        help="stages file",
+    )
+    parser.add_argument("--slcp", help="read the project variables from a project")
+    parser.add_argument(
+        "--target-info", help="default: target_info.yaml next to the project"
+    )
+    parser.add_argument(
+        "--toolchains",
+        help="default: .github/sdk_toolchain_dependencies.yml next to the project",
+    )
+    parser.add_argument(
+        "--var", action="append", default=[], metavar="KEY=VALUE", help="variable value"
+    )
+    parser.add_argument("-j", "--jobs", type=int, default=4)
+    parser.add_argument(
+        "--stub",
+        action="store_true",
+        help="run the stub of each stage instead of its tools",
+    )
+    parser.add_argument(
+        "--force",
+        action="append",
+        default=[],
+        metavar="STAGE",
+        help="run a stage even if unchanged",
+    )
+    parser.add_argument(
+        "--only",
+        action="append",
+        metavar="STAGE",
+        help="run a stage and the stages it depends on",
+    )
+    parser.add_argument(
+        "--state", default=STATE_FILE, help="where the keys of the last runs are kept"
+    )
+    parser.add_argument("--log-dir", default=LOG_DIR)
+    parser.add_argument(
+        "--report", help="JSON file to write the timings and critical path to"
+    )
+    parser.add_argument("--list", action="store_true", help="print the stages and stop")
+    args = parser.parse_args()
+
+    variables = {}
+    try:
+        if args.slcp:
+            project_dir = os.path.dirname(args.slcp)
+            variables.update(
+                project_variables(
+                    args.slcp,
+                    args.target_info or os.path.join(project_dir, "target_info.yaml"),
+                    args.toolchains
+                    or os.path.join(
+                        project_dir, ".github", "sdk_toolchain_dependencies.yml"
+                    ),
+                )
+            )
+        for item in args.var:
+            key, separator, value = item.partition("=")
+            if not separator:
+                parser.error(f"--var expects KEY=VALUE, got '{item}'")
+            variables[key] = value
+        stages, variables = load_pipeline(args.pipeline, variables)
+    except (OSError, ValueError) as e:
+        print(f"Error loading the pipeline: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.only:
+        unknown = [name for name in args.only if name not in stages]
+        if unknown:
+            parser.error(f"unknown stages: {', '.join(unknown)}")
+        selected = set()
+        todo = list(args.only)
+        while todo:
+            name = todo.pop()
+            if name not in selected:
+                selected.add(name)
+                todo.extend(stages[name]["depends"])
+        stages = {name: stage for name, stage in stages.items() if name in selected}
+
+    if args.list:
+        for name in topological_order(stages):
+            depends = ", ".join(stages[name]["depends"]) or "-"
+            print(f"{name} (after: {depends})")
+        return
+
+    start = time.monotonic()
+    results = run_pipeline(
+        stages,
+        variables,
+        args.jobs,
+        args.stub,
+        set(args.force),
+        args.state,
+        args.log_dir,
+    )
+    write_report(stages, results, time.monotonic() - start, args.report)
+
+    failed = [name for name, result in results.items() if result["status"] == "failed"]
+    for name in failed:
+        print(
+            f"Stage {name} failed, last lines of {results[name]['log']}:",
+            file=sys.stderr,
+        )
+        with open(results[name]["log"], "r", errors="replace") as log:
+            for line in log.readlines()[-FAILURE_LOG_LINES:]:
+                print(f"  {line.rstrip()}", file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import argparse
+import os
+import sys
+
+from cache_utils import atomic_write_json, cache_root, read_json
+
+# Bumped whenever the layout of the on-disk index changes
+INDEX_FORMAT = 2
+
+# Component categories and provided features that tie a component to a board or a part
+BOARD_CATEGORY_PREFIXES = ("Platform|Board|", "Platform|Device|")
+BOARD_FEATURES = {"hardware_board", "device"}
+
+# Below this many files to parse, a process pool costs more than it saves
+PARALLEL_THRESHOLD = 64
+
+
+def _feature_names(entries):
+    """
+    Function to normalise 'provides'/'requires' lists into (name, conditions) pairs.
+    """
+    features = []
+    for entry in entries or []:
+        if isinstance(entry, dict) and "name" in entry:
+            condition = entry.get("condition") or []
+            features.append([str(entry["name"]), [str(item) for item in condition]])
+    return features
+
+
+def parse_slcc(slcc_path):
+    """
+    Function to extract the fields used by the catalog from one .slcc file.
+    Returns None when the file cannot be parsed.
+    """
+    from yaml_io import safe_load
+
+    try:
+        with open(slcc_path, "r", encoding="utf-8") as file:
+            data = safe_load(file)
+    except Exception as e:
+        print(f"Error parsing {slcc_path}: {e}")
+        return None
+    if not isinstance(data, dict) or "id" not in data:
+        return None
+
+    category = str(data.get("category") or "")
+    provides = [name for name, _ in _feature_names(data.get("provides"))]
+    board = category.startswith(BOARD_CATEGORY_PREFIXES) or bool(
+        BOARD_FEATURES.intersection(provides)
+    )
+    return {
+        "id": str(data["id"]),
+        "category": category,
+        "root_path": str(data.get("root_path") or ""),
+        "provides": provides,
+        "requires": _feature_names(data.get("requires")),
+        "board": board,
+    }
+
+
+def list_slcc_files(sdk_dir):
+    """
+    Function to list the .slcc files of an SDK, relative to sdk_dir.
+    """
+    if os.path.exists(os.path.join(sdk_dir, ".git")):
+        from git_backend import iter_git_records
+
+        return [
+            os.fsdecode(record)
+            for record in iter_git_records(sdk_dir, "ls-files", "-z", "--", "*.slcc")
+        ]
+
+    slcc_files = []
+    for root, dirs, files in os.walk(sdk_dir):
+        dirs[:] = [directory for directory in dirs if directory != ".git"]
+        for file in files:
+            if file.endswith(".slcc"):
+                slcc_path = os.path.relpath(os.path.join(root, file), sdk_dir)
+                slcc_files.append(slcc_path.replace(os.sep, "/"))
+    return slcc_files
+
+
+def read_sdk_identity(sdk_dir):
+    """
+    Function to read the SDK id and version from the .slcs file at the root of the SDK.
+    """
+    from yaml_io import safe_load
+
+    for entry in sorted(os.listdir(sdk_dir)):
+        if entry.endswith(".slcs"):
+            with open(os.path.join(sdk_dir, entry), "r", encoding="utf-8") as file:
+                data = safe_load(file) or {}
+            return str(data.get("id", entry[:-5])), str(data.get("sdk_version", ""))
+    return os.path.basename(os.path.abspath(sdk_dir)), ""
+
+
+class SdkCatalog:
+    """
+    Component metadata of one SDK, indexed by component id and by provided feature.
+    """
+
+    def __init__(self, sdk_id, sdk_version, files):
+        self.sdk_id = sdk_id
+        self.sdk_version = sdk_version
+        self.files = files
+        self.components = {}
+        self._providers = None
+        for slcc_path, entry in files.items():
+            component = entry["component"]
+            if component is not None:
+                self.components[component["id"]] = dict(component, file=slcc_path)
+
+    def get(self, component_id):
+        return self.components.get(component_id)
+
+    def is_board_component(self, component_id):
+        """
+        Function to tell whether a component is board specific, or None if the SDK does not know it.
+        """
+        component = self.components.get(component_id)
+        return None if component is None else component["board"]
+
+    def providers(self, feature):
+        """
+        Function to list the ids of the components providing a feature.
+        Every component provides its own id.
+        """
+        if self._providers is None:
+            self._providers = {}
+            for component_id, component in self.components.items():
+                self._providers.setdefault(component_id, []).append(component_id)
+                for name in component["provides"]:
+                    if name != component_id:
+                        self._providers.setdefault(name, []).append(component_id)
+        return self._providers.get(feature, [])
+
+
+def _parse_all(sdk_dir, slcc_paths, jobs):
+    full_paths = [os.path.join(sdk_dir, path) for path in slcc_paths]
+    if len(full_paths) < PARALLEL_THRESHOLD or jobs == 1:
+        return [parse_slcc(path) for path in full_paths]
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(parse_slcc, full_paths, chunksize=64))
+
+
+def load_catalog(sdk_dir, cache_dir=None, jobs=None, verbose=False):
+    """
+    Function to load the catalog of an SDK from its on-disk index, keyed by SDK id and version.
+    Only the .slcc files added or changed (by mtime or size) since the index was written are parsed.
+    """
+    sdk_id, sdk_version = read_sdk_identity(sdk_dir)
+    cache_dir = cache_dir or cache_root("sdk_catalog")
+    index_file = os.path.join(cache_dir, f"{sdk_id}-{sdk_version or 'unknown'}.json")
+
+    index = read_json(index_file, {})
+    if index.get("format") != INDEX_FORMAT:
+        index = {}
+    cached_files = index.get("files", {})
+
+    files = {}
+    stale = []
+    for slcc_path in list_slcc_files(sdk_dir):
+        try:
+            info = os.stat(os.path.join(sdk_dir, slcc_path))
+        except OSError:
+            continue
+        entry = cached_files.get(slcc_path)
+        if (
+            entry is not None
+            and entry["mtime_ns"] == info.st_mtime_ns
+            and entry["size"] == info.st_size
+        ):
+            files[slcc_path] = entry
+        else:
+            files[slcc_path] = {"mtime_ns": info.st_mtime_ns, "size": info.st_size}
+            stale.append(slcc_path)
+
+    if stale:
+        for slcc_path, component in zip(stale, _parse_all(sdk_dir, stale, jobs)):
+            files[slcc_path]["component"] = component
+    if stale or len(files) != len(cached_files):
+        atomic_write_json(
+            index_file,
+            {
+                "format": INDEX_FORMAT,
+                "sdk_id": sdk_id,
+                "sdk_version": sdk_version,
+                "files": files,
+            },
+        )
+    if verbose:
+        print(
+            f"SDK catalog {sdk_id} {sdk_version}: {len(files)} .slcc files, "
+            f"{len(stale)} parsed, index {index_file}"
+        )
+
+    return SdkCatalog(sdk_id, sdk_version, files)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Index the .slcc component files of an SDK and query board specific components."
+    )
+    parser.add_argument(
+        "sdk_dir", help="SDK checkout, e.g. dependencies/simplicity_sdk"
+    )
+    parser.add_argument("--cache-dir", help="where to keep the index")
+    parser.add_argument("-j", "--jobs", type=int, help="number of parser processes")
+    parser.add_argument(
+        "component_ids", nargs="*", help="components to look up in the catalog"
+    )
+    args = parser.parse_args()
+
+    catalog = load_catalog(args.sdk_dir, args.cache_dir, args.jobs, verbose=True)
+    board_count = sum(component["board"] for component in catalog.components.values())
+    print(f"{len(catalog.components)} components, {board_count} board specific")
+
+    unknown = False
+    for component_id in args.component_ids:
+        board = catalog.is_board_component(component_id)
+        if board is None:
+            unknown = True
+            print(f"{component_id}: unknown")
+        else:
+            print(f"{component_id}: {'board specific' if board else 'boardless'}")
+    sys.exit(1 if unknown else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+import argparse
+import os
+import shutil
+import sys
+
+from git_backend import run_git
+
+# Files every SDK checkout needs, whatever the components: the SDK description and the component
+# metadata, which slc reads to resolve a project
+METADATA_PATTERNS = ("/*.slcs", "*.slcc")
+
+
+def sdk_url(sdk_id):
+    return f"https://github.com/SiliconLabs/{sdk_id}.git"
+
+
+def read_project_components(slcp_data):
+    """
+    Function to list the component ids of a parsed .slcp file.
+    """
+    return [
+        str(item["id"])
+        for item in slcp_data.get("component") or []
+        if isinstance(item, dict) and item.get("id")
+    ]
+
+
+def resolve_sdk_paths(catalog, component_ids, metadata=True):
+    """
+    Function to return the SDK directories a set of components needs: the root path of every component
+    they (transitively) require, and with metadata the directories holding the .slcc files of the SDK.
+    Returns the sorted directories (None when the whole SDK is needed), and the requested ids the SDK
+    does not know.
+    """
+    from component_graph import ComponentGraph
+
+    known = [
+        component_id
+        for component_id in component_ids
+        if catalog.get(component_id) is not None
+    ]
+    unknown = sorted(set(component_ids) - set(known))
+
+    paths = set()
+    for component_id in ComponentGraph(catalog).reachable(known):
+        component = catalog.get(component_id)
+        if component is None:
+            continue
+        paths.add(component["root_path"] or os.path.dirname(component["file"]))
+    if metadata:
+        paths.update(
+            os.path.dirname(component["file"])
+            for component in catalog.components.values()
+        )
+
+    # Directories inside another one are covered by it
+    directories = []
+    for path in sorted(os.path.normpath(path).replace(os.sep, "/") for path in paths):
+        if path in ("", "."):
+            return None, unknown
+        if not directories or not path.startswith(directories[-1] + "/"):
+            directories.append(path)
+    return directories, unknown
+
+
+def clone_metadata(url, ref, dest, env=None):
+    """
+    Function to clone an SDK without file contents (--filter=blob:none) and check out its metadata only.
+    Blobs of other paths are fetched on demand, when a later sparse checkout needs them.
+    """
+    parent = os.path.dirname(os.path.abspath(dest)) or "."
+    os.makedirs(parent, exist_ok=True)
+    run_git(
+        parent,
+        "clone",
+        "--quiet",
+        "--filter=blob:none",
+        "--no-checkout",
+        "--depth=1",
+        f"--branch={ref}",
+        url,
+        os.path.abspath(dest),
+        env=env,
+    )
+    run_git(dest, "sparse-checkout", "set", "--no-cone", *METADATA_PATTERNS, env=env)
+    run_git(dest, "checkout", "--quiet", ref, env=env)
+
+
+def checkout_paths(dest, directories, env=None):
+    """
+    Function to restrict the working tree to directories (plus the files at the root), in cone mode.
+    """
+    run_git(dest, "sparse-checkout", "set", "--cone", *directories, env=env)
+
+
+def configure_lfs(dest, directories, pull=True, lfs_cache=None):
+    """
+    Function to limit Git LFS fetches to directories (all of them when None), and pull their objects when
+    git-lfs is installed, through lfs_cache (an LfsCache) when given. Returns False when git-lfs is missing.
+    """
+    if directories is not None:
+        include = ",".join(f"{directory}/**" for directory in directories)
+        run_git(dest, "config", "lfs.fetchinclude", include)
+    if not pull:
+        return True
+    if shutil.which("git-lfs") is None:
+        return False
+    if lfs_cache is None:
+        run_git(dest, "lfs", "pull")
+        return True
+
+    from lfs_cache import list_pointers, print_stats
+
+    pointers = list_pointers(dest)
+    stats = lfs_cache.populate(dest, pointers)
+    print_stats("LFS cache", stats)
+    lfs_cache.record(stats)
+    run_git(dest, "lfs", "pull")
+    lfs_cache.store(dest, pointers)
+    return True
+
+
+def working_tree_size(dest):
+    size = 0
+    count = 0
+    for root, dirs, files in os.walk(dest):
+        dirs[:] = [directory for directory in dirs if directory != ".git"]
+        for file in files:
+            size += os.lstat(os.path.join(root, file)).st_size
+            count += 1
+    return count, size
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check out only the parts of an SDK the components of a project need."
+    )
+    parser.add_argument("slcp", help="project file")
+    parser.add_argument(
+        "--dest", help="SDK checkout directory (default: dependencies/<sdk id>)"
+    )
+    parser.add_argument("--url", help="SDK repository (default: SiliconLabs on GitHub)")
+    parser.add_argument("--ref", help="tag to check out (default: v<sdk version>)")
+    parser.add_argument(
+        "--with",
+        dest="targets",
+        action="append",
+        help="board or part the project is generated for, may be repeated "
+        "(default: the targets of target_info.yaml)",
+    )
+    parser.add_argument(
+        "--extra-path", action="append", default=[], help="SDK directory to add"
+    )
+    parser.add_argument(
+        "--no-metadata",
+        action="store_true",
+        help="leave out the .slcc files of unused components, slc then cannot use the SDK",
+    )
+    parser.add_argument(
+        "--no-lfs-pull", action="store_true", help="only configure lfs.fetchinclude"
+    )
+    parser.add_argument(
+        "--lfs-cache",
+        action="store_true",
+        help="link LFS objects already pulled by other checkouts instead of downloading them",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="print the directories and stop"
+    )
+    args = parser.parse_args()
+
+    from sdk_catalog import load_catalog
+    from target_matrix import (
+        TARGET_INFO_FILE,
+        load_targets,
+        load_yaml_file,
+        read_project_sdk,
+    )
+
+    try:
+        slcp_data = load_yaml_file(args.slcp)
+        sdk_id, sdk_version = read_project_sdk(slcp_data)
+        targets = args.targets
+        if targets is None:
+            targets = []
+            if os.path.isfile(TARGET_INFO_FILE):
+                targets = [
+                    target["target_opn"]
+                    for target in load_targets(load_yaml_file(TARGET_INFO_FILE))
+                ]
+    except (OSError, ValueError) as e:
+        print(f"Error reading the project: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    dest = args.dest or os.path.join("dependencies", sdk_id)
+    url = args.url or sdk_url(sdk_id)
+    ref = args.ref or f"v{sdk_version}"
+    # LFS objects are pulled once the sparse checkout is known, never while checking out
+    env = dict(os.environ, GIT_LFS_SKIP_SMUDGE="1")
+
+    try:
+        if os.path.exists(dest):
+            print(f"{dest} already exists, only updating its sparse checkout")
+            # Back to the metadata of every component, which an earlier --no-metadata left out
+            run_git(
+                dest, "sparse-checkout", "set", "--no-cone", *METADATA_PATTERNS, env=env
+            )
+        else:
+            print(f"Cloning {url} at {ref} into {dest} without file contents")
+            clone_metadata(url, ref, dest, env)
+        catalog = load_catalog(dest)
+        component_ids = read_project_components(slcp_data)
+        component_ids += [target.lower() for target in targets]
+        directories, unknown = resolve_sdk_paths(
+            catalog, component_ids, metadata=not args.no_metadata
+        )
+        for component_id in unknown:
+            print(f"Component unknown to the SDK: {component_id}")
+        if directories is None:
+            print("The whole SDK is needed")
+        else:
+            directories = sorted(set(directories + args.extra_path))
+            print(f"{len(directories)} SDK directories needed")
+        if args.dry_run:
+            for directory in directories or []:
+                print(f"  {directory}")
+            return
+        if directories is None:
+            run_git(dest, "sparse-checkout", "disable", env=env)
+        else:
+            checkout_paths(dest, directories, env)
+        lfs_cache = None
+        if args.lfs_cache:
+            from lfs_cache import LfsCache
+
+            lfs_cache = LfsCache()
+        if not configure_lfs(
+            dest, directories, pull=not args.no_lfs_pull, lfs_cache=lfs_cache
+        ):
+            print("git-lfs is not installed, LFS objects were not pulled")
+    except Exception as e:
+        print(f"Error checking out the SDK: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    count, size = working_tree_size(dest)
+    print(f"Checked out {count} files, {size / (1 << 20):.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import argparse
+import os
+import re
+import shutil
+import sys
+import time
+
+from cache_utils import atomic_write_json, cache_root, file_lock, read_json
+from git_backend import run_git
+
+# Versions neither checked out nor used within this many seconds are dropped by gc
+MAX_UNUSED_SECONDS = 30 * 24 * 3600
+
+
+def mirror_name(url):
+    """
+    Function to name the mirror of a repository URL, e.g. github.com_SiliconLabs_simplicity_sdk.
+    """
+    name = re.sub(r"^[A-Za-z]+://", "", url.rstrip("/"))
+    name = re.sub(r"\.git\Z", "", name)
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", name).strip("_.")
+
+
+def version_tag(version):
+    return version if version.startswith("v") else f"v{version}"
+
+
+class SdkMirror:
+    """
+    Bare mirror of an SDK repository, holding the tags of the SDK versions builds asked for, and the
+    per-build checkouts made from it (shared clones using it as alternate, or worktrees).
+    versions.json records, per tag, when it was last used and the checkouts made of it.
+    """
+
+    def __init__(self, url, root=None):
+        self.url = url
+        root = root or cache_root("sdk_mirrors")
+        name = mirror_name(url)
+        self.path = os.path.join(root, f"{name}.git")
+        self.lock_path = os.path.join(root, f"{name}.lock")
+        self.versions_path = os.path.join(root, f"{name}.versions.json")
+
+    def _init(self):
+        if os.path.isdir(self.path):
+            return
+        staging = f"{self.path}.{os.getpid()}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        run_git(".", "init", "--quiet", "--bare", staging)
+        run_git(staging, "remote", "add", "origin", self.url)
+        # Only the tags of the versions in use are fetched, other refs are left on the server
+        run_git(staging, "config", "--unset-all", "remote.origin.fetch")
+        run_git(staging, "config", "remote.origin.tagOpt", "--no-tags")
+        os.rename(staging, self.path)
+
+    def _has_tag(self, tag):
+        try:
+            run_git(self.path, "rev-parse", "--verify", "--quiet", f"refs/tags/{tag}")
+        except Exception:
+            return False
+        return True
+
+    def _fetch(self, tags):
+        refspecs = [f"+refs/tags/{tag}:refs/tags/{tag}" for tag in tags]
+        run_git(self.path, "fetch", "--quiet", "--prune", "origin", *refspecs)
+
+    def _read_versions(self):
+        return read_json(self.versions_path, {})
+
+    def update(self):
+        """
+        Function to fetch, incrementally, every tag in use from the server.
+        Returns the tags fetched.
+        """
+        with file_lock(self.lock_path):
+            self._init()
+            tags = sorted(self._read_versions())
+            if tags:
+                self._fetch(tags)
+        return tags
+
+    def ensure(self, version):
+        """
+        Function to make sure the tag of version is in the mirror, fetching it when missing, and record
+        that it was used. Returns the tag.
+        """
+        tag = version_tag(version)
+        with file_lock(self.lock_path):
+            self._init()
+            if not self._has_tag(tag):
+                self._fetch([tag])
+            self._register(tag)
+        return tag
+
+    def _register(self, tag, checkout=None):
+        versions = self._read_versions()
+        entry = versions.setdefault(tag, {"used": 0, "checkouts": []})
+        entry["used"] = time.time()
+        if checkout and checkout not in entry["checkouts"]:
+            entry["checkouts"].append(checkout)
+        atomic_write_json(self.versions_path, versions)
+
+    def _checkout_tag(self, dest):
+        for tag, entry in self._read_versions().items():
+            if dest in entry["checkouts"]:
+                return tag
+        return None
+
+    def checkout(self, version, dest, worktree=False):
+        """
+        Function to check out version into dest, as a git worktree of the mirror or as a clone sharing its
+        objects (alternates), so that no object is copied or downloaded again. A checkout of the mirror
+        already in dest is moved to version, whichever kind it is.
+        """
+        tag = self.ensure(version)
+        dest = os.path.abspath(dest)
+        previous = self._checkout_tag(dest)
+        if os.path.exists(dest) and (
+            previous is None or not os.path.exists(os.path.join(dest, ".git"))
+        ):
+            raise ValueError(
+                f"{dest} already exists and is not a checkout of the mirror"
+            )
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        # Shared, so that gc (exclusive) never drops objects of a checkout being made
+        with file_lock(self.lock_path, shared=True):
+            if os.path.exists(dest):
+                # Clones see the objects of the mirror through their alternates, not its tags
+                commit = run_git(self.path, "rev-parse", f"refs/tags/{tag}^{{commit}}")
+                run_git(
+                    dest, "checkout", "--quiet", "--detach", commit.decode().strip()
+                )
+            elif worktree:
+                run_git(self.path, "worktree", "add", "--quiet", "--detach", dest, tag)
+            else:
+                run_git(
+                    ".",
+                    "clone",
+                    "--quiet",
+                    "--shared",
+                    "--no-checkout",
+                    self.path,
+                    dest,
+                )
+                run_git(dest, "remote", "set-url", "origin", self.url)
+                run_git(dest, "checkout", "--quiet", "--detach", tag)
+        with file_lock(self.lock_path):
+            if previous and previous != tag:
+                versions = self._read_versions()
+                if previous in versions:
+                    versions[previous]["checkouts"].remove(dest)
+                    atomic_write_json(self.versions_path, versions)
+            self._register(tag, dest)
+        return tag
+
+    def gc(self, max_unused=MAX_UNUSED_SECONDS):
+        """
+        Function to drop the tags no existing checkout uses and not used within max_unused seconds, then
+        the objects only they referenced. Returns the dropped tags.
+        """
+        dropped = []
+        with file_lock(self.lock_path):
+            if not os.path.isdir(self.path):
+                return dropped
+            versions = self._read_versions()
+            now = time.time()
+            for tag, entry in sorted(versions.items()):
+                entry["checkouts"] = [
+                    path
+                    for path in entry["checkouts"]
+                    if os.path.exists(os.path.join(path, ".git"))
+                ]
+                if entry["checkouts"] or now - entry["used"] < max_unused:
+                    continue
+                if self._has_tag(tag):
+                    run_git(self.path, "tag", "--delete", tag)
+                del versions[tag]
+                dropped.append(tag)
+            atomic_write_json(self.versions_path, versions)
+            run_git(self.path, "worktree", "prune")
+            run_git(self.path, "gc", "--quiet", "--prune=now")
+        return dropped
+
+    def versions(self):
+        return self._read_versions()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Keep one bare mirror per SDK repository and check SDK versions out of it."
+    )
+    parser.add_argument("--cache-dir", help="mirror location (default: in the cache)")
+    parser.add_argument(
+        "--url", help="SDK repository (default: SiliconLabs on GitHub, from the SDK id)"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    checkout_parser = subparsers.add_parser(
+        "checkout", help="check an SDK version out of the mirror"
+    )
+    checkout_parser.add_argument("sdk_id", nargs="?", help="e.g. simplicity_sdk")
+    checkout_parser.add_argument("sdk_version", nargs="?", help="e.g. 2024.6.2")
+    checkout_parser.add_argument(
+        "--slcp", help="read the SDK id and version from a project"
+    )
+    checkout_parser.add_argument(
+        "--dest", help="checkout directory (default: dependencies/<sdk id>)"
+    )
+    checkout_parser.add_argument(
+        "--worktree",
+        action="store_true",
+        help="create a git worktree of the mirror instead of a shared clone",
+    )
+
+    for name, help_text in (
+        ("update", "fetch the versions in use from the server"),
+        ("list", "list the versions in the mirror"),
+        ("gc", "drop the versions no checkout uses"),
+    ):
+        subparser = subparsers.add_parser(name, help=help_text)
+        subparser.add_argument("sdk_id", help="e.g. simplicity_sdk")
+    gc_parser = subparsers.choices["gc"]
+    gc_parser.add_argument(
+        "--max-unused",
+        type=int,
+        default=MAX_UNUSED_SECONDS,
+        help="keep versions used within this many seconds",
+    )
+    args = parser.parse_args()
+
+    from sdk_checkout import sdk_url
+
+    if args.command == "checkout":
+        if args.slcp:
+            from target_matrix import load_yaml_file, read_project_sdk
+
+            args.sdk_id, args.sdk_version = read_project_sdk(load_yaml_file(args.slcp))
+        if not args.sdk_id or not args.sdk_version:
+            parser.error("give an SDK id and version, or --slcp")
+
+    mirror = SdkMirror(args.url or sdk_url(args.sdk_id), args.cache_dir)
+
+    try:
+        if args.command == "checkout":
+            start = time.monotonic()
+            dest = args.dest or os.path.join("dependencies", args.sdk_id)
+            tag = mirror.checkout(args.sdk_version, dest, args.worktree)
+            print(f"{args.sdk_id} {tag} checked out in {time.monotonic() - start:.1f}s")
+        elif args.command == "update":
+            for tag in mirror.update():
+                print(f"Updated {tag}")
+        elif args.command == "list":
+            for tag, entry in sorted(mirror.versions().items()):
+                used = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["used"]))
+                print(f"{tag}: last used {used}, {len(entry['checkouts'])} checkouts")
+                for path in entry["checkouts"]:
+                    print(f"  {path}")
+        else:
+            for tag in mirror.gc(args.max_unused):
+                print(f"Dropped {tag}")
+    except Exception as e:
+        print(f"Error with the {mirror.url} mirror: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import re
+
+# Top level 'component:' key opening a block sequence
+COMPONENT_KEY = re.compile(r"component:\s*(#.*)?$")
+# 'id' key of a block mapping item, or inside a flow mapping item
+BLOCK_ID = re.compile(r"id:\s*(?P<value>[^\s#]+)")
+FLOW_ID = re.compile(r"[{,]\s*id:\s*(?P<value>[^,}\s]+)")
+SEQUENCE_ITEM = re.compile(r"-(\s|$)")
+
+
+def _indent(line):
+    return len(line) - len(line.lstrip(" "))
+
+
+def _is_blank_or_comment(line):
+    stripped = line.strip()
+    return not stripped or stripped.startswith("#")
+
+
+def _unquote(value):
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+        return value[1:-1]
+    return value
+
+
+def _item_id(item_lines, item_indent):
+    """
+    Function to find the 'id' of a sequence item, given its lines.
+    Returns None when the id is not written in a form this editor reads, e.g. a quoted key or a value on
+    the next line.
+    """
+    first_line = item_lines[0].rstrip("\r\n")
+    content = first_line[item_indent + 1 :].lstrip(" ")
+    if content.startswith("{"):
+        match = FLOW_ID.search("," + content[1:])
+        return _unquote(match.group("value")) if match else None
+    if content.startswith("id:"):
+        match = BLOCK_ID.match(content)
+        return _unquote(match.group("value")) if match else None
+
+    # 'id' may follow other keys of the same mapping
+    key_indent = len(first_line) - len(content)
+    for line in item_lines[1:]:
+        line = line.rstrip("\r\n")
+        if _indent(line) == key_indent and line.lstrip(" ").startswith("id:"):
+            match = BLOCK_ID.match(line.lstrip(" "))
+            return _unquote(match.group("value")) if match else None
+    return None
+
+
+def remove_components(slcp_text, should_remove):
+    """
+    Function to delete the items of the top level 'component' list whose id matches should_remove,
+    leaving every other byte of the file untouched.
+    Returns the edited text and the removed ids, or None when the list is not a block sequence
+    this editor understands and the file has to be rewritten through a YAML parser instead.
+    """
+    lines = slcp_text.splitlines(keepends=True)
+    output = []
+    removed_ids = []
+
+    index = 0
+    # Copy everything up to the 'component:' key
+    while index < len(lines):
+        line = lines[index]
+        output.append(line)
+        index += 1
+        if _indent(line) == 0 and COMPONENT_KEY.match(line.rstrip("\r\n")):
+            break
+    else:
+        return None
+
+    # Walk the sequence items, up to the next top level key
+    while index < len(lines):
+        line = lines[index]
+        if _is_blank_or_comment(line):
+            output.append(line)
+            index += 1
+            continue
+        item_indent = _indent(line)
+        if not SEQUENCE_ITEM.match(line.lstrip(" ")):
+            if item_indent == 0:
+                break
+            # Not a block sequence, e.g. a flow list continued on the next line
+            return None
+
+        # An item spans its '-' line and every more indented or blank line after it
+        end = index + 1
+        while end < len(lines) and (
+            not lines[end].strip() or _indent(lines[end]) > item_indent
+        ):
+            end += 1
+        # Trailing blank lines are kept, they separate the item from what follows
+        while end > index + 1 and not lines[end - 1].strip():
+            end -= 1
+
+        item_lines = lines[index:end]
+        id_value = _item_id(item_lines, item_indent)
+        if id_value is None:
+            # Every component has an id, this one is only written in a way not understood here
+            return None
+        if should_remove(id_value):
+            removed_ids.append(id_value)
+        else:
+            output.extend(item_lines)
+        index = end
+
+    output.extend(lines[index:])
+    return "".join(output), removed_ids
@@ -0,0 +1,310 @@
+import hashlib
+import http.client
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+
+from downloader import CHUNK_SIZE, RETRIES, RETRY_DELAY_SECONDS, DownloadError, open_url
+
+# Written in an extracted tree, holding the sha256 of the archive it came from
+MARKER_NAME = ".si_gh_actions.sha256"
+# tarfile stream modes of the archive formats decoded in process
+TAR_STREAM_MODES = {
+    ".tar.xz": "r|xz",
+    ".txz": "r|xz",
+    ".tar.gz": "r|gz",
+    ".tgz": "r|gz",
+    ".tar.bz2": "r|bz2",
+    ".tar.bz": "r|bz2",
+    ".tar": "r|",
+}
+
+
+class HashingReader:
+    """
+    File-like wrapper of an HTTP response hashing and counting the bytes as they are read.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.digest = hashlib.sha256()
+        self.bytes = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size if size and size > 0 else CHUNK_SIZE)
+        self.digest.update(data)
+        self.bytes += len(data)
+        return data
+
+    def drain(self):
+        while self.read(CHUNK_SIZE):
+            pass
+
+
+def archive_suffix(name):
+    for suffix in list(TAR_STREAM_MODES) + [".zip"]:
+        if name.lower().endswith(suffix):
+            return suffix
+    raise DownloadError(f"Unsupported archive type for {name}")
+
+
+def strip_path(name, strip_components):
+    """
+    Function to drop the leading components of an archive path, like tar --strip-components.
+    Returns None for the entries that disappear. Raises DownloadError for absolute paths and paths
+    going up with '..', which would be written outside of the destination.
+    """
+    name = name.replace("\\", "/")
+    parts = [part for part in name.split("/") if part not in ("", ".")]
+    if name.startswith("/") or ".." in parts or (parts and parts[0].endswith(":")):
+        raise DownloadError(f"Unsafe path in archive: {name}")
+    if len(parts) <= strip_components:
+        return None
+    return "/".join(parts[strip_components:])
+
+
+def check_symlink(name, target):
+    """
+    Function to refuse a symlink of the archive pointing outside of the extracted tree, through which
+    later members could be written anywhere.
+    """
+    resolved = os.path.normpath(os.path.join(os.path.dirname(name), target))
+    if os.path.isabs(target) or resolved == ".." or resolved.startswith("../"):
+        raise DownloadError(f"Unsafe symlink in archive: {name} -> {target}")
+
+
+def extract_tar_stream(fileobj, mode, destination, strip_components=0):
+    """
+    Function to extract a tar stream member by member as it is read, without seeking.
+    Paths and links are checked here, Pythons without tarfile.data_filter do not check them.
+    """
+    with tarfile.open(fileobj=fileobj, mode=mode, bufsize=CHUNK_SIZE) as tar_file:
+        for member in tar_file:
+            name = strip_path(member.name, strip_components)
+            if name is None:
+                continue
+            member.name = name
+            if member.islnk():
+                # Hard links point at other members, stripped the same way
+                member.linkname = strip_path(member.linkname, strip_components) or ""
+            elif member.issym():
+                check_symlink(name, member.linkname)
+            elif not (member.isfile() or member.isdir()):
+                # Devices and fifos have no place in a tool archive
+                raise DownloadError(f"Unsafe device or fifo in archive: {member.name}")
+            if hasattr(tarfile, "data_filter"):
+                tar_file.extract(member, destination, filter="tar")
+            else:
+                member.mode &= 0o777
+                tar_file.extract(member, destination)
+
+
+def extract_zip(zip_path, destination, strip_components=0):
+    """
+    Function to extract a zip archive with stripped paths, keeping file modes and symlinks.
+    """
+    import zipfile
+
+    root = os.path.realpath(destination)
+    with zipfile.ZipFile(zip_path) as zip_file:
+        for member in zip_file.infolist():
+            name = strip_path(member.filename, strip_components)
+            if name is None:
+                continue
+            path = os.path.realpath(os.path.join(destination, name))
+            if not path.startswith(root + os.sep):
+                raise DownloadError(f"Unsafe path in archive: {member.filename}")
+            if member.is_dir():
+                os.makedirs(path, exist_ok=True)
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            mode = member.external_attr >> 16
+            if stat.S_ISLNK(mode):
+                target = zip_file.read(member).decode()
+                check_symlink(name, target)
+                os.symlink(target, path)
+                continue
+            with zip_file.open(member) as source, open(path, "wb") as target:
+                shutil.copyfileobj(source, target, CHUNK_SIZE)
+            if mode & 0o777:
+                os.chmod(path, mode & 0o777)
+
+
+def _extract_xz_parallel(reader, destination, strip_components):
+    """
+    Function to decode xz with the multi-threaded xz tool, fed from the download by a thread while the
+    decoded tar stream is extracted here.
+    """
+    process = subprocess.Popen(
+        ["xz", "--decompress", "--stdout", "--threads=0"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+    )
+    feed_errors = []
+
+    def feed():
+        try:
+            for chunk in iter(lambda: reader.read(CHUNK_SIZE), b""):
+                process.stdin.write(chunk)
+        except BrokenPipeError:
+            pass
+        except Exception as e:
+            feed_errors.append(e)
+        finally:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+    try:
+        extract_tar_stream(process.stdout, "r|", destination, strip_components)
+        # Padding after the end of the archive
+        while process.stdout.read(CHUNK_SIZE):
+            pass
+    finally:
+        # Closing the output first stops xz, and so the feeder, when extraction failed
+        process.stdout.close()
+        feeder.join()
+        returncode = process.wait()
+    if feed_errors:
+        raise feed_errors[0]
+    if returncode != 0:
+        raise DownloadError(f"xz exited with {returncode}")
+
+
+def _check_length(reader, length):
+    if length is not None and reader.bytes < int(length):
+        raise ConnectionError(
+            f"connection dropped after {reader.bytes} of {length} bytes"
+        )
+
+
+def extract_response(response, suffix, staging, destination, strip_components):
+    """
+    Function to extract an archive from an HTTP response into destination, hashing it on the fly.
+    Tar archives never touch the disk; zip archives, which cannot be read without seeking, are spooled
+    into staging first. Returns the reader, holding the hash and the byte count.
+    """
+    reader = HashingReader(response)
+    length = response.getheader("Content-Length")
+    if suffix == ".zip":
+        zip_path = os.path.join(staging, "archive.zip")
+        with open(zip_path, "wb") as file:
+            for chunk in iter(lambda: reader.read(CHUNK_SIZE), b""):
+                file.write(chunk)
+        _check_length(reader, length)
+        extract_zip(zip_path, destination, strip_components)
+        os.unlink(zip_path)
+    elif TAR_STREAM_MODES[suffix] == "r|xz" and shutil.which("xz"):
+        _extract_xz_parallel(reader, destination, strip_components)
+    else:
+        extract_tar_stream(
+            reader, TAR_STREAM_MODES[suffix], destination, strip_components
+        )
+    reader.drain()
+    _check_length(reader, length)
+    return reader
+
+
+def read_marker(destination):
+    try:
+        with open(os.path.join(destination, MARKER_NAME), "r") as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def replace_tree(tree, destination):
+    """
+    Function to put tree in place of destination, the old tree being moved aside first so that
+    destination is never a mix of both.
+    """
+    old_tree = None
+    if os.path.lexists(destination):
+        old_tree = f"{tree}.old"
+        os.rename(destination, old_tree)
+    os.rename(tree, destination)
+    if old_tree:
+        shutil.rmtree(old_tree, ignore_errors=True)
+
+
+def download_and_extract(pool, entry, dest_dir, retries=RETRIES):
+    """
+    Function to download an archive entry straight into its 'extract' directory, without writing the
+    archive itself. The tree is extracted next to the directory and swapped in once its sha256 matched,
+    so peak disk usage is the extracted size; a pinned entry whose tree is already there is skipped.
+    Returns a dict describing the transfer.
+    """
+    destination = os.path.join(dest_dir, entry["extract"])
+    parent = os.path.dirname(os.path.abspath(destination))
+    os.makedirs(parent, exist_ok=True)
+    suffix = archive_suffix(entry["name"])
+    expected = entry.get("sha256")
+    start = time.monotonic()
+    total_bytes = 0
+
+    if expected and read_marker(destination) == expected:
+        return {
+            "name": entry["name"],
+            "path": destination,
+            "status": "cached",
+            "bytes": 0,
+            "resumed": 0,
+            "sha256": expected,
+            "seconds": 0.0,
+        }
+
+    for attempt in range(1, retries + 1):
+        staging = tempfile.mkdtemp(dir=parent, prefix=f".{entry['name']}-")
+        tree = os.path.join(staging, "tree")
+        try:
+            response = open_url(pool, entry["url"])
+            if response.status != 200:
+                response.read()
+                if response.status < 500:
+                    raise DownloadError(f"HTTP {response.status} for {entry['url']}")
+                raise ConnectionError(f"HTTP {response.status}")
+            os.makedirs(tree)
+            reader = extract_response(
+                response, suffix, staging, tree, entry.get("strip_components", 0)
+            )
+            total_bytes += reader.bytes
+            digest = reader.digest.hexdigest()
+            if expected and digest != expected:
+                raise DownloadError(
+                    f"sha256 {digest} does not match the pinned {expected}"
+                )
+            with open(os.path.join(tree, MARKER_NAME), "w") as file:
+                file.write(f"{digest}\n")
+            replace_tree(tree, destination)
+        except (OSError, http.client.HTTPException, tarfile.TarError) as e:
+            pool.close()
+            if attempt == retries:
+                raise DownloadError(f"{e} after {attempt} attempts") from e
+            print(
+                f"{entry['name']}: attempt {attempt} failed ({e!r}), retrying",
+                file=sys.stderr,
+            )
+            time.sleep(min(2 ** (attempt - 1), 30) * RETRY_DELAY_SECONDS)
+            continue
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        return {
+            "name": entry["name"],
+            "path": destination,
+            "status": "extracted",
+            "bytes": total_bytes,
+            "resumed": 0,
+            "sha256": digest,
+            "seconds": time.monotonic() - start,
+            "attempts": attempt,
+        }
@@ -0,0 +1,131 @@
+import argparse
+import hashlib
+import re
+import sys
+from collections.abc import Mapping
+from functools import lru_cache
+
+# Configuration names are C macros, values are passed as is to 'slc generate --configuration'
+CONFIG_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*\Z")
+CONFIG_VALUE = re.compile(r"[^\s,:]+\Z")
+# Integer literals as C reads them: hexadecimal, octal (a leading 0) or decimal; "08" is none of them
+INTEGER_VALUE = re.compile(r"[+-]?(?:0[xX][0-9A-Fa-f]+|0[0-7]*|[1-9][0-9]*)\Z")
+
+# Bumped whenever the canonical form changes, so that old cache keys are not reused
+HASH_FORMAT = 2
+
+
+def _typed_value(value):
+    """
+    Function to turn integer values into int with the rules of C, so "010" is 8, other values are kept as
+    strings.
+    """
+    if not INTEGER_VALUE.match(value):
+        return value
+    digits = value.lstrip("+-")
+    if digits[1:2] in ("x", "X"):
+        number = int(digits, 16)
+    elif digits.startswith("0"):
+        number = int(digits, 8)
+    else:
+        number = int(digits)
+    return -number if value.startswith("-") else number
+
+
+class TargetConfig(Mapping):
+    """
+    Parsed target configs: an immutable mapping of configuration name to typed value, in declaration order.
+    """
+
+    def __init__(self, items):
+        self._items = tuple(items)
+        self._values = {name: value for name, _, value in self._items}
+
+    def __getitem__(self, name):
+        return self._values[name]
+
+    def __iter__(self):
+        return (name for name, _, _ in self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return f"TargetConfig({self.configuration()!r})"
+
+    def configuration(self):
+        """
+        Function to return the string given to 'slc generate --configuration', values as written.
+        """
+        return ",".join(f"{name}:{text}" for name, text, _ in self._items)
+
+    def canonical(self):
+        """
+        Function to return a form independent of the order and of the spelling of integer values.
+        """
+        return ",".join(f"{name}:{self._values[name]}" for name in sorted(self._values))
+
+    def config_hash(self):
+        return _digest(f"{HASH_FORMAT}\0{self.canonical()}")
+
+    def target_hash(self, target_opn):
+        """
+        Function to return the cache key of a (target, config) pair, OPNs being case insensitive.
+        """
+        return _digest(f"{HASH_FORMAT}\0{target_opn.lower()}\0{self.canonical()}")
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _parse(configs):
+    items = []
+    seen = set()
+    for item in configs.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, separator, text = item.partition(":")
+        name, text = name.strip(), text.strip()
+        if not separator or not CONFIG_NAME.match(name) or not CONFIG_VALUE.match(text):
+            raise ValueError(f"Malformed configuration '{item}', expected NAME:VALUE")
+        if name in seen:
+            raise ValueError(f"Duplicate configuration '{name}'")
+        seen.add(name)
+        items.append((name, text, _typed_value(text)))
+    return TargetConfig(items)
+
+
+def parse_configs(configs):
+    """
+    Function to parse a target 'configs' string such as "SL_BOARD_ENABLE_VCOM:1,SL_BOARD_ENABLE_DISPLAY:0".
+    Raises ValueError on malformed or duplicate entries. Results are cached, targets often share configs.
+    """
+    return _parse(str(configs or ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Validate target configs strings and print their canonical form and hashes."
+    )
+    parser.add_argument("configs", help='e.g. "SL_BOARD_ENABLE_VCOM:1"')
+    parser.add_argument("--target", help="target OPN, to print the target hash")
+    args = parser.parse_args()
+
+    try:
+        config = parse_configs(args.configs)
+    except ValueError as e:
+        print(f"Error parsing configs: {e}", file=sys.stderr)
+        sys.exit(1)
+    for name, value in config.items():
+        print(f"{name} = {value!r}")
+    print(f"Canonical: {config.canonical()}")
+    print(f"Config hash: {config.config_hash()}")
+    if args.target:
+        print(f"Target hash: {config.target_hash(args.target)}")
+
+
+if __name__ == "__main__":
+    main()
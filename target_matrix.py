@@ -0,0 +1,271 @@
+import argparse
+import json
+import os
+import sys
+
+from target_configs import parse_configs
+from toolchain_resolver import TOOLCHAIN_FILE, ToolchainResolver, compile_ranges
+
+TARGET_INFO_FILE = "target_info.yaml"
+
+
+def target_key(slcp, target_opn, configs=""):
+    """
+    Function to identify a target build across runs: the same OPN can be built from several projects
+    and with several configs. The path is normalised and the configs put in canonical form, so that the
+    matrix and the command line give the same key. Raises ValueError on malformed configs.
+    """
+    slcp = os.path.normpath(slcp).replace(os.sep, "/")
+    return f"{slcp}|{target_opn}|{parse_configs(configs).canonical()}"
+
+
+def load_targets(target_info):
+    """
+    Function to validate the parsed content of target_info.yaml and return its targets, with their
+    configs parsed. Raises ValueError describing every invalid target.
+    """
+    if not isinstance(target_info, dict) or not isinstance(
+        target_info.get("targets"), list
+    ):
+        raise ValueError(f"{TARGET_INFO_FILE} must contain a 'targets' list")
+
+    targets = []
+    errors = []
+    for index, entry in enumerate(target_info["targets"]):
+        if not isinstance(entry, dict) or not entry.get("target_opn"):
+            errors.append(f"targets[{index}]: missing 'target_opn'")
+            continue
+        try:
+            configs = parse_configs(entry.get("configs"))
+        except ValueError as e:
+            errors.append(f"targets[{index}] ({entry['target_opn']}): {e}")
+            continue
+        targets.append(
+            {
+                "target_opn": str(entry["target_opn"]),
+                "part": str(entry["part"]) if entry.get("part") else None,
+                "configs": configs,
+            }
+        )
+    if errors:
+        raise ValueError("\n".join(errors))
+    return targets
+
+
+def read_project_sdk(slcp_data):
+    """
+    Function to read the SDK id and version a parsed .slcp file is built against.
+    """
+    sdk = slcp_data.get("sdk") if isinstance(slcp_data, dict) else None
+    if not isinstance(sdk, dict) or not sdk.get("id") or not sdk.get("version"):
+        raise ValueError("missing 'sdk' id and version")
+    return str(sdk["id"]), str(sdk["version"])
+
+
+def lookup_toolchain(toolchains, sdk_id, sdk_version):
+    """
+    Function to find the GCC version of an SDK release in sdk_toolchain_dependencies.yml, including
+    unlisted patch releases within a known range. Returns None when the release is not known.
+    """
+    return ToolchainResolver(compile_ranges(toolchains)).lookup(sdk_id, sdk_version)
+
+
+def board_part(catalog, target_opn):
+    """
+    Function to find the part of a board from the device components it requires in the SDK catalog.
+    Returns None when the catalog cannot tell.
+    """
+    if catalog is None:
+        return None
+    component = catalog.get(target_opn) or catalog.get(target_opn.lower())
+    if component is None:
+        return None
+    for feature, _ in component["requires"]:
+        for provider in catalog.providers(feature):
+            device = catalog.get(provider)
+            if device["category"].startswith("Platform|Device|"):
+                return provider
+    return None
+
+
+def resolve_part(target, catalog=None):
+    """
+    Function to return the part a target builds for: the 'part' given in target_info.yaml,
+    the device of a board according to the SDK catalog, or the OPN itself otherwise.
+    """
+    part = target["part"] or board_part(catalog, target["target_opn"])
+    return (part or target["target_opn"]).lower()
+
+
+def build_matrix(projects, targets, toolchains, catalog=None):
+    """
+    Function to build the 'strategy.matrix' of the build job: one entry per shard, a shard holding every
+    (project, target) pair that shares the same SDK, toolchain and part, so that setup happens once per shard.
+    projects is a list of (slcp_path, parsed slcp) pairs.
+    """
+    shards = {}
+    for slcp_path, slcp_data in projects:
+        try:
+            sdk_id, sdk_version = read_project_sdk(slcp_data)
+        except ValueError as e:
+            raise ValueError(f"{slcp_path}: {e}") from e
+        gcc = lookup_toolchain(toolchains, sdk_id, sdk_version)
+        if gcc is None:
+            raise ValueError(
+                f"{slcp_path}: no toolchain listed for {sdk_id} v{sdk_version} in {TOOLCHAIN_FILE}"
+            )
+        for target in targets:
+            part = resolve_part(target, catalog)
+            key = (sdk_id, sdk_version, gcc, part)
+            shard = shards.get(key)
+            if shard is None:
+                shard = shards[key] = {
+                    "shard": f"{sdk_id}-{sdk_version}-gcc{gcc}-{part}",
+                    "sdk_id": sdk_id,
+                    "sdk_version": sdk_version,
+                    "gcc": gcc,
+                    "part": part,
+                    "targets": [],
+                }
+            shard["targets"].append(
+                {
+                    "slcp": os.path.normpath(slcp_path).replace(os.sep, "/"),
+                    "target_opn": target["target_opn"],
+                    "configs": target["configs"].configuration(),
+                    "target_hash": target["configs"].target_hash(target["target_opn"]),
+                }
+            )
+    return {"include": list(shards.values())}
+
+
+def flatten_matrix(matrix):
+    """
+    Function to turn a sharded matrix into one matrix entry per (project, target) pair.
+    """
+    include = []
+    for shard in matrix["include"]:
+        common = {key: value for key, value in shard.items() if key != "targets"}
+        for target in shard["targets"]:
+            include.append(dict(common, **target))
+    return {"include": include}
+
+
+def load_yaml_file(path):
+    from yaml_io import safe_load
+
+    with open(path, "r") as file:
+        return safe_load(file)
+
+
+def project_paths(slcp_file, slcp_data):
+    """
+    Function to list the files and directories a project builds from, from its 'source', 'include' and
+    'config_file' entries, which may be outside of its directory (e.g. ../common/shared.c). Paths are
+    normalised and relative to where slcp_file is relative to, directories end with '/'.
+    """
+    project_dir = os.path.dirname(slcp_file)
+    paths = set()
+
+    def add(path, directory=False):
+        path = os.path.normpath(os.path.join(project_dir, path)).replace(os.sep, "/")
+        paths.add(path + "/" if directory else path)
+
+    for section, directory in (
+        ("source", False),
+        ("include", True),
+        ("config_file", False),
+    ):
+        for item in (slcp_data or {}).get(section) or []:
+            if isinstance(item, dict) and item.get("path"):
+                add(str(item["path"]), directory)
+    return sorted(paths)
+
+
+def load_matrix(
+    target_info_file=TARGET_INFO_FILE,
+    toolchain_file=TOOLCHAIN_FILE,
+    slcp_files=None,
+    sdk_dir=None,
+):
+    """
+    Function to build the sharded matrix from the files of the project.
+    Every .slcp of the project is used when slcp_files is not given.
+    """
+    targets = load_targets(load_yaml_file(target_info_file))
+    toolchains = load_yaml_file(toolchain_file)
+    if not slcp_files:
+        from boardlessify import find_slcp_files
+
+        slcp_files = find_slcp_files(".")
+    if not slcp_files:
+        raise ValueError("No .slcp file found")
+    projects = [(slcp_file, load_yaml_file(slcp_file)) for slcp_file in slcp_files]
+    catalog = None
+    if sdk_dir:
+        from sdk_catalog import load_catalog
+
+        catalog = load_catalog(sdk_dir)
+    return build_matrix(projects, targets, toolchains, catalog)
+
+
+def add_matrix_arguments(parser):
+    """
+    Function to add the options selecting the project files, shared with the scripts consuming the matrix.
+    """
+    parser.add_argument(
+        "--target-info", default=TARGET_INFO_FILE, help="targets and their configs"
+    )
+    parser.add_argument(
+        "--toolchains",
+        default=TOOLCHAIN_FILE,
+        help="SDK to toolchain versions",
+    )
+    parser.add_argument(
+        "--slcp",
+        action="append",
+        help="project file, may be repeated (default: every .slcp of the project)",
+    )
+    parser.add_argument("--sdk", help="SDK checkout used to find the part of boards")
+    parser.add_argument(
+        "--github-output",
+        action="store_true",
+        help="append 'matrix=<json>' to the $GITHUB_OUTPUT file",
+    )
+
+
+def write_matrix(matrix, github_output=False):
+    """
+    Function to print the matrix as compact JSON, and append it to $GITHUB_OUTPUT when asked.
+    """
+    matrix_json = json.dumps(matrix, separators=(",", ":"))
+    if github_output:
+        with open(os.environ["GITHUB_OUTPUT"], "a") as file:
+            file.write(f"matrix={matrix_json}\n")
+    print(matrix_json)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=f"Expand {TARGET_INFO_FILE} into a GitHub Actions strategy.matrix JSON."
+    )
+    add_matrix_arguments(parser)
+    parser.add_argument(
+        "--per-target",
+        action="store_true",
+        help="one matrix entry per target instead of one per shard",
+    )
+    args = parser.parse_args()
+
+    try:
+        matrix = load_matrix(args.target_info, args.toolchains, args.slcp, args.sdk)
+    except (OSError, ValueError) as e:
+        print(f"Error building the target matrix: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.per_target:
+        matrix = flatten_matrix(matrix)
+    write_matrix(matrix, args.github_output)
+
+
+if __name__ == "__main__":
+    main()
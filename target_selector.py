@@ -0,0 +1,362 @@
+import argparse
+import fnmatch
+import os
+import sys
+
+from cache_utils import atomic_write_json, cache_root, read_json
+from target_matrix import (
+    TARGET_INFO_FILE,
+    TOOLCHAIN_FILE,
+    add_matrix_arguments,
+    flatten_matrix,
+    load_matrix,
+    load_targets,
+    project_paths,
+    read_project_sdk,
+    target_key,
+    write_matrix,
+)
+from toolchain_resolver import ToolchainResolver, compile_ranges
+
+STATE_FORMAT = 1
+STATE_FILE_NAME = "last_good.json"
+
+# Changes that never affect a build
+IGNORED_PATTERNS = ("*.md", "LICENSE", ".github/release-drafter.yml", ".github/pr-*")
+# Changes to the build procedure itself, that affect every target
+GLOBAL_PATTERNS = (".github/workflows/*",)
+
+
+def default_state_file():
+    return os.path.join(cache_root(), STATE_FILE_NAME)
+
+
+class LastGoodState:
+    """
+    Last commit each target was successfully built at, stored in a small JSON file.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_state_file()
+        data = read_json(self.path, {})
+        if data.get("format") != STATE_FORMAT:
+            data = {}
+        self.targets = data.get("targets", {})
+
+    def get(self, key):
+        return self.targets.get(key)
+
+    def mark_good(self, keys, sha):
+        for key in keys:
+            self.targets[key] = sha
+
+    def save(self):
+        atomic_write_json(self.path, {"format": STATE_FORMAT, "targets": self.targets})
+
+
+def resolve_commit(repo_dir, rev):
+    """
+    Function to return the full SHA of a commit, or None when the repository does not have it
+    (e.g. after a force push).
+    """
+    from subprocess import CalledProcessError
+    from git_backend import run_git
+
+    try:
+        output = run_git(
+            repo_dir, "rev-parse", "--verify", "--quiet", f"{rev}^{{commit}}"
+        )
+    except CalledProcessError:
+        return None
+    return output.decode().strip()
+
+
+def read_file_at(repo_dir, commit, path):
+    """
+    Function to return the content of a file at a commit, or None when it does not exist there.
+    """
+    from git_backend import run_git
+
+    listing = run_git(repo_dir, "ls-tree", "-z", commit, "--", path)
+    if not listing:
+        return None
+    sha = listing.split(b"\0")[0].split(b"\t")[0].split()[2].decode()
+    return run_git(repo_dir, "cat-file", "blob", sha).decode()
+
+
+def changed_paths(repo_dir, base, head):
+    """
+    Function to list the paths changed between two commits, both sides of renames included.
+    """
+    from git_backend import iter_git_records
+
+    return [
+        os.fsdecode(record)
+        for record in iter_git_records(
+            repo_dir, "diff", "--name-only", "-z", "--no-renames", base, head
+        )
+    ]
+
+
+def _load_yaml_at(repo_dir, commit, path):
+    from yaml_io import safe_load
+
+    content = read_file_at(repo_dir, commit, path)
+    return None if content is None else safe_load(content)
+
+
+def _changed_target_entries(repo_dir, base, head):
+    """
+    Function to return the (target_opn, configs) of the target_info.yaml entries added or changed since base.
+    Returns None when the old file cannot be compared.
+    """
+    try:
+        old_data = _load_yaml_at(repo_dir, base, TARGET_INFO_FILE)
+        old_targets = load_targets(old_data) if old_data is not None else []
+        new_targets = load_targets(_load_yaml_at(repo_dir, head, TARGET_INFO_FILE))
+    except ValueError:
+        return None
+
+    def index(targets):
+        return {
+            (target["target_opn"], target["configs"].configuration()): target
+            for target in targets
+        }
+
+    old_index = index(old_targets)
+    return {
+        identity
+        for identity, target in index(new_targets).items()
+        if old_index.get(identity) != target
+    }
+
+
+def _toolchain_row_changed(repo_dir, base, head, sdk_id, sdk_version):
+    rows = []
+    for commit in (base, head):
+        try:
+            toolchains = _load_yaml_at(repo_dir, commit, TOOLCHAIN_FILE) or {}
+        except ValueError:
+            return True
+        rows.append(
+            ToolchainResolver(compile_ranges(toolchains)).resolve(sdk_id, sdk_version)[
+                0
+            ]
+        )
+    return rows[0] != rows[1]
+
+
+def _is_under(path, directory):
+    return directory in ("", "./") or path.startswith(directory)
+
+
+def _project_owns(path, slcp, owned_paths):
+    """
+    Function to tell whether a changed path is part of a project: its directory, or one of the files and
+    directories its .slcp builds from.
+    """
+    project_dir = os.path.dirname(slcp)
+    if _is_under(path, project_dir + "/" if project_dir else ""):
+        return True
+    return any(
+        _is_under(path, owned) if owned.endswith("/") else path == owned
+        for owned in owned_paths
+    )
+
+
+def _read_project_paths(slcp):
+    from target_matrix import load_yaml_file
+
+    try:
+        return project_paths(slcp, load_yaml_file(slcp))
+    except Exception:
+        # Without a readable .slcp, only its directory is known to belong to it
+        return []
+
+
+def affected_entries(repo_dir, entries, base, head, paths):
+    """
+    Function to map the paths changed between base and head to the matrix entries they affect.
+    A path no project builds from affects every entry, nothing tells it is not used.
+    Returns a dict of entry key to the reason it is affected.
+    """
+    from yaml_io import safe_load
+
+    affected = {}
+    projects = {}
+    for key, entry in entries.items():
+        projects.setdefault(entry["slcp"], []).append(key)
+    owned_paths = {slcp: _read_project_paths(slcp) for slcp in projects}
+
+    def add(keys, reason):
+        for key in keys:
+            affected.setdefault(key, reason)
+
+    for path in paths:
+        if path == TOOLCHAIN_FILE.replace(os.sep, "/"):
+            # Only the targets of projects whose SDK row changed are affected
+            for slcp, keys in projects.items():
+                with open(slcp, "r") as file:
+                    sdk_id, sdk_version = read_project_sdk(safe_load(file))
+                if _toolchain_row_changed(repo_dir, base, head, sdk_id, sdk_version):
+                    add(keys, f"{sdk_id} v{sdk_version} toolchain changed")
+        elif path == TARGET_INFO_FILE:
+            changed = _changed_target_entries(repo_dir, base, head)
+            for key, entry in entries.items():
+                if (
+                    changed is None
+                    or (entry["target_opn"], entry["configs"]) in changed
+                ):
+                    add([key], f"{TARGET_INFO_FILE} entry changed")
+        elif any(fnmatch.fnmatch(path, pattern) for pattern in IGNORED_PATTERNS):
+            continue
+        elif any(fnmatch.fnmatch(path, pattern) for pattern in GLOBAL_PATTERNS):
+            add(entries, f"{path} changed")
+        else:
+            owners = [
+                slcp
+                for slcp in projects
+                if _project_owns(path, slcp, owned_paths[slcp])
+            ]
+            if not owners:
+                add(entries, f"{path} changed, outside of every project")
+            for slcp in owners:
+                keys = projects[slcp]
+                if path == slcp:
+                    add(keys, f"{slcp} changed")
+                    continue
+                # Files under a directory named after a target only affect that target
+                segments = set(path.lower().split("/")[:-1])
+                named = [
+                    key
+                    for key in keys
+                    if entries[key]["target_opn"].lower() in segments
+                ]
+                if named:
+                    add(named, f"{path} changed")
+                elif not segments.intersection(
+                    entries[key]["target_opn"].lower() for key in keys
+                ):
+                    add(keys, f"{path} changed")
+    return affected
+
+
+def select_targets(repo_dir, matrix, state, head="HEAD", base=None):
+    """
+    Function to keep only the targets of the matrix affected by the changes since their last good commit.
+    Returns the filtered matrix and a dict of selected entry key to the reason it is built.
+    """
+    head_commit = resolve_commit(repo_dir, head)
+    if head_commit is None:
+        raise ValueError(f"Unknown commit {head}")
+
+    entries = {}
+    for entry in flatten_matrix(matrix)["include"]:
+        entries[target_key(entry["slcp"], entry["target_opn"], entry["configs"])] = (
+            entry
+        )
+
+    # Targets sharing a last good commit share the diff
+    by_base = {}
+    selected = {}
+    # Most targets share their last good commit, each is resolved once
+    resolved = {}
+    for key in entries:
+        last_good = base or state.get(key)
+        if last_good and last_good not in resolved:
+            resolved[last_good] = resolve_commit(repo_dir, last_good)
+        base_commit = resolved[last_good] if last_good else None
+        if base_commit is None:
+            selected[key] = "no last good commit" if not last_good else "unknown base"
+        elif base_commit != head_commit:
+            by_base.setdefault(base_commit, {})[key] = entries[key]
+
+    for base_commit, base_entries in by_base.items():
+        paths = changed_paths(repo_dir, base_commit, head_commit)
+        selected.update(
+            affected_entries(repo_dir, base_entries, base_commit, head_commit, paths)
+        )
+
+    include = []
+    for shard in matrix["include"]:
+        targets = [
+            target
+            for target in shard["targets"]
+            if target_key(target["slcp"], target["target_opn"], target["configs"])
+            in selected
+        ]
+        if targets:
+            include.append(dict(shard, targets=targets))
+    return {"include": include}, selected
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Select the targets affected by the changes since they were last built successfully."
+    )
+    parser.add_argument(
+        "--state", help="last good commits file (default: in the cache)"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    select_parser = subparsers.add_parser("select", help="print the targets to build")
+    select_parser.add_argument("--head", default="HEAD", help="pushed commit")
+    select_parser.add_argument(
+        "--base",
+        help="compare every target with this commit instead of its last good one",
+    )
+    select_parser.add_argument(
+        "--json", action="store_true", help="print the selected matrix as JSON"
+    )
+    select_parser.add_argument(
+        "--per-target",
+        action="store_true",
+        help="one matrix entry per target instead of one per shard",
+    )
+    add_matrix_arguments(select_parser)
+
+    good_parser = subparsers.add_parser(
+        "mark-good", help="record the commit targets were successfully built at"
+    )
+    good_parser.add_argument("--head", default="HEAD", help="built commit")
+    good_parser.add_argument("--slcp", required=True, help="project file")
+    good_parser.add_argument("--target", required=True, help="target OPN")
+    good_parser.add_argument("--configs", default="", help="target configs")
+    args = parser.parse_args()
+
+    state = LastGoodState(args.state)
+
+    if args.command == "mark-good":
+        head_commit = resolve_commit(".", args.head)
+        if head_commit is None:
+            print(f"Unknown commit {args.head}", file=sys.stderr)
+            sys.exit(1)
+        try:
+            key = target_key(args.slcp, args.target, args.configs)
+        except ValueError as e:
+            print(f"Error parsing configs: {e}", file=sys.stderr)
+            sys.exit(1)
+        state.mark_good([key], head_commit)
+        state.save()
+        return
+
+    try:
+        matrix = load_matrix(args.target_info, args.toolchains, args.slcp, args.sdk)
+        matrix, selected = select_targets(".", matrix, state, args.head, args.base)
+    except (OSError, ValueError) as e:
+        print(f"Error selecting targets: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    # The JSON goes to stdout on its own, so the report goes to stderr
+    report = sys.stderr if args.json or args.github_output else sys.stdout
+    for key, reason in selected.items():
+        print(f"Selected {key}: {reason}", file=report)
+    print(f"{len(selected)} target(s) to build", file=report)
+    if args.json or args.github_output:
+        if args.per_target:
+            matrix = flatten_matrix(matrix)
+        write_matrix(matrix, args.github_output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# The scripts are top-level modules of the repository, the benchmarks are run small by the tests
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT_DIR, os.path.join(ROOT_DIR, "benchmarks")]
+
+# Commits made by the tests never depend on the git configuration of the machine
+os.environ.update(
+    GIT_AUTHOR_NAME="test",
+    GIT_AUTHOR_EMAIL="test@example.com",
+    GIT_COMMITTER_NAME="test",
+    GIT_COMMITTER_EMAIL="test@example.com",
+    GIT_CONFIG_NOSYSTEM="1",
+)
+
+
+def git(repo_dir, *args, input=None):
+    return subprocess.run(
+        ["git", *args],
+        cwd=repo_dir,
+        input=input,
+        stdout=subprocess.PIPE,
+        check=True,
+    ).stdout.decode()
+
+
+def write_file(path, content=""):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    mode = "wb" if isinstance(content, bytes) else "w"
+    with open(path, mode) as file:
+        file.write(content)
+
+
+@pytest.fixture
+def git_repo(tmp_path):
+    """
+    Empty repository with a 'main' branch.
+    """
+    repo_dir = str(tmp_path / "repo")
+    os.makedirs(repo_dir)
+    git(repo_dir, "init", "-q", "-b", "main")
+    return repo_dir
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """
+    si_gh_actions cache of the test only.
+    """
+    path = str(tmp_path / "cache")
+    monkeypatch.setenv("SI_GH_ACTIONS_CACHE", path)
+    return path
+
+
+class FileServer:
+    """
+    Local HTTP/1.1 server of in-memory files, honouring single 'bytes=N-' ranges. truncate[name] is the
+    number of next responses of the file cut after half their body; requests logs (path, Range header).
+    """
+
+    def __init__(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.files = {}
+        self.truncate = {}
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                name = self.path.lstrip("/")
+                server.requests.append((self.path, self.headers.get("Range")))
+                data = server.files.get(name)
+                if data is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                offset = 0
+                range_header = self.headers.get("Range")
+                if range_header:
+                    offset = int(range_header[len("bytes=") :].rstrip("-"))
+                    if offset >= len(data):
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(data)}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header(
+                        "Content-Range", f"bytes {offset}-{len(data) - 1}/{len(data)}"
+                    )
+                else:
+                    self.send_response(200)
+                body = data[offset:]
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if server.truncate.get(name):
+                    server.truncate[name] -= 1
+                    body = body[: len(body) // 2]
+                    self.close_connection = True
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def url(self, name):
+        return f"{self.base_url}/{name}"
+
+
+@pytest.fixture
+def file_server(monkeypatch):
+    import threading
+
+    import downloader
+    import stream_extract
+
+    # Retries of the tests are immediate
+    monkeypatch.setattr(downloader, "RETRY_DELAY_SECONDS", 0)
+    monkeypatch.setattr(stream_extract, "RETRY_DELAY_SECONDS", 0)
+    server = FileServer()
+    thread = threading.Thread(
+        target=server.httpd.serve_forever, args=(0.05,), daemon=True
+    )
+    thread.start()
+    yield server
+    server.httpd.shutdown()
+    server.httpd.server_close()
@@ -0,0 +1,122 @@
+import glob
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT_DIR, git, write_file
+
+pytest.importorskip("yaml")
+
+SLCP = """project_name: app
+sdk: {id: simplicity_sdk, version: 2024.6.2}
+component:
+- {id: brd4186c}
+- instance: [vcom]
+  id: iostream_usart
+- {id: brd4002a}
+- {id: app_log}
+"""
+
+
+@pytest.fixture
+def project(git_repo):
+    """
+    Committed project with si_gh_actions in it, a tracked build output and log the copied .gitignore
+    ignores, and a .slcp with board components.
+    """
+    scripts_dir = os.path.join(git_repo, "si_gh_actions")
+    os.makedirs(scripts_dir)
+    for path in glob.glob(os.path.join(ROOT_DIR, "*.py")):
+        shutil.copy(path, scripts_dir)
+    shutil.copy(os.path.join(ROOT_DIR, "component_rules.yaml"), scripts_dir)
+    write_file(os.path.join(scripts_dir, "VERSION.md"), "1.2.3\n")
+    write_file(os.path.join(scripts_dir, "CHANGELOG.md"), "# Changelog\n")
+    write_file(os.path.join(scripts_dir, ".gitignore"), "*.log\nbuild/\n")
+    write_file(os.path.join(scripts_dir, "target_info.yaml"), "targets: []\n")
+    write_file(
+        os.path.join(scripts_dir, ".github", "workflows", "ci.yml"), "on: push\n"
+    )
+    write_file(os.path.join(git_repo, "app", "app.slcp"), SLCP)
+    write_file(os.path.join(git_repo, "app", "app.c"), "int main(void) { return 0; }\n")
+    write_file(os.path.join(git_repo, "build", "out.bin"), "binary\n")
+    write_file(os.path.join(git_repo, "notes.log"), "log\n")
+    git(git_repo, "add", "-A")
+    git(git_repo, "commit", "-q", "-m", "project")
+    return git_repo
+
+
+def boardlessify(repo_dir, script_repo, *args):
+    result = subprocess.run(
+        [
+            sys.executable,
+            os.path.join(script_repo, "si_gh_actions", "boardlessify.py"),
+            *args,
+        ],
+        cwd=repo_dir,
+        env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1"),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    assert result.returncode == 0, result.stdout
+    return result.stdout
+
+
+def dev_tree(repo_dir):
+    return git(repo_dir, "rev-parse", "dev^{tree}").strip()
+
+
+def test_tree_only_matches_the_checkout_flow(project, tmp_path):
+    tree_only = str(tmp_path / "tree_only")
+    shutil.copytree(project, tree_only, symlinks=True)
+
+    boardlessify(project, project)
+    boardlessify(tree_only, tree_only, "--tree-only")
+
+    assert dev_tree(tree_only) == dev_tree(project)
+    # The working tree and branch of the tree-only run are left as they were
+    assert git(tree_only, "status", "--porcelain") == ""
+    assert git(tree_only, "branch", "--show-current").strip() == "main"
+
+    files = git(project, "ls-tree", "-r", "--name-only", "dev").split()
+    assert "build/out.bin" not in files and "notes.log" not in files
+    assert {".gitignore", "VERSION.md", ".github/workflows/ci.yml"} <= set(files)
+    slcp = git(project, "show", "dev:app/app.slcp")
+    assert "brd4186c" not in slcp and "brd4002a" not in slcp
+    assert "iostream_usart" in slcp and "app_log" in slcp
+
+
+def test_tree_only_works_on_a_bare_repository(project, tmp_path):
+    bare = str(tmp_path / "bare.git")
+    git(str(tmp_path), "clone", "-q", "--bare", project, bare)
+
+    boardlessify(bare, project, "--tree-only")
+    boardlessify(project, project)
+
+    assert dev_tree(bare) == dev_tree(project)
+
+
+def test_slcp_files_are_the_same_with_and_without_git(git_repo):
+    from boardlessify import _scan_slcp_files, find_slcp_files
+
+    for path in (
+        "app/app.slcp",
+        "b.slcp",
+        "dependencies/simplicity_sdk/app/example.slcp",
+        "tools/slc_cli/template.slcp",
+        "sub/tools/nested.slcp",
+        "app/app_cmake/copy.slcp",
+        "sub/node_modules/pkg/x.slcp",
+    ):
+        write_file(os.path.join(git_repo, path), "project_name: x\n")
+    git(git_repo, "add", "app/app.slcp", "dependencies", "tools")
+    expected = [
+        os.path.join(git_repo, "app", "app.slcp"),
+        os.path.join(git_repo, "b.slcp"),
+    ]
+
+    assert sorted(_scan_slcp_files(git_repo)) == expected
+    assert find_slcp_files(git_repo) == expected
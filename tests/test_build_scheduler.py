@@ -0,0 +1,133 @@
+import itertools
+import random
+
+import pytest
+
+from build_scheduler import (
+    STEPS,
+    BuildHistory,
+    schedule,
+    schedule_lpt,
+    schedule_matrix,
+    simulate,
+)
+from target_matrix import build_matrix, load_targets, target_key
+
+
+def random_jobs(generator, count):
+    return [(f"target{index}", generator.uniform(10, 300)) for index in range(count)]
+
+
+def optimal_makespan(jobs, runner_count):
+    best = None
+    for assignment in itertools.product(range(runner_count), repeat=len(jobs)):
+        loads = [0.0] * runner_count
+        for runner, (_, duration) in zip(assignment, jobs):
+            loads[runner] += duration
+        best = max(loads) if best is None else min(best, max(loads))
+    return best
+
+
+def assigned_keys(runners):
+    return sorted(key for runner in runners for key, _ in runner)
+
+
+def test_every_job_is_assigned_once_and_the_makespan_is_within_the_lpt_bound():
+    generator = random.Random(0)
+    for trial in range(40):
+        runner_count = 2 + trial % 3
+        jobs = random_jobs(generator, 7)
+        runners, makespan = schedule(jobs, runner_count)
+
+        assert assigned_keys(runners) == sorted(key for key, _ in jobs)
+        assert len(runners) <= runner_count
+        assert makespan == max(sum(d for _, d in runner) for runner in runners)
+        # Never worse than the greedy assignment, itself within 4/3 - 1/3m of the optimum
+        lpt = max(
+            sum(d for _, d in runner) for runner in schedule_lpt(jobs, runner_count)
+        )
+        optimum = optimal_makespan(jobs, runner_count)
+        assert optimum - 1e-6 <= makespan <= lpt + 1e-6
+        assert makespan <= (4 / 3 - 1 / (3 * runner_count)) * optimum + 1e-6
+
+
+def test_refinement_fixes_the_classic_lpt_miss():
+    jobs = [("a", 3.0), ("b", 3.0), ("c", 2.0), ("d", 2.0), ("e", 2.0)]
+    assert max(sum(d for _, d in runner) for runner in schedule_lpt(jobs, 2)) == 7.0
+    runners, makespan = schedule(jobs, 2)
+    assert makespan == 6.0
+    assert assigned_keys(runners) == ["a", "b", "c", "d", "e"]
+
+
+def test_schedule_is_deterministic():
+    jobs = random_jobs(random.Random(1), 25)
+    # Equal durations are ordered by key, not by input order
+    jobs += [("tie_b", 100.0), ("tie_a", 100.0)]
+    first = schedule(jobs, 4)
+    assert schedule(jobs, 4) == first
+    assert schedule(list(reversed(jobs)), 4) == first
+
+
+@pytest.mark.parametrize(
+    "jobs, runner_count, makespan",
+    [
+        ([], 3, 0.0),
+        ([("a", 5.0)], 3, 5.0),
+        ([("a", 5.0), ("b", 2.0)], 0, 7.0),
+    ],
+)
+def test_empty_runners_are_dropped(jobs, runner_count, makespan):
+    runners, predicted = schedule(jobs, runner_count)
+    assert all(runners)
+    assert predicted == makespan
+    assert assigned_keys(runners) == sorted(key for key, _ in jobs)
+
+
+def test_simulate_is_deterministic_and_ordered():
+    results = simulate(20, 4, 20, seed=3)
+    assert simulate(20, 4, 20, seed=3) == results
+    assert simulate(20, 4, 20, seed=4) != results
+    assert results["lower bound"] <= results["lpt + refine"] <= results["lpt"]
+    assert results["lpt + refine"] < results["naive split"]
+
+
+def test_schedule_matrix_puts_every_target_on_one_runner(tmp_path):
+    toolchains = {"simplicity_sdk": {"v2024.6.2": {"gcc": "12.2.Rel1"}}}
+    targets = load_targets(
+        {"targets": [{"target_opn": f"OPN{index}"} for index in range(5)]}
+    )
+    projects = [
+        (
+            f"app{index}/app.slcp",
+            {"sdk": {"id": "simplicity_sdk", "version": "2024.6.2"}},
+        )
+        for index in range(2)
+    ]
+    matrix = build_matrix(projects, targets, toolchains)
+    history = BuildHistory(str(tmp_path / "history.json"))
+    for project, _ in projects:
+        for target in targets:
+            key = target_key(project, target["target_opn"], "")
+            seconds = 400.0 if key == target_key("app0/app.slcp", "OPN0", "") else 50.0
+            for step in STEPS:
+                history.record(key, step, seconds)
+
+    runner_matrix, makespan = schedule_matrix(matrix, history, 3)
+
+    runners = runner_matrix["include"]
+    assert [runner["runner"] for runner in runners] == [0, 1, 2]
+    pairs = [
+        (target["slcp"], target["target_opn"])
+        for runner in runners
+        for target in runner["targets"]
+    ]
+    assert len(pairs) == len(set(pairs)) == 10
+    # The slow target runs alone, the nine others are split over the two other runners
+    (alone,) = [runner for runner in runners if runner["predicted_seconds"] == 800.0]
+    assert [target["target_opn"] for target in alone["targets"]] == ["OPN0"]
+    assert sorted(runner["predicted_seconds"] for runner in runners) == [
+        400.0,
+        500.0,
+        800.0,
+    ]
+    assert makespan == 800.0
@@ -0,0 +1,76 @@
+from component_graph import ComponentGraph, find_orphaned_components
+from sdk_catalog import SdkCatalog
+
+
+def make_catalog(components):
+    """
+    Catalog of {id: (provides, requires)}.
+    """
+    return SdkCatalog(
+        "test_sdk",
+        "0",
+        {
+            f"{component_id}.slcc": {
+                "component": {
+                    "id": component_id,
+                    "category": "",
+                    "root_path": "",
+                    "provides": list(provides),
+                    "requires": [[feature, []] for feature in requires],
+                    "board": component_id.startswith("brd"),
+                }
+            }
+            for component_id, (provides, requires) in components.items()
+        },
+    )
+
+
+CATALOG = make_catalog(
+    {
+        "brd4186c": ((), ("board_control", "iostream_vcom")),
+        "board_control": ((), ("gpio",)),
+        "iostream_usart": (("iostream_vcom",), ("usart", "gpio")),
+        "usart": ((), ()),
+        "gpio": ((), ()),
+        "app_log": ((), ("iostream_vcom", "printf")),
+        "printf": ((), ()),
+        "cycle_a": ((), ("cycle_b",)),
+        "cycle_b": ((), ("cycle_a",)),
+    }
+)
+
+
+def test_dependencies_follow_provided_features():
+    graph = ComponentGraph(CATALOG)
+
+    assert graph.dependencies("brd4186c") == {"board_control", "iostream_usart"}
+    assert graph.dependencies("unknown") == set()
+    assert graph.reachable(["cycle_a"]) == {"cycle_a", "cycle_b"}
+
+
+def test_components_only_required_by_boards_are_orphans():
+    kept = ["board_control", "iostream_usart", "usart", "gpio", "printf"]
+
+    # usart is not required by the board itself, it stays a root of its own
+    assert find_orphaned_components(CATALOG, kept, ["brd4186c"]) == {
+        "board_control",
+        "iostream_usart",
+    }
+
+
+def test_components_required_by_a_kept_root_stay():
+    kept = ["board_control", "iostream_usart", "usart", "gpio", "app_log", "printf"]
+
+    # app_log requires the iostream the board brought in, gpio is still a root
+    assert find_orphaned_components(CATALOG, kept, ["brd4186c"]) == {"board_control"}
+
+
+def test_graph_benchmark_on_10k_components():
+    from bench_graph import run
+
+    (nodes, edges), (_, seconds), orphans = run(10000)
+
+    assert nodes == 10000 and edges > nodes
+    assert orphans > 0
+    # Milliseconds in practice, loose for shared test machines
+    assert seconds < 2
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from component_rules import ComponentRules, compile_rules, load_component_rules
+from conftest import ROOT_DIR, write_file
+
+
+def test_compiled_rules():
+    rules = ComponentRules(
+        {
+            "remove": {
+                "prefixes": ["brd", "EFR32", "EFR32MG24"],
+                "exact": ["board_control", "board"],
+                "regexes": [r"(?:MGM|BGM)\d+"],
+            },
+            "keep": {"exact": ["brd_keep"], "prefixes": ["EFR32MG24B"]},
+        }
+    )
+
+    assert rules.matches("brd4186c")
+    assert rules.matches("EFR32MG24A010F1536GM48")
+    assert rules.matches("board") and rules.matches("board_control")
+    assert not rules.matches("board_controller")
+    assert rules.matches("MGM240PB32VNA")
+    assert not rules.matches("MGMx")
+    assert not rules.matches("brd_keep") and rules.is_kept("brd_keep")
+    assert not rules.matches("EFR32MG24B310F1536IM48")
+    assert not rules.matches("simple_button")
+
+
+def test_no_rule_compiles_to_none():
+    assert compile_rules() is None
+    assert not ComponentRules({}).matches("brd4186c")
+
+
+@pytest.mark.parametrize(
+    "rules",
+    [{"unknown": {}}, {"remove": {"suffixes": ["x"]}}, {"remove": {"regexes": ["("]}}],
+)
+def test_invalid_rules_are_rejected(rules):
+    with pytest.raises(ValueError):
+        ComponentRules(rules, source="test")
+
+
+def test_rules_file_of_the_repository_is_loaded(tmp_path):
+    rules = load_component_rules([str(tmp_path), ROOT_DIR])
+    assert rules.source == os.path.join(ROOT_DIR, "component_rules.yaml")
+    assert rules.matches("SiWG917M111MGTBA")
+
+    write_file(str(tmp_path / "component_rules.yaml"), "remove:\n  exact: [only]\n")
+    assert not load_component_rules([str(tmp_path), ROOT_DIR]).matches("brd4186c")
+    assert load_component_rules([str(tmp_path / "none")]).source == "defaults"
+
+
+def test_rules_benchmark_agrees_with_rule_by_rule_matching():
+    from bench_rules import run
+
+    # run raises when the compiled pattern and the rules tried in turn disagree
+    _, _, _, matched = run(rule_count=500, component_count=400)
+
+    assert matched >= 100
@@ -0,0 +1,93 @@
+import hashlib
+import os
+
+import pytest
+
+from downloader import ConnectionPool, DownloadError, download_all, download_file
+
+DATA = os.urandom(3 << 20)
+SHA256 = hashlib.sha256(DATA).hexdigest()
+
+
+def entry(server, name="tool.bin", sha256=SHA256):
+    server.files.setdefault(name, DATA)
+    return {"name": name, "url": server.url(name), "sha256": sha256, "extract": None}
+
+
+def read(path):
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def test_download(file_server, tmp_path):
+    result = download_file(ConnectionPool(), entry(file_server), str(tmp_path))
+
+    assert result["status"] == "downloaded"
+    assert result["bytes"] == len(DATA) and result["resumed"] == 0
+    assert read(tmp_path / "tool.bin") == DATA
+    assert not os.path.exists(tmp_path / "tool.bin.part")
+
+    again = download_file(ConnectionPool(), entry(file_server), str(tmp_path))
+    assert again["status"] == "cached"
+    assert len(file_server.requests) == 1
+
+
+def test_partial_file_is_resumed(file_server, tmp_path):
+    (tmp_path / "tool.bin.part").write_bytes(DATA[:1000])
+
+    result = download_file(ConnectionPool(), entry(file_server), str(tmp_path))
+
+    assert file_server.requests == [("/tool.bin", "bytes=1000-")]
+    assert result["resumed"] == 1000 and result["bytes"] == len(DATA) - 1000
+    assert read(tmp_path / "tool.bin") == DATA
+
+
+def test_complete_partial_file_gets_416(file_server, tmp_path):
+    (tmp_path / "tool.bin.part").write_bytes(DATA)
+
+    result = download_file(ConnectionPool(), entry(file_server), str(tmp_path))
+
+    assert file_server.requests == [("/tool.bin", f"bytes={len(DATA)}-")]
+    assert result["status"] == "downloaded" and result["bytes"] == 0
+    assert read(tmp_path / "tool.bin") == DATA
+
+
+def test_truncated_response_is_resumed(file_server, tmp_path):
+    file_server.truncate["tool.bin"] = 2
+
+    result = download_file(ConnectionPool(), entry(file_server), str(tmp_path))
+
+    half = len(DATA) // 2
+    assert file_server.requests == [
+        ("/tool.bin", None),
+        ("/tool.bin", f"bytes={half}-"),
+        ("/tool.bin", f"bytes={half + (len(DATA) - half) // 2}-"),
+    ]
+    assert result["attempts"] == 3
+    assert read(tmp_path / "tool.bin") == DATA
+
+
+def test_truncated_responses_give_up_after_the_retries(file_server, tmp_path):
+    file_server.truncate["tool.bin"] = 10
+
+    with pytest.raises(DownloadError, match="after 2 attempts"):
+        download_file(ConnectionPool(), entry(file_server), str(tmp_path), retries=2)
+    # Kept for the next run to resume from
+    assert os.path.getsize(tmp_path / "tool.bin.part") > 0
+
+
+def test_mismatching_sha256_is_rejected(file_server, tmp_path):
+    with pytest.raises(DownloadError, match="does not match"):
+        download_file(
+            ConnectionPool(), entry(file_server, sha256="0" * 64), str(tmp_path)
+        )
+    assert os.listdir(tmp_path) == []
+
+
+def test_missing_file_is_not_retried(file_server, tmp_path):
+    entries = [dict(entry(file_server), name="missing", url=file_server.url("missing"))]
+
+    results, errors = download_all(entries, str(tmp_path), jobs=2)
+
+    assert results == [] and len(errors) == 1 and "HTTP 404" in errors[0]
+    assert len(file_server.requests) == 1
@@ -0,0 +1,82 @@
+import os
+import shlex
+import sys
+
+import pytest
+
+from conftest import ROOT_DIR, write_file
+from gen_cache import GeneratedCache, generate
+
+pytest.importorskip("yaml")
+
+SLCP = """project_name: app
+sdk: {id: simplicity_sdk, version: 2024.6.2}
+component:
+- {id: iostream_usart}
+"""
+TARGET = "EFR32MG24B310F1536IM48"
+CONFIG = "config/sl_board_control_config.h"
+STUB = (
+    f"{shlex.quote(sys.executable)} {shlex.quote(os.path.join(ROOT_DIR, 'gen_cache.py'))} "
+    "stub-generate {slcp} --with {target_opn} --configuration={configs}"
+)
+
+
+@pytest.fixture
+def project(tmp_path, cache_dir):
+    slcp_file = str(tmp_path / "solution" / "app.slcp")
+    write_file(slcp_file, SLCP)
+    cache = GeneratedCache()
+
+    def run(configs="SL_BOARD_ENABLE_VCOM:1"):
+        return generate(cache, slcp_file, TARGET, configs, None, STUB)[0]
+
+    return run, os.path.dirname(slcp_file)
+
+
+def read(path):
+    with open(path) as file:
+        return file.read()
+
+
+def test_restores_what_the_generator_wrote(project):
+    run, project_dir = project
+    assert run() == "miss"
+    cmake_file = os.path.join(project_dir, "app_cmake", "app.cmake")
+    expected = read(cmake_file)
+    os.unlink(cmake_file)
+    assert run() == "hit"
+    assert read(cmake_file) == expected
+
+
+def test_other_configs_miss(project):
+    run, project_dir = project
+    assert run() == "miss"
+    assert run("SL_BOARD_ENABLE_VCOM:0") == "miss"
+    # Switching back restores over the files the other generation wrote
+    assert run() == "hit"
+
+
+def test_edited_file_is_not_overwritten(project):
+    run, project_dir = project
+    assert run() == "miss"
+    assert run() == "hit"
+    config_file = os.path.join(project_dir, CONFIG)
+    with open(config_file, "a") as file:
+        file.write("#define USER_EDIT 1\n")
+    assert run() == "miss"
+    assert "USER_EDIT" in read(config_file)
+    # Nor is the cache entry replaced by a generation depending on the edit
+    os.unlink(config_file)
+    assert run() == "hit"
+    assert "USER_EDIT" not in read(config_file)
+
+
+@pytest.mark.parametrize("name", ["app.slpb", "app.slps", "app.pintool", "app.slcc"])
+def test_project_files_next_to_the_slcp_miss(project, name):
+    run, project_dir = project
+    write_file(os.path.join(project_dir, name), "first\n")
+    assert run() == "miss"
+    assert run() == "hit"
+    write_file(os.path.join(project_dir, name), "edited\n")
+    assert run() == "miss"
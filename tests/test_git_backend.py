@@ -0,0 +1,115 @@
+import os
+
+import pytest
+
+from conftest import git, write_file
+from git_backend import CliGitBackend, IndexTransaction, get_status_plan
+
+
+def commit_all(repo_dir, message="base"):
+    git(repo_dir, "add", "-A")
+    git(repo_dir, "commit", "-q", "-m", message)
+
+
+def test_status_plan_classifies_changes(git_repo):
+    write_file(os.path.join(git_repo, "kept.c"), "kept\n")
+    write_file(os.path.join(git_repo, "changed.c"), "old\n")
+    write_file(os.path.join(git_repo, "gone.c"), "gone\n")
+    commit_all(git_repo)
+    write_file(os.path.join(git_repo, "changed.c"), "new\n")
+    os.unlink(os.path.join(git_repo, "gone.c"))
+    write_file(os.path.join(git_repo, "dir", "new.c"), "new\n")
+
+    plan = get_status_plan(git_repo)
+
+    assert plan.modified == ["changed.c"]
+    assert plan.deleted == ["gone.c"]
+    assert plan.untracked == ["dir/new.c"]
+
+
+def test_transaction_writes_the_index_once(git_repo):
+    for index in range(20):
+        write_file(os.path.join(git_repo, f"file{index}.c"), f"{index}\n")
+    commit_all(git_repo)
+    write_file(os.path.join(git_repo, "file0.c"), "changed\n")
+    os.unlink(os.path.join(git_repo, "file1.c"))
+    write_file(os.path.join(git_repo, "added.c"), "added\n")
+    plan = get_status_plan(git_repo)
+
+    with IndexTransaction(git_repo) as transaction:
+        transaction.add(plan.untracked)
+        transaction.remove(plan.deleted)
+        transaction.add(plan.modified)
+
+    assert transaction.index_writes == 1
+    assert git(git_repo, "status", "--porcelain") == (
+        "A  added.c\nM  file0.c\nD  file1.c\n"
+    )
+
+
+def test_untracked_nested_repository_is_staged_as_gitlink(git_repo):
+    write_file(os.path.join(git_repo, "top.c"), "top\n")
+    commit_all(git_repo)
+    inner = os.path.join(git_repo, "inner")
+    os.makedirs(inner)
+    git(inner, "init", "-q")
+    write_file(os.path.join(inner, "inner.c"), "inner\n")
+    commit_all(inner)
+    inner_head = git(inner, "rev-parse", "HEAD").strip()
+
+    backend = CliGitBackend(git_repo)
+    plan = backend.status()
+    assert plan.untracked == ["inner/"]
+    with backend.transaction() as transaction:
+        transaction.add(plan.untracked)
+
+    assert git(git_repo, "ls-files", "-s", "inner") == f"160000 {inner_head} 0\tinner\n"
+    assert backend.commit("Add inner")
+
+
+@pytest.mark.parametrize("backend_name", ["cli", "gitpython"])
+def test_commit_is_skipped_when_the_tree_is_unchanged(git_repo, backend_name):
+    from git_backend import open_backend
+
+    if backend_name == "gitpython":
+        pytest.importorskip("git")
+    write_file(os.path.join(git_repo, "top.c"), "top\n")
+    commit_all(git_repo)
+    head = git(git_repo, "rev-parse", "HEAD")
+
+    backend = open_backend(backend_name, git_repo)
+
+    assert not backend.commit("Nothing")
+    assert git(git_repo, "rev-parse", "HEAD") == head
+
+
+def test_staging_benchmark():
+    pytest.importorskip("git")
+    from bench_staging import run
+
+    results = run(files=300, changes=5)
+
+    assert results["transaction"][1] == 1
+    assert results["gitpython"][1] == 3
+
+
+def test_backends_benchmark_commits_the_same_tree(tmp_path):
+    pytest.importorskip("git")
+    from bench_backends import STEPS, run_backend
+    from bench_staging import create_repo
+
+    trees = {}
+    for backend_name in ("cli", "gitpython"):
+        repo_dir = str(tmp_path / backend_name)
+        os.makedirs(repo_dir)
+        create_repo(repo_dir, files=300, changes=5)
+
+        times = run_backend(repo_dir, backend_name)
+
+        assert sorted(times) == sorted(STEPS)
+        assert git(repo_dir, "symbolic-ref", "--short", "HEAD") == (
+            f"bench-{backend_name}\n"
+        )
+        assert git(repo_dir, "status", "--porcelain") == ""
+        trees[backend_name] = git(repo_dir, "rev-parse", "HEAD^{tree}")
+    assert trees["cli"] == trees["gitpython"]
@@ -0,0 +1,168 @@
+import hashlib
+import os
+import threading
+import time
+
+import pytest
+
+from conftest import git, write_file
+from lfs_cache import LfsCache, lfs_storage, list_pointers, object_path, read_pointer
+
+CONTENTS = [b"radio library " * 100, b"bootloader " * 50, b"zigbee stack " * 200]
+
+
+def pointer_text(data):
+    return (
+        "version https://git-lfs.github.com/spec/v1\n"
+        f"oid sha256:{oid(data)}\n"
+        f"size {len(data)}\n"
+    )
+
+
+def oid(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+@pytest.fixture
+def sdk_repo(git_repo, tmp_path):
+    """
+    Bare SDK repository whose libraries are LFS pointers, their content kept apart as the LFS server would.
+    """
+    for index, data in enumerate(CONTENTS):
+        write_file(os.path.join(git_repo, "lib", f"lib{index}.a"), pointer_text(data))
+    write_file(os.path.join(git_repo, "README.md"), "sdk\n")
+    git(git_repo, "add", "-A")
+    git(git_repo, "commit", "-q", "-m", "sdk")
+    bare = str(tmp_path / "sdk.git")
+    git(str(tmp_path), "clone", "-q", "--bare", git_repo, bare)
+    return bare
+
+
+def clone(sdk_repo, dest, pulled=()):
+    """
+    Checkout of the SDK whose LFS store holds the objects of pulled, as after git lfs pull.
+    """
+    git(os.path.dirname(dest), "clone", "-q", sdk_repo, dest)
+    for data in pulled:
+        write_file(object_path(lfs_storage(dest), oid(data)), data)
+    return dest
+
+
+def test_pointers_are_read_from_the_checkout(sdk_repo, tmp_path):
+    checkout = clone(sdk_repo, str(tmp_path / "sdk"))
+    assert list_pointers(checkout) == {oid(data): len(data) for data in CONTENTS}
+    assert read_pointer(os.path.join(checkout, "README.md")) is None
+    assert lfs_storage(checkout) == os.path.join(checkout, ".git", "lfs", "objects")
+
+
+def test_objects_of_one_checkout_are_linked_into_the_next(sdk_repo, tmp_path):
+    cache = LfsCache(str(tmp_path / "cache"))
+    first = clone(sdk_repo, str(tmp_path / "first"), CONTENTS[:2])
+    assert cache.store(first, list_pointers(first)) == (
+        2,
+        len(CONTENTS[0]) + len(CONTENTS[1]),
+    )
+
+    second = clone(sdk_repo, str(tmp_path / "second"))
+    stats = cache.populate(second, list_pointers(second))
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    assert stats["bytes_saved"] == len(CONTENTS[0]) + len(CONTENTS[1])
+    linked = object_path(lfs_storage(second), oid(CONTENTS[0]))
+    with open(linked, "rb") as file:
+        assert file.read() == CONTENTS[0]
+    if stats["methods"] == {"link": 2}:
+        cached = object_path(cache.objects, oid(CONTENTS[0]))
+        assert os.stat(linked).st_ino == os.stat(cached).st_ino
+
+    # Objects already in the checkout are neither looked up nor counted
+    assert cache.populate(second, list_pointers(second))["hits"] == 0
+    assert cache.record(stats) == {
+        "hits": 2,
+        "misses": 1,
+        "bytes_saved": stats["bytes_saved"],
+    }
+
+
+def test_worktrees_share_the_store_of_their_repository(sdk_repo, tmp_path):
+    checkout = clone(sdk_repo, str(tmp_path / "sdk"))
+    worktree = str(tmp_path / "worktree")
+    git(checkout, "worktree", "add", "-q", "--detach", worktree)
+    assert os.path.realpath(lfs_storage(worktree)) == os.path.realpath(
+        lfs_storage(checkout)
+    )
+    git(checkout, "config", "lfs.storage", "shared_lfs")
+    assert lfs_storage(checkout) == os.path.join(
+        checkout, ".git", "shared_lfs", "objects"
+    )
+
+
+def test_corrupt_objects_are_not_cached(sdk_repo, tmp_path):
+    cache = LfsCache(str(tmp_path / "cache"))
+    checkout = clone(sdk_repo, str(tmp_path / "sdk"))
+    write_file(object_path(lfs_storage(checkout), oid(CONTENTS[0])), b"truncated")
+    assert cache.store(checkout, list_pointers(checkout)) == (0, 0)
+    assert cache.entries() == []
+
+
+def test_concurrent_checkouts_populate_and_store(sdk_repo, tmp_path):
+    errors = []
+    checkouts = [
+        clone(sdk_repo, str(tmp_path / f"sdk{index}"), CONTENTS if index == 0 else ())
+        for index in range(5)
+    ]
+
+    def pull(checkout):
+        # One instance per runner, the lock is a file they share
+        cache = LfsCache(str(tmp_path / "cache"))
+        try:
+            pointers = list_pointers(checkout)
+            cache.record(cache.populate(checkout, pointers))
+            cache.store(checkout, pointers)
+        except Exception as e:
+            errors.append(e)
+
+    pull(checkouts[0])
+    threads = [
+        threading.Thread(target=pull, args=(checkout,)) for checkout in checkouts[1:]
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    totals = LfsCache(str(tmp_path / "cache")).record(
+        {"hits": 0, "misses": 0, "bytes_saved": 0}
+    )
+    # The first checkout pulled every object itself, the others found them all in the cache
+    assert totals == {
+        "hits": 4 * len(CONTENTS),
+        "misses": 0,
+        "bytes_saved": 4 * sum(map(len, CONTENTS)),
+    }
+    for checkout in checkouts[1:]:
+        for data in CONTENTS:
+            with open(object_path(lfs_storage(checkout), oid(data)), "rb") as file:
+                assert file.read() == data
+
+
+def test_evict_drops_least_recently_used_unlinked_objects_first(sdk_repo, tmp_path):
+    cache = LfsCache(str(tmp_path / "cache"))
+    checkout = clone(sdk_repo, str(tmp_path / "sdk"), CONTENTS)
+    cache.store(checkout, list_pointers(checkout))
+    # Only the first object is still linked from a checkout
+    for data in CONTENTS[1:]:
+        os.unlink(object_path(lfs_storage(checkout), oid(data)))
+    now = time.time()
+    for age, data in enumerate(CONTENTS):
+        used = now - 3600 * (len(CONTENTS) - age)
+        os.utime(object_path(cache.objects, oid(data)), (used, used))
+    linked = {entry[0]: entry[3] for entry in cache.entries()}
+    if linked[oid(CONTENTS[0])] < 2:
+        pytest.skip("the file system does not hard link")
+
+    # The oldest object is linked, the next oldest goes first
+    assert cache.evict(len(CONTENTS[0]) + len(CONTENTS[2])) == [oid(CONTENTS[1])]
+    assert cache.evict(len(CONTENTS[0])) == [oid(CONTENTS[2])]
+    assert cache.evict(0) == [oid(CONTENTS[0])]
+    assert cache.entries() == []
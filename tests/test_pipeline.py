@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from conftest import ROOT_DIR, write_file
+from pipeline import PIPELINE_FILE, load_pipeline, run_pipeline
+
+pytest.importorskip("yaml")
+
+SLCP = """project_name: app
+sdk: {id: simplicity_sdk, version: 2024.6.2}
+source:
+- {path: app.c}
+component:
+- {id: iostream_usart}
+"""
+VARIABLES = {
+    "slcp_file": "app.slcp",
+    "project_name": "app",
+    "sdk_id": "simplicity_sdk",
+    "sdk_version": "2024.6.2",
+    "gcc": "12.2.rel1",
+    "target_opn": "EFR32MG24B310F1536IM48",
+    "target_configs": "SL_BOARD_ENABLE_VCOM:1",
+    "scripts_dir": ROOT_DIR,
+}
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch, cache_dir):
+    monkeypatch.chdir(tmp_path)
+    write_file("solution/app.slcp", SLCP)
+    write_file("solution/app.c", "int main(void) { return 0; }\n")
+    stages, variables = load_pipeline(os.path.join(ROOT_DIR, PIPELINE_FILE), VARIABLES)
+
+    def run():
+        results = run_pipeline(stages, variables, stub=True)
+        return {name: result["status"] for name, result in results.items()}
+
+    return run
+
+
+def test_second_run_skips_every_stage(workspace):
+    assert set(workspace().values()) == {"ran"}
+    # generate rewrites config/, one of its outputs, which is not hashed as its input
+    assert set(workspace().values()) == {"skipped"}
+
+
+def test_source_at_solution_root_reruns_build(workspace):
+    workspace()
+    with open("solution/app.c", "a") as file:
+        file.write("// changed\n")
+    statuses = workspace()
+    assert statuses["generate"] == "skipped"
+    assert statuses["build"] == "ran"
+    assert statuses["size_report"] == "ran"
+    assert workspace()["build"] == "skipped"
+
+
+def test_edited_config_reruns_build(workspace):
+    workspace()
+    with open("solution/config/sl_board_control_config.h", "a") as file:
+        file.write("#define USER_EDIT 1\n")
+    statuses = workspace()
+    assert statuses["generate"] == "skipped"
+    assert statuses["build"] == "ran"
+
+
+def test_postbuild_files_do_not_rerun_build(workspace):
+    workspace()
+    write_file("solution/artifact/app.gbl", "image")
+    write_file("solution/postbuild-artifacts.zip", "zip")
+    assert workspace()["build"] == "skipped"
+
+
+def test_project_file_next_to_the_slcp_reruns_generate(workspace):
+    workspace()
+    write_file("solution/app.pintool", "pins\n")
+    statuses = workspace()
+    assert statuses["generate"] == "ran"
+    assert statuses["build"] == "ran"
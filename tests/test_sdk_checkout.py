@@ -0,0 +1,162 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT_DIR, git, write_file
+
+pytest.importorskip("yaml")
+
+BIG = 1 << 20
+SLCC = """id: {id}
+category: {category}
+root_path: {root}
+provides:
+- name: {id}
+requires: {requires}
+"""
+
+
+def add_component(sdk_dir, root, component_id, requires=(), category="Platform"):
+    """
+    Component of the SDK, its .slcc in the component directory next to root as in the SDKs, and its
+    prebuilt library, the bulk of an SDK, in root.
+    """
+    write_file(
+        os.path.join(
+            sdk_dir, os.path.dirname(root), "component", f"{component_id}.slcc"
+        ),
+        SLCC.format(
+            id=component_id,
+            category=category,
+            root=root,
+            requires="".join(f"\n- name: {name}" for name in requires) or "[]",
+        ),
+    )
+    write_file(os.path.join(sdk_dir, root, "lib", f"{component_id}.a"), os.urandom(BIG))
+
+
+@pytest.fixture
+def sdk_remote(tmp_path):
+    """
+    Bare SDK repository at tag v2024.6.2, serving partial clones.
+    """
+    sdk_dir = str(tmp_path / "sdk_src")
+    os.makedirs(sdk_dir)
+    git(sdk_dir, "init", "-q", "-b", "main")
+    write_file(
+        os.path.join(sdk_dir, "simplicity_sdk.slcs"),
+        "id: simplicity_sdk\nsdk_version: 2024.6.2\n",
+    )
+    add_component(sdk_dir, "platform/driver/gpio", "gpio")
+    add_component(sdk_dir, "platform/service/sleeptimer", "sleeptimer", ["gpio"])
+    add_component(sdk_dir, "protocol/zigbee/stack", "zigbee_pro_stack", ["sleeptimer"])
+    add_component(sdk_dir, "protocol/openthread/stack", "ot_stack")
+    add_component(
+        sdk_dir, "hardware/board/brd4186c", "brd4186c", category="Platform|Board|"
+    )
+    git(sdk_dir, "add", "-A")
+    git(sdk_dir, "commit", "-q", "-m", "sdk")
+    git(sdk_dir, "tag", "v2024.6.2")
+    remote = str(tmp_path / "sdk.git")
+    git(str(tmp_path), "clone", "-q", "--bare", sdk_dir, remote)
+    git(remote, "config", "uploadpack.allowFilter", "true")
+    return remote
+
+
+def checkout(project_dir, remote, components, *args):
+    write_file(
+        os.path.join(project_dir, "app.slcp"),
+        "project_name: app\nsdk: {id: simplicity_sdk, version: 2024.6.2}\ncomponent:\n"
+        + "".join(f"- {{id: {component}}}\n" for component in components),
+    )
+    return subprocess.run(
+        [
+            sys.executable,
+            os.path.join(ROOT_DIR, "sdk_checkout.py"),
+            "app.slcp",
+            "--url",
+            f"file://{remote}",
+            "--no-lfs-pull",
+            *args,
+        ],
+        cwd=project_dir,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+
+
+def checked_out(dest):
+    return sorted(
+        os.path.relpath(os.path.join(root, name), dest).replace(os.sep, "/")
+        for root, dirs, files in os.walk(dest)
+        if not dirs.__setitem__(slice(None), [d for d in dirs if d != ".git"])
+        for name in files
+    )
+
+
+def local_blob_bytes(dest):
+    """
+    Size of the blobs the partial clone holds, the others are fetched on demand.
+    """
+    listing = git(dest, "rev-list", "--objects", "--missing=allow-any", "HEAD")
+    shas = [line.split()[0] for line in listing.splitlines()]
+    present = git(
+        dest,
+        "cat-file",
+        "--batch-check=%(objecttype) %(objectsize)",
+        input="\n".join(shas).encode(),
+    )
+    return sum(
+        int(line.split()[1]) for line in present.splitlines() if line.startswith("blob")
+    )
+
+
+def test_checkout_is_limited_to_the_needed_directories(tmp_path, sdk_remote, cache_dir):
+    project_dir = str(tmp_path / "project")
+
+    result = checkout(
+        project_dir, sdk_remote, ["zigbee_pro_stack"], "--with", "brd4186c"
+    )
+
+    assert result.returncode == 0, result.stdout
+    dest = os.path.join(project_dir, "dependencies", "simplicity_sdk")
+    files = checked_out(dest)
+    assert "protocol/zigbee/stack/lib/zigbee_pro_stack.a" in files
+    assert "platform/service/sleeptimer/lib/sleeptimer.a" in files
+    assert "platform/driver/gpio/lib/gpio.a" in files
+    assert "hardware/board/brd4186c/lib/brd4186c.a" in files
+    # Metadata of every component, not the libraries of unused ones
+    assert "protocol/openthread/component/ot_stack.slcc" in files
+    assert "protocol/openthread/stack/lib/ot_stack.a" not in files
+    assert git(dest, "config", "lfs.fetchinclude").strip() == ",".join(
+        f"{directory}/**"
+        for directory in [
+            "hardware/board/brd4186c",
+            "hardware/board/component",
+            "platform/driver/component",
+            "platform/driver/gpio",
+            "platform/service/component",
+            "platform/service/sleeptimer",
+            "protocol/openthread/component",
+            "protocol/zigbee/component",
+            "protocol/zigbee/stack",
+        ]
+    )
+    # The unused library was never downloaded
+    assert local_blob_bytes(dest) < 4.5 * BIG
+
+
+def test_existing_checkout_follows_the_project(tmp_path, sdk_remote, cache_dir):
+    project_dir = str(tmp_path / "project")
+    assert checkout(project_dir, sdk_remote, ["gpio"]).returncode == 0
+
+    result = checkout(project_dir, sdk_remote, ["ot_stack"], "--no-metadata")
+
+    assert result.returncode == 0, result.stdout
+    files = checked_out(os.path.join(project_dir, "dependencies", "simplicity_sdk"))
+    assert "protocol/openthread/stack/lib/ot_stack.a" in files
+    assert "platform/driver/gpio/lib/gpio.a" not in files
+    assert "protocol/zigbee/component/zigbee_pro_stack.slcc" not in files
@@ -0,0 +1,138 @@
+import os
+import threading
+
+import pytest
+
+from conftest import git, write_file
+from sdk_mirror import SdkMirror
+
+
+@pytest.fixture
+def sdk_repo(git_repo, tmp_path):
+    """
+    Bare SDK repository, the server, with the tags of three versions and a branch not to mirror.
+    """
+    for version in ("1.0.0", "1.1.0", "1.2.0"):
+        write_file(os.path.join(git_repo, "version.txt"), f"{version}\n")
+        git(git_repo, "add", "-A")
+        git(git_repo, "commit", "-q", "-m", version)
+        git(git_repo, "tag", f"v{version}")
+    git(git_repo, "branch", "develop")
+    bare = str(tmp_path / "sdk.git")
+    git(str(tmp_path), "clone", "-q", "--bare", git_repo, bare)
+    return bare
+
+
+def read(path):
+    with open(path) as file:
+        return file.read()
+
+
+@pytest.mark.parametrize("worktree", [False, True])
+def test_switching_versions_moves_the_checkout(sdk_repo, tmp_path, worktree):
+    mirror = SdkMirror(sdk_repo, str(tmp_path / "mirrors"))
+    dest = str(tmp_path / "dependencies" / "sdk")
+    assert mirror.checkout("1.0.0", dest, worktree) == "v1.0.0"
+    assert read(os.path.join(dest, "version.txt")) == "1.0.0\n"
+    assert mirror.checkout("1.1.0", dest, worktree) == "v1.1.0"
+    assert read(os.path.join(dest, "version.txt")) == "1.1.0\n"
+    versions = mirror.versions()
+    assert versions["v1.0.0"]["checkouts"] == []
+    assert versions["v1.1.0"]["checkouts"] == [dest]
+
+
+def test_refuses_a_directory_not_checked_out_of_the_mirror(sdk_repo, tmp_path):
+    mirror = SdkMirror(sdk_repo, str(tmp_path / "mirrors"))
+    dest = tmp_path / "sdk"
+    dest.mkdir()
+    with pytest.raises(ValueError):
+        mirror.checkout("1.0.0", str(dest))
+
+
+def test_clone_shares_the_objects_of_the_mirror(sdk_repo, tmp_path):
+    mirror = SdkMirror(sdk_repo, str(tmp_path / "mirrors"))
+    dest = str(tmp_path / "sdk")
+    mirror.checkout("1.1.0", dest)
+
+    assert read(os.path.join(dest, "version.txt")) == "1.1.0\n"
+    alternates = os.path.join(dest, ".git", "objects", "info", "alternates")
+    assert read(alternates).strip() == os.path.join(mirror.path, "objects")
+    assert git(dest, "count-objects").startswith("0 objects")
+    assert git(dest, "remote", "get-url", "origin").strip() == sdk_repo
+    # Only the tags asked for are in the mirror
+    assert git(mirror.path, "tag").split() == ["v1.1.0"]
+    assert git(mirror.path, "branch", "--list") == ""
+
+
+def test_worktree_of_the_mirror(sdk_repo, tmp_path):
+    mirror = SdkMirror(sdk_repo, str(tmp_path / "mirrors"))
+    dest = str(tmp_path / "sdk")
+    mirror.checkout("1.0.0", dest, worktree=True)
+
+    assert read(os.path.join(dest, "version.txt")) == "1.0.0\n"
+    assert os.path.isfile(os.path.join(dest, ".git"))
+    assert dest in git(mirror.path, "worktree", "list", "--porcelain")
+    assert mirror.versions()["v1.0.0"]["checkouts"] == [dest]
+
+
+def test_concurrent_checkouts_are_all_recorded(sdk_repo, tmp_path):
+    errors = []
+    dests = [str(tmp_path / f"sdk{index}") for index in range(6)]
+
+    def checkout(index):
+        # One instance per runner, the lock is a file they share
+        mirror = SdkMirror(sdk_repo, str(tmp_path / "mirrors"))
+        try:
+            mirror.checkout("1.1.0" if index % 2 else "1.0.0", dests[index], index > 2)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=checkout, args=(index,)) for index in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    versions = SdkMirror(sdk_repo, str(tmp_path / "mirrors")).versions()
+    assert sorted(versions["v1.0.0"]["checkouts"]) == dests[0::2]
+    assert sorted(versions["v1.1.0"]["checkouts"]) == dests[1::2]
+    for index, dest in enumerate(dests):
+        expected = "1.1.0\n" if index % 2 else "1.0.0\n"
+        assert read(os.path.join(dest, "version.txt")) == expected
+
+
+def test_gc_drops_versions_no_checkout_uses(sdk_repo, tmp_path):
+    import shutil
+
+    mirror = SdkMirror(sdk_repo, str(tmp_path / "mirrors"))
+    kept = str(tmp_path / "kept")
+    mirror.checkout("1.0.0", kept, worktree=True)
+    removed = str(tmp_path / "removed")
+    mirror.checkout("1.2.0", removed, worktree=True)
+    mirror.ensure("1.1.0")
+    shutil.rmtree(removed)
+
+    # Recently used versions stay, checked out or not
+    assert mirror.gc() == []
+    assert mirror.gc(max_unused=0) == ["v1.1.0", "v1.2.0"]
+    assert git(mirror.path, "tag").split() == ["v1.0.0"]
+    assert sorted(mirror.versions()) == ["v1.0.0"]
+    assert removed not in git(mirror.path, "worktree", "list", "--porcelain")
+    # The objects only the dropped tags referenced are gone
+    commit = git(sdk_repo, "rev-parse", "v1.2.0^{commit}").strip()
+    with pytest.raises(Exception):
+        git(mirror.path, "cat-file", "-e", commit)
+    assert read(os.path.join(kept, "version.txt")) == "1.0.0\n"
+
+
+def test_update_fetches_moved_tags(sdk_repo, tmp_path, git_repo):
+    mirror = SdkMirror(sdk_repo, str(tmp_path / "mirrors"))
+    mirror.ensure("1.0.0")
+    git(git_repo, "tag", "-f", "v1.0.0", "v1.2.0")
+    git(git_repo, "push", "-q", "-f", sdk_repo, "refs/tags/v1.0.0")
+
+    assert mirror.update() == ["v1.0.0"]
+    assert git(mirror.path, "rev-parse", "v1.0.0^{commit}") == git(
+        sdk_repo, "rev-parse", "v1.2.0^{commit}"
+    )
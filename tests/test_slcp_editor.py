@@ -0,0 +1,112 @@
+import pytest
+
+from slcp_editor import remove_components
+
+
+def is_board(id_value):
+    return id_value.startswith("brd")
+
+
+def test_studio_flow_items():
+    text = (
+        "project_name: app\n"
+        "component:\n"
+        "- {id: brd4186c}\n"
+        "- {id: iostream_usart, instance: [vcom]}\n"
+        "- {from: simplicity_sdk, id: brd4002a}\n"
+        "define:\n"
+        "- {name: DEBUG_EFM}\n"
+    )
+    assert remove_components(text, is_board) == (
+        "project_name: app\n"
+        "component:\n"
+        "- {id: iostream_usart, instance: [vcom]}\n"
+        "define:\n"
+        "- {name: DEBUG_EFM}\n",
+        ["brd4186c", "brd4002a"],
+    )
+
+
+def test_instance_qualified_items():
+    text = (
+        "component:\n"
+        "- instance: [btn0, btn1]\n"
+        "  id: simple_button\n"
+        "- id: brd4186c_config\n"
+        "  instance: [board]\n"
+        "- {id: 'brd2703a', instance: [main]}\n"
+        "- {id: app_log}\n"
+    )
+    assert remove_components(text, is_board) == (
+        "component:\n"
+        "- instance: [btn0, btn1]\n"
+        "  id: simple_button\n"
+        "- {id: app_log}\n",
+        ["brd4186c_config", "brd2703a"],
+    )
+
+
+def test_comments_and_blank_lines_are_kept():
+    text = (
+        "# Project\n"
+        "component:  # components\n"
+        "# the board\n"
+        "- id: brd4186c  # radio board\n"
+        "  # indented under the item, removed with it\n"
+        "\n"
+        "# logging\n"
+        "- id: app_log\n"
+        "  # kept with its item\n"
+        "\n"
+        "configuration:\n"
+        "- {name: SL_STACK_SIZE, value: '2752'}  # stack\n"
+    )
+    assert remove_components(text, is_board) == (
+        "# Project\n"
+        "component:  # components\n"
+        "# the board\n"
+        "\n"
+        "# logging\n"
+        "- id: app_log\n"
+        "  # kept with its item\n"
+        "\n"
+        "configuration:\n"
+        "- {name: SL_STACK_SIZE, value: '2752'}  # stack\n",
+        ["brd4186c"],
+    )
+
+
+def test_crlf_line_endings_are_kept():
+    text = (
+        "component:\r\n"
+        "- instance: [vcom]\r\n"
+        "  id: brd_vcom\r\n"
+        "- id: brd4186c\r\n"
+        "- id: app_log\r\n"
+    )
+    assert remove_components(text, is_board) == (
+        "component:\r\n- id: app_log\r\n",
+        ["brd_vcom", "brd4186c"],
+    )
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "component: [{id: brd4186c}, {id: app_log}]\n",
+        "component:\n- {id: brd4186c}\n- [app_log]\n",
+        "component:\n- id:\n    brd4186c\n- id: app_log\n",
+        "component:\n- 'id': brd4186c\n- id: app_log\n",
+        "component:\n- instance: [board]\n  'id': brd4186c\n- id: app_log\n",
+    ],
+)
+def test_layouts_not_understood_fall_back_on_yaml(text):
+    from boardlessify import remove_slcp_components
+
+    pytest.importorskip("yaml")
+
+    assert remove_components(text, is_board) is None
+    cleaned_text, removed_ids = remove_slcp_components(text, is_board)
+    assert removed_ids == ["brd4186c"]
+    assert "brd4186c" not in cleaned_text
+    assert "app_log" in cleaned_text
@@ -0,0 +1,30 @@
+import pytest
+
+from bench_startup import HEAVY_MODULES, check, measure, parse_importtime
+
+
+def test_parse_importtime_keeps_top_level_modules():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       100 |        100 |   encodings.aliases\n"
+        "import time:       300 |        400 | site\n"
+        "import time:        50 |         50 |   fnmatch\n"
+        "import time:        70 |        120 | shutil\n"
+    )
+
+    assert parse_importtime(stderr) == {"shutil": 120}
+
+
+@pytest.mark.parametrize("args", list(HEAVY_MODULES))
+def test_fast_paths_do_not_import_heavy_modules(args):
+    _, _, imported = measure(args, runs=1)
+
+    assert not set(HEAVY_MODULES[args]) & imported
+
+
+def test_fast_paths_fit_a_budget():
+    # Twice the benchmark default for a shared test machine, the interpreter alone starts in about 15 ms.
+    # Import time varies less than wall time, --check importing shutil and importlib.util went over.
+    for args, wall_ms, import_ms, problems in check(budget_ms=100, runs=5):
+        assert not problems, f"{args}: {wall_ms:.1f} ms, {problems}"
+        assert import_ms < 12, f"{args}: {import_ms:.1f} ms importing"
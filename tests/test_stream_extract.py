@@ -0,0 +1,155 @@
+import hashlib
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from downloader import ConnectionPool, DownloadError
+from stream_extract import (
+    MARKER_NAME,
+    check_symlink,
+    download_and_extract,
+    strip_path,
+)
+
+
+def make_tar(members, mode="w:gz"):
+    """
+    Tar archive of (name, content) members, content None for a directory, ("link", target) for a
+    symlink, ("fifo", "") for a fifo and ("device", "") for a character device.
+    """
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode=mode) as tar_file:
+        for name, content in members:
+            info = tarfile.TarInfo(name)
+            if content is None:
+                info.type = tarfile.DIRTYPE
+                tar_file.addfile(info)
+            elif isinstance(content, tuple):
+                info.type = {
+                    "link": tarfile.SYMTYPE,
+                    "fifo": tarfile.FIFOTYPE,
+                    "device": tarfile.CHRTYPE,
+                }[content[0]]
+                info.linkname = content[1]
+                tar_file.addfile(info)
+            else:
+                info.size = len(content)
+                info.mode = 0o755
+                tar_file.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+TOOL = [
+    ("gcc-12/", None),
+    ("gcc-12/bin/gcc", b"#!/bin/sh\n"),
+    ("gcc-12/bin/cc", ("link", "gcc")),
+    ("gcc-12/lib/libc.a", b"x" * 100000),
+]
+
+
+def serve(server, name, data, sha256=True, strip_components=1):
+    server.files[name] = data
+    return {
+        "name": name,
+        "url": server.url(name),
+        "sha256": hashlib.sha256(data).hexdigest() if sha256 else None,
+        "extract": "gcc",
+        "strip_components": strip_components,
+    }
+
+
+@pytest.mark.parametrize("suffix, mode", [(".tar.gz", "w:gz"), (".tar.xz", "w:xz")])
+def test_archive_is_extracted_once(file_server, tmp_path, suffix, mode):
+    entry = serve(file_server, f"gcc{suffix}", make_tar(TOOL, mode))
+
+    result = download_and_extract(ConnectionPool(), entry, str(tmp_path))
+
+    assert result["status"] == "extracted"
+    assert sorted(os.listdir(tmp_path / "gcc")) == [MARKER_NAME, "bin", "lib"]
+    assert os.readlink(tmp_path / "gcc" / "bin" / "cc") == "gcc"
+    assert (tmp_path / "gcc" / MARKER_NAME).read_text() == entry["sha256"] + "\n"
+
+    again = download_and_extract(ConnectionPool(), entry, str(tmp_path))
+    assert again["status"] == "cached"
+    assert len(file_server.requests) == 1
+
+
+def test_new_pinned_hash_replaces_the_tree(file_server, tmp_path):
+    old = serve(file_server, "old.tar.gz", make_tar(TOOL + [("gcc-12/old", b"")]))
+    download_and_extract(ConnectionPool(), old, str(tmp_path))
+    new = serve(file_server, "new.tar.gz", make_tar(TOOL))
+
+    assert download_and_extract(ConnectionPool(), new, str(tmp_path))["status"] == (
+        "extracted"
+    )
+    assert not os.path.exists(tmp_path / "gcc" / "old")
+    assert sorted(os.listdir(tmp_path)) == ["gcc"]
+
+
+def test_mismatching_hash_leaves_the_destination_alone(file_server, tmp_path):
+    (tmp_path / "gcc").mkdir()
+    (tmp_path / "gcc" / "kept").write_text("")
+    entry = dict(serve(file_server, "gcc.tar.gz", make_tar(TOOL)), sha256="0" * 64)
+
+    with pytest.raises(DownloadError, match="does not match"):
+        download_and_extract(ConnectionPool(), entry, str(tmp_path))
+    assert os.listdir(tmp_path / "gcc") == ["kept"]
+    assert sorted(os.listdir(tmp_path)) == ["gcc"]
+
+
+@pytest.mark.parametrize("name", ["../evil", "/tmp/evil", "a/../../evil", "C:/evil"])
+def test_unsafe_paths_are_refused(name):
+    with pytest.raises(DownloadError):
+        strip_path(name, 0)
+
+
+def test_strip_path():
+    assert strip_path("./gcc-12/bin/gcc", 1) == "bin/gcc"
+    assert strip_path("gcc-12/", 1) is None
+
+
+@pytest.mark.parametrize("target", ["../../evil", "/etc", "../.."])
+def test_symlinks_out_of_the_tree_are_refused(target):
+    with pytest.raises(DownloadError):
+        check_symlink("bin/cc", target)
+    check_symlink("bin/cc", "../lib/libc.a")
+
+
+@pytest.mark.parametrize("data_filter", [True, False])
+@pytest.mark.parametrize(
+    "member",
+    [
+        ("../evil", b"evil"),
+        ("gcc-12/escape", ("link", "../../..")),
+        ("/evil", b"x"),
+        ("gcc-12/pipe", ("fifo", "")),
+        ("gcc-12/null", ("device", "")),
+    ],
+)
+def test_unsafe_members_are_refused(
+    file_server, tmp_path, monkeypatch, member, data_filter
+):
+    if not data_filter:
+        monkeypatch.delattr(tarfile, "data_filter", raising=False)
+    entry = serve(file_server, "evil.tar.gz", make_tar([member]), strip_components=0)
+    dest_dir = tmp_path / "dest"
+
+    with pytest.raises(DownloadError, match="Unsafe"):
+        download_and_extract(ConnectionPool(), entry, str(dest_dir))
+    assert sorted(os.listdir(tmp_path)) == ["dest"]
+    assert os.listdir(dest_dir) == []
+
+
+@pytest.mark.parametrize("name", ["../evil", "/evil"])
+def test_unsafe_zip_is_refused(file_server, tmp_path, name):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zip_file:
+        zip_file.writestr(name, "evil")
+    entry = serve(file_server, "evil.zip", buffer.getvalue(), strip_components=0)
+
+    with pytest.raises(DownloadError, match="Unsafe"):
+        download_and_extract(ConnectionPool(), entry, str(tmp_path / "dest"))
+    assert sorted(os.listdir(tmp_path)) == ["dest"]
@@ -0,0 +1,49 @@
+import pytest
+
+from target_configs import parse_configs
+
+
+@pytest.mark.parametrize(
+    "text, value",
+    [
+        ("10", 10),
+        ("0x1F", 31),
+        ("0X1f", 31),
+        ("010", 8),
+        ("0", 0),
+        ("00", 0),
+        ("-010", -8),
+        ("+12", 12),
+        ("08", "08"),
+        ("0x", "0x"),
+        ("SL_VALUE", "SL_VALUE"),
+    ],
+)
+def test_integer_values_follow_c(text, value):
+    assert parse_configs(f"A:{text}")["A"] == value
+
+
+def test_octal_and_decimal_values_are_not_confused():
+    assert parse_configs("A:010").canonical() == "A:8"
+    assert parse_configs("A:010").target_hash("x") != parse_configs("A:10").target_hash(
+        "x"
+    )
+    assert parse_configs("A:010").target_hash("x") == parse_configs(
+        "A:0x8"
+    ).target_hash("x")
+
+
+def test_canonical_form_ignores_order_and_spelling():
+    config = parse_configs("B:0x10, A:1")
+
+    assert config.configuration() == "B:0x10,A:1"
+    assert config.canonical() == "A:1,B:16"
+    assert config.target_hash("EFR32MG24") == parse_configs("A:1,B:16").target_hash(
+        "efr32mg24"
+    )
+
+
+@pytest.mark.parametrize("configs", ["A", "A:1,A:2", "1A:1", "A:has space"])
+def test_malformed_configs_are_rejected(configs):
+    with pytest.raises(ValueError):
+        parse_configs(configs)
@@ -0,0 +1,108 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from build_scheduler import BuildHistory
+from conftest import ROOT_DIR, git, write_file
+from target_matrix import target_key
+from target_selector import LastGoodState
+
+# As in the matrix: normalised path, configs as written in target_info.yaml
+MATRIX_KEY = target_key("app/app.slcp", "EFR32MG24B310F1536IM48", "A:1,B:16")
+
+
+def run_script(name, *args, cwd=None):
+    return subprocess.run(
+        [sys.executable, os.path.join(ROOT_DIR, name), *args],
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+
+def test_key_ignores_path_spelling_and_config_order():
+    assert target_key("./app/../app/app.slcp", "OPN", "B:0x10, A:01") == target_key(
+        "app/app.slcp", "OPN", "A:1,B:16"
+    )
+    assert target_key("app.slcp", "OPN", "A:010") != target_key(
+        "app.slcp", "OPN", "A:10"
+    )
+    with pytest.raises(ValueError):
+        target_key("app.slcp", "OPN", "A")
+
+
+def test_recorded_durations_use_the_matrix_key(tmp_path):
+    history_file = str(tmp_path / "history.json")
+
+    result = run_script(
+        "build_scheduler.py",
+        "--history",
+        history_file,
+        "record",
+        "--slcp",
+        "./app//app.slcp",
+        "--target",
+        "EFR32MG24B310F1536IM48",
+        "--configs",
+        "B:0x10,A:1",
+        "--step",
+        "cmake",
+        "--seconds",
+        "12.5",
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert BuildHistory(history_file).targets == {MATRIX_KEY: {"cmake": [12.5]}}
+
+
+def test_malformed_configs_are_not_recorded(tmp_path):
+    history_file = str(tmp_path / "history.json")
+    result = run_script(
+        "build_scheduler.py",
+        "--history",
+        history_file,
+        "time",
+        "--slcp",
+        "app.slcp",
+        "--target",
+        "OPN",
+        "--configs",
+        "A",
+        "--step",
+        "cmake",
+        "--",
+        "true",
+    )
+
+    assert result.returncode == 1
+    assert "Error parsing configs" in result.stderr
+    assert not os.path.exists(history_file)
+
+
+def test_mark_good_uses_the_matrix_key(git_repo, tmp_path):
+    write_file(os.path.join(git_repo, "app", "app.slcp"), "project_name: app\n")
+    git(git_repo, "add", "-A")
+    git(git_repo, "commit", "-q", "-m", "app")
+    state_file = str(tmp_path / "state.json")
+
+    result = run_script(
+        "target_selector.py",
+        "--state",
+        state_file,
+        "mark-good",
+        "--slcp",
+        "./app/app.slcp",
+        "--target",
+        "EFR32MG24B310F1536IM48",
+        "--configs",
+        "B:16, A:0x1",
+        cwd=git_repo,
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert LastGoodState(state_file).targets == {
+        MATRIX_KEY: git(git_repo, "rev-parse", "HEAD").strip()
+    }
@@ -0,0 +1,127 @@
+import json
+import os
+
+import pytest
+
+from conftest import write_file
+from target_matrix import build_matrix, flatten_matrix, load_matrix, load_targets
+
+pytest.importorskip("yaml")
+
+TOOLCHAINS = {
+    "gecko_sdk": {"v4.4.0": {"gcc": "12.2.Rel1"}, "v4.4.5": {"gcc": "12.2.Rel1"}},
+    "simplicity_sdk": {"v2024.6.2": {"gcc": "12.2.Rel1"}},
+}
+TARGET_INFO = {
+    "targets": [
+        {"target_opn": "BRD4186C", "part": "EFR32MG24B210F1536IM48", "configs": ""},
+        {
+            "target_opn": "BRD4187C",
+            "part": "EFR32MG24B210F1536IM48",
+            "configs": "SL_BOARD_ENABLE_VCOM:1",
+        },
+        {"target_opn": "EFR32BG22C224F512IM40", "configs": "A:0x10,B:1"},
+    ]
+}
+
+
+def project(name, sdk_id="simplicity_sdk", sdk_version="2024.6.2"):
+    return f"{name}/{name}.slcp", {"sdk": {"id": sdk_id, "version": sdk_version}}
+
+
+def test_targets_sharing_sdk_toolchain_and_part_share_a_shard():
+    projects = [
+        project("app_a"),
+        project("app_b"),
+        project("app_c", "gecko_sdk", "4.4.2"),
+    ]
+    matrix = build_matrix(projects, load_targets(TARGET_INFO), TOOLCHAINS)
+
+    shards = {shard["shard"]: shard for shard in matrix["include"]}
+    assert sorted(shards) == [
+        "gecko_sdk-4.4.2-gcc12.2.Rel1-efr32bg22c224f512im40",
+        "gecko_sdk-4.4.2-gcc12.2.Rel1-efr32mg24b210f1536im48",
+        "simplicity_sdk-2024.6.2-gcc12.2.Rel1-efr32bg22c224f512im40",
+        "simplicity_sdk-2024.6.2-gcc12.2.Rel1-efr32mg24b210f1536im48",
+    ]
+    mg24 = shards["simplicity_sdk-2024.6.2-gcc12.2.Rel1-efr32mg24b210f1536im48"]
+    assert [(t["slcp"], t["target_opn"]) for t in mg24["targets"]] == [
+        ("app_a/app_a.slcp", "BRD4186C"),
+        ("app_a/app_a.slcp", "BRD4187C"),
+        ("app_b/app_b.slcp", "BRD4186C"),
+        ("app_b/app_b.slcp", "BRD4187C"),
+    ]
+    assert mg24["targets"][1]["configs"] == "SL_BOARD_ENABLE_VCOM:1"
+
+    # Every (project, target) pair is built once, in exactly one shard
+    pairs = [
+        (entry["slcp"], entry["target_opn"])
+        for entry in flatten_matrix(matrix)["include"]
+    ]
+    assert len(pairs) == len(set(pairs)) == len(projects) * len(TARGET_INFO["targets"])
+    for entry in flatten_matrix(matrix)["include"]:
+        assert entry["shard"].startswith(f"{entry['sdk_id']}-{entry['sdk_version']}-")
+
+
+def test_configs_are_validated_and_kept_as_written():
+    targets = load_targets(TARGET_INFO)
+    assert targets[2]["configs"].configuration() == "A:0x10,B:1"
+    assert targets[0]["part"] == "EFR32MG24B210F1536IM48"
+    assert targets[2]["part"] is None
+
+
+@pytest.mark.parametrize(
+    "target_info, message",
+    [
+        ({}, "must contain a 'targets' list"),
+        ({"targets": "BRD4186C"}, "must contain a 'targets' list"),
+        ({"targets": [{"configs": "A:1"}]}, "targets[0]: missing 'target_opn'"),
+        ({"targets": [{"target_opn": "X", "configs": "A"}]}, "targets[0] (X)"),
+        ({"targets": [{"target_opn": "X", "configs": "A:1,A:2"}]}, "targets[0] (X)"),
+    ],
+)
+def test_bad_or_missing_targets_raise(target_info, message):
+    with pytest.raises(ValueError) as error:
+        load_targets(target_info)
+    assert message in str(error.value)
+
+
+def test_every_invalid_target_is_reported():
+    with pytest.raises(ValueError) as error:
+        load_targets(
+            {"targets": [{}, {"target_opn": "OK"}, {"target_opn": "X", "configs": "A"}]}
+        )
+    assert str(error.value).count("\n") == 1
+
+
+def test_missing_toolchain_raises():
+    with pytest.raises(ValueError) as error:
+        build_matrix(
+            [project("app", "simplicity_sdk", "2025.6.0")],
+            load_targets(TARGET_INFO),
+            TOOLCHAINS,
+        )
+    assert "app/app.slcp: no toolchain listed for simplicity_sdk v2025.6.0" in str(
+        error.value
+    )
+    with pytest.raises(ValueError) as error:
+        build_matrix([("app.slcp", {})], load_targets(TARGET_INFO), TOOLCHAINS)
+    assert "missing 'sdk'" in str(error.value)
+
+
+def test_load_matrix_from_files(tmp_path):
+    import yaml
+
+    target_info_file = str(tmp_path / "target_info.yaml")
+    toolchain_file = str(tmp_path / "toolchains.yml")
+    slcp_file = str(tmp_path / "app" / "app.slcp")
+    write_file(target_info_file, yaml.safe_dump(TARGET_INFO))
+    write_file(toolchain_file, yaml.safe_dump(TOOLCHAINS))
+    write_file(slcp_file, "sdk: {id: gecko_sdk, version: 4.4.5}\n")
+
+    matrix = load_matrix(target_info_file, toolchain_file, [slcp_file])
+    assert [len(shard["targets"]) for shard in matrix["include"]] == [2, 1]
+    assert json.loads(json.dumps(matrix)) == matrix
+    assert {entry["slcp"] for entry in flatten_matrix(matrix)["include"]} == {
+        os.path.normpath(slcp_file).replace(os.sep, "/")
+    }
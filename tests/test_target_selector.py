@@ -0,0 +1,96 @@
+import pytest
+
+from target_matrix import project_paths, target_key
+from target_selector import affected_entries
+
+pytest.importorskip("yaml")
+
+SLCP = """project_name: {name}
+source:
+- {{path: app.c}}
+- {{path: ../common/shared.c}}
+include:
+- path: ../common/inc
+  file_list:
+  - {{path: shared.h}}
+config_file:
+- {{path: ../config/{name}_config.h}}
+"""
+TARGETS = {
+    "app_a/app_a.slcp": ["EFR32MG24B310F1536IM48", "EFR32BG22C224F512IM40"],
+    "app_b/app_b.slcp": ["EFR32MG21A020F1024IM32"],
+}
+
+
+@pytest.fixture
+def entries(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    entries = {}
+    for slcp, opns in TARGETS.items():
+        name = slcp.split("/")[0]
+        (tmp_path / name).mkdir()
+        (tmp_path / slcp).write_text(
+            SLCP.format(name=name) if name == "app_a" else f"project_name: {name}\n"
+        )
+        for opn in opns:
+            entries[target_key(slcp, opn)] = {
+                "slcp": slcp,
+                "target_opn": opn,
+                "configs": "",
+            }
+    return entries
+
+
+def selected_targets(entries, *paths):
+    affected = affected_entries(".", entries, "base", "head", list(paths))
+    return sorted({entries[key]["target_opn"] for key in affected})
+
+
+def test_project_paths_resolve_entries_outside_the_project():
+    assert project_paths("app_a/app_a.slcp", {"source": [{"path": "../x/./y.c"}]}) == [
+        "x/y.c"
+    ]
+    assert project_paths(
+        "app_a/app_a.slcp",
+        {
+            "include": [{"path": "inc"}],
+            "config_file": [{"path": "config/c.h"}],
+            "component": [{"id": "x"}],
+        },
+    ) == ["app_a/config/c.h", "app_a/inc/"]
+
+
+def test_files_a_project_builds_from_outside_its_directory(entries):
+    assert selected_targets(entries, "common/shared.c") == sorted(
+        TARGETS["app_a/app_a.slcp"]
+    )
+    assert selected_targets(entries, "common/inc/other.h") == sorted(
+        TARGETS["app_a/app_a.slcp"]
+    )
+    assert selected_targets(entries, "config/app_a_config.h") == sorted(
+        TARGETS["app_a/app_a.slcp"]
+    )
+
+
+def test_files_of_no_project_select_every_target(entries):
+    everything = sorted(opn for opns in TARGETS.values() for opn in opns)
+
+    assert selected_targets(entries, "common/unused.c") == everything
+    assert selected_targets(entries, "config/app_b_config.h") == everything
+
+
+def test_project_and_target_directories(entries):
+    assert selected_targets(entries, "app_b/main.c") == ["EFR32MG21A020F1024IM32"]
+    assert selected_targets(entries, "app_a/efr32bg22c224f512im40/board.h") == [
+        "EFR32BG22C224F512IM40"
+    ]
+    assert selected_targets(entries, "app_a/README.md", "docs/guide.md") == []
+
+
+def test_selector_benchmark():
+    from bench_selector import run
+
+    results = run(commits=300, projects=3, depths=(1, 299))
+
+    assert results[1][1] <= 3
+    assert results[299][1:] == (9, 9)
@@ -0,0 +1,197 @@
+import io
+import os
+import stat
+import tarfile
+import threading
+import time
+import zipfile
+
+import pytest
+
+import tool_cache
+from cache_utils import format_size, parse_size
+from conftest import write_file
+from tool_cache import ToolCache, extract_archive
+
+
+def test_sizes():
+    assert parse_size("500M") == 500 << 20
+    assert parse_size("1.5gb") == 3 << 29
+    assert parse_size("1024") == 1024
+    assert format_size(3 << 29) == "1.5GB"
+
+
+def write_zip(path, members):
+    with zipfile.ZipFile(path, "w") as zip_file:
+        for name, mode, data in members:
+            info = zipfile.ZipInfo(name)
+            info.external_attr = mode << 16
+            zip_file.writestr(info, data)
+
+
+def test_zip_keeps_modes_and_symlinks(tmp_path):
+    archive = str(tmp_path / "tool.zip")
+    write_zip(
+        archive,
+        [
+            ("tool/bin/run", stat.S_IFREG | 0o755, "#!/bin/sh\n"),
+            ("tool/bin/latest", stat.S_IFLNK | 0o777, "run"),
+        ],
+    )
+    destination = str(tmp_path / "out")
+
+    extract_archive(archive, destination)
+
+    assert os.readlink(os.path.join(destination, "tool/bin/latest")) == "run"
+    assert os.stat(os.path.join(destination, "tool/bin/run")).st_mode & 0o777 == 0o755
+
+
+def test_tar_keeps_modes_and_symlinks(tmp_path):
+    archive = str(tmp_path / "tool.tar.gz")
+    with tarfile.open(archive, "w:gz") as tar_file:
+        info = tarfile.TarInfo("tool/bin/run")
+        info.mode = 0o755
+        info.size = 3
+        tar_file.addfile(info, io.BytesIO(b"run"))
+        link = tarfile.TarInfo("tool/bin/latest")
+        link.type = tarfile.SYMTYPE
+        link.linkname = "run"
+        tar_file.addfile(link)
+    destination = str(tmp_path / "out")
+
+    extract_archive(archive, destination)
+
+    assert os.readlink(os.path.join(destination, "tool/bin/latest")) == "run"
+    assert os.stat(os.path.join(destination, "tool/bin/run")).st_mode & 0o777 == 0o755
+
+
+def test_unsafe_archive_is_rejected(tmp_path):
+    archive = str(tmp_path / "evil.zip")
+    write_zip(archive, [("../evil", stat.S_IFREG | 0o644, "x")])
+
+    with pytest.raises(ValueError):
+        extract_archive(archive, str(tmp_path / "out"))
+    assert not os.path.exists(tmp_path / "evil")
+
+
+@pytest.fixture
+def remote(tmp_path):
+    """
+    Directory remote holding gcc 12.2 unpacked, the same tree as 12.3, and zap as a wrapped archive.
+    """
+    remote = str(tmp_path / "remote")
+    for version in ("12.2", "12.3"):
+        write_file(os.path.join(remote, "gcc", version, "bin", "gcc"), "#!/bin/sh\n")
+        os.chmod(os.path.join(remote, "gcc", version, "bin", "gcc"), 0o755)
+        os.symlink("gcc", os.path.join(remote, "gcc", version, "bin", "cc"))
+    write_file(os.path.join(remote, "gcc", "13.1", "bin", "gcc"), "13\n")
+    os.makedirs(os.path.join(remote, "zap"))
+    with tarfile.open(os.path.join(remote, "zap", "v1.tar.gz"), "w:gz") as tar_file:
+        info = tarfile.TarInfo("zap-v1/zap")
+        info.size = 3
+        tar_file.addfile(info, io.BytesIO(b"zap"))
+    return remote
+
+
+def read(path):
+    with open(path) as file:
+        return file.read()
+
+
+def test_get_fetches_once_then_hits(tmp_path, remote):
+    cache = ToolCache(str(tmp_path / "cache"))
+    path, hit = cache.get("gcc", "12.2", remote)
+    assert not hit
+    assert read(os.path.join(path, "bin", "gcc")) == "#!/bin/sh\n"
+    assert os.readlink(os.path.join(path, "bin", "cc")) == "gcc"
+    assert cache.get("gcc", "12.2", remote) == (path, True)
+
+    path, hit = cache.get("zap", "v1", remote)
+    assert read(os.path.join(path, "zap")) == "zap"
+    with pytest.raises(FileNotFoundError):
+        cache.get("gcc", "9.9", remote)
+
+
+def test_identical_trees_are_stored_once(tmp_path, remote):
+    cache = ToolCache(str(tmp_path / "cache"))
+    path, _ = cache.get("gcc", "12.2", remote)
+    assert cache.get("gcc", "12.3", remote) == (path, False)
+    assert cache.get("gcc", "13.1", remote)[0] != path
+    assert len(os.listdir(cache.objects_dir)) == 2
+    assert os.listdir(cache.staging_dir) == []
+
+
+def test_stored_trees_are_read_only(tmp_path, remote):
+    cache = ToolCache(str(tmp_path / "cache"))
+    path, _ = cache.get("gcc", "12.2", remote)
+    for mode in (
+        os.stat(path).st_mode,
+        os.stat(os.path.join(path, "bin")).st_mode,
+        os.stat(os.path.join(path, "bin", "gcc")).st_mode,
+    ):
+        assert mode & 0o222 == 0
+    assert os.stat(os.path.join(path, "bin", "gcc")).st_mode & 0o777 == 0o555
+
+
+def test_concurrent_misses_fetch_once(tmp_path, remote, monkeypatch):
+    fetches = []
+
+    def slow_fetch(*args):
+        fetches.append(args[:3])
+        time.sleep(0.1)
+        return fetch(*args)
+
+    fetch = tool_cache.fetch_from_remote
+    monkeypatch.setattr(tool_cache, "fetch_from_remote", slow_fetch)
+    # Each runner has its own instance, the locks are files shared by all of them
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(
+                ToolCache(str(tmp_path / "cache")).get("gcc", "12.2", remote)
+            )
+        )
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(fetches) == 1
+    assert len({path for path, _ in results}) == 1
+    assert sorted(hit for _, hit in results) == [False, True, True, True]
+
+
+def test_evict_drops_least_recently_used(tmp_path, remote):
+    cache = ToolCache(str(tmp_path / "cache"))
+    shared, _ = cache.get("gcc", "12.2", remote)
+    cache.get("gcc", "12.3", remote)
+    other, _ = cache.get("gcc", "13.1", remote)
+    zap, _ = cache.get("zap", "v1", remote)
+    now = time.time()
+    for age, (tool, version) in enumerate(
+        [("zap", "v1"), ("gcc", "13.1"), ("gcc", "12.3"), ("gcc", "12.2")]
+    ):
+        used = now - 7200 * (age + 1)
+        os.utime(cache._ref_path(tool, version), (used, used))
+    # Used within the hour, whatever the size
+    os.utime(cache._ref_path("zap", "v1"))
+
+    assert cache.evict(0) == [("gcc", "12.2"), ("gcc", "12.3"), ("gcc", "13.1")]
+    assert not os.path.exists(shared) and not os.path.exists(other)
+    assert os.path.isdir(zap)
+    assert [entry[:2] for entry in cache.entries()] == [("zap", "v1")]
+
+
+def test_evict_keeps_trees_still_referenced(tmp_path, remote):
+    cache = ToolCache(str(tmp_path / "cache"))
+    shared, _ = cache.get("gcc", "12.2", remote)
+    cache.get("gcc", "12.3", remote)
+    old = time.time() - 7200
+    os.utime(cache._ref_path("gcc", "12.2"), (old, old))
+    size = cache.entries()[0][3]
+
+    # Dropping 12.2 frees nothing while 12.3 uses the same tree
+    assert cache.evict(size - 1, min_idle=3600) == [("gcc", "12.2")]
+    assert os.path.isdir(shared)
+    assert cache.get("gcc", "12.3", remote) == (shared, True)
@@ -0,0 +1,121 @@
+import json
+import os
+
+import pytest
+
+from conftest import ROOT_DIR, write_file
+from toolchain_resolver import (
+    TOOLCHAIN_FILE,
+    ToolchainResolver,
+    compile_ranges,
+    load_resolver,
+    version_key,
+)
+
+pytest.importorskip("yaml")
+
+
+@pytest.fixture(scope="module")
+def resolver(tmp_path_factory):
+    """
+    Resolver of the toolchain file of the repository.
+    """
+    return load_resolver(
+        os.path.join(ROOT_DIR, TOOLCHAIN_FILE), str(tmp_path_factory.mktemp("cache"))
+    )
+
+
+@pytest.mark.parametrize(
+    "sdk_id, sdk_version, gcc",
+    [
+        # Listed releases
+        ("gecko_sdk", "4.4.0", "12.2.Rel1"),
+        ("gecko_sdk", "v3.2.3", "10.2.0"),
+        ("simplicity_sdk", "2024.6.2", "12.2.Rel1"),
+        # Later patch releases of the last listed minor version
+        ("gecko_sdk", "4.4.99", "12.2.Rel1"),
+        ("simplicity_sdk", "2024.6.3", "12.2.Rel1"),
+        ("gecko_sdk", "3.1.3", "7.2.1"),
+        # Unlisted versions between two listed ones with the same toolchains
+        ("gecko_sdk", "2.8.0", "7.2.1"),
+        ("gecko_sdk", "2.7", "7.2.1"),
+        # Pre-releases resolve like their release
+        ("simplicity_sdk", "2024.6.2-rc1", "12.2.Rel1"),
+        ("gecko_sdk", "4.4.0-beta.1", "12.2.Rel1"),
+        ("gecko_sdk", "4.4.99-rc1", "12.2.Rel1"),
+        # Newer minor versions, gaps between different toolchains, unknown SDKs
+        ("gecko_sdk", "4.5.0", None),
+        ("gecko_sdk", "4.5.0-rc1", None),
+        ("simplicity_sdk", "2024.12.0", None),
+        ("simplicity_sdk", "2025.6.0", None),
+        ("gecko_sdk", "3.3.0", None),
+        ("gecko_sdk", "0.9.0", None),
+        ("wiseconnect", "3.0.0", None),
+    ],
+)
+def test_lookup(resolver, sdk_id, sdk_version, gcc):
+    assert resolver.lookup(sdk_id, sdk_version) == gcc
+
+
+def test_resolve_returns_the_listed_range(resolver):
+    tools, listed = resolver.resolve("gecko_sdk", "4.4.99")
+    assert tools == {"gcc": "12.2.Rel1", "iar": "9.40.1"}
+    assert listed == ("4.4.0", "4.4.5")
+    assert resolver.lookup("gecko_sdk", "4.4.99", "iar") == "9.40.1"
+    assert resolver.resolve("gecko_sdk", "4.5.0") == (None, None)
+
+
+def test_versions_sort_numerically_with_pre_releases_first():
+    versions = ["4.10.0", "4.4.0", "4.4", "4.4.0-rc1", "v4.9.1", "2024.6.0"]
+    assert sorted(versions, key=version_key) == [
+        "4.4.0-rc1",
+        "4.4.0",
+        "4.4",
+        "v4.9.1",
+        "4.10.0",
+        "2024.6.0",
+    ]
+    for version in ("", "4.x", "4.4.0 beta"):
+        with pytest.raises(ValueError):
+            version_key(version)
+
+
+def test_ranges_group_consecutive_releases_with_the_same_tools():
+    compiled = compile_ranges(
+        {
+            "sdk": {
+                "v1.0.0": {"gcc": "a"},
+                "v1.10.0": {"gcc": "a"},
+                "v1.2.0": {"gcc": "b"},
+                "v1.3.0": {"gcc": "b"},
+            }
+        }
+    )
+    assert [entry[2:] for entry in compiled["sdk"]] == [
+        ["1.0.0", "1.0.0", {"gcc": "a"}],
+        ["1.2.0", "1.3.0", {"gcc": "b"}],
+        ["1.10.0", "1.10.0", {"gcc": "a"}],
+    ]
+    resolver = ToolchainResolver(compiled)
+    assert resolver.lookup("sdk", "1.1.0") is None
+    assert resolver.lookup("sdk", "1.2.5") == "b"
+    assert resolver.lookup("sdk", "1.10.3") == "a"
+
+
+def test_compiled_ranges_are_reused_until_the_file_changes(tmp_path):
+    toolchain_file = str(tmp_path / "toolchains.yml")
+    cache_dir = str(tmp_path / "cache")
+    write_file(toolchain_file, "sdk:\n  v1.0.0:\n    gcc: a\n")
+    assert load_resolver(toolchain_file, cache_dir).lookup("sdk", "1.0.1") == "a"
+    (compiled_file,) = os.listdir(cache_dir)
+
+    # The compiled file is what is read while the source is unchanged
+    compiled_file = os.path.join(cache_dir, compiled_file)
+    with open(compiled_file) as file:
+        compiled = json.load(file)
+    compiled["sdks"]["sdk"][0][4]["gcc"] = "cached"
+    write_file(compiled_file, json.dumps(compiled))
+    assert load_resolver(toolchain_file, cache_dir).lookup("sdk", "1.0.1") == "cached"
+
+    write_file(toolchain_file, "sdk:\n  v1.0.0:\n    gcc: bb\n")
+    assert load_resolver(toolchain_file, cache_dir).lookup("sdk", "1.0.1") == "bb"
@@ -0,0 +1,35 @@
+import pytest
+
+yaml = pytest.importorskip("yaml")
+
+import yaml_io  # noqa: E402
+from bench_yaml import generate_slcp, run, yaml_implementations  # noqa: E402
+
+
+def test_fallback_to_pure_python_without_libyaml(monkeypatch):
+    monkeypatch.delattr(yaml, "CSafeLoader", raising=False)
+    monkeypatch.setattr(yaml_io, "_loader", None)
+    monkeypatch.setattr(yaml_io, "_dumper", None)
+
+    assert yaml_io.yaml_backend_name() == "pure Python (SafeLoader/SafeDumper)"
+    assert yaml_io.safe_load("a: [1, 2]\n") == {"a": [1, 2]}
+
+
+def test_implementations_agree_on_slcp_files():
+    text = generate_slcp(50)
+    results = {
+        name: yaml.dump(yaml.load(text, Loader=loader), Dumper=dumper, sort_keys=False)
+        for name, (loader, dumper) in yaml_implementations().items()
+    }
+
+    data = yaml_io.safe_load(text)
+    assert len(data["component"]) == 50
+    assert data["component"][0] == {"instance": ["inst0"], "id": "component_0"}
+    assert len(set(results.values())) == 1
+
+
+def test_yaml_benchmark():
+    results = run([10, 200], repeat=1)
+
+    assert sorted(results) == [10, 200]
+    assert "pure Python" in results[10]
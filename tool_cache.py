@@ -0,0 +1,351 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from cache_utils import (
+    atomic_write_json,
+    cache_root,
+    file_lock,
+    format_size,
+    parse_size,
+    read_json,
+    tree_digest,
+)
+
+# Archive formats the remote can hold a tool in, next to plain directories
+ARCHIVE_SUFFIXES = (".tar.xz", ".tar.gz", ".tgz", ".tar.bz2", ".tar", ".zip")
+# Entries used more recently than this are never evicted, a runner may still be building with them
+MIN_IDLE_SECONDS = 3600
+
+
+def extract_archive(archive, destination):
+    """
+    Function to unpack a tar or zip archive into destination, keeping file modes and symlinks, with the
+    same routines and checks as archives downloaded by downloader.py. Raises ValueError on a bad archive.
+    """
+    import tarfile
+    import zipfile
+
+    from stream_extract import DownloadError, extract_tar_stream, extract_zip
+
+    try:
+        if archive.endswith(".zip"):
+            extract_zip(archive, destination)
+            return
+        with open(archive, "rb") as file:
+            extract_tar_stream(file, "r:*", destination)
+    except (DownloadError, tarfile.TarError, zipfile.BadZipFile) as e:
+        raise ValueError(f"Cannot extract {archive}: {e}") from e
+
+
+def _single_top_level_dir(directory):
+    """
+    Function to return the only entry of directory when it is a directory, as archives of tool releases
+    usually wrap their content in one.
+    """
+    entries = os.listdir(directory)
+    if len(entries) == 1:
+        path = os.path.join(directory, entries[0])
+        if os.path.isdir(path) and not os.path.islink(path):
+            return path
+    return None
+
+
+def set_writable(root, writable):
+    """
+    Function to add or remove the write permission of every file and directory of a tree, symlinks aside.
+    """
+    for directory, dirs, files in os.walk(root):
+        for name in [""] + dirs + files:
+            path = os.path.join(directory, name) if name else directory
+            if os.path.islink(path):
+                continue
+            mode = os.lstat(path).st_mode
+            os.chmod(path, mode | 0o200 if writable else mode & ~0o222)
+
+
+def remove_tree(root):
+    """
+    Function to delete a stored tree, whose directories are read-only.
+    """
+    set_writable(root, True)
+    shutil.rmtree(root)
+
+
+def fetch_from_remote(remote, tool, version, staging):
+    """
+    Function to copy a tool from a remote directory into staging, from either <remote>/<tool>/<version>/
+    or an archive <remote>/<tool>/<version><suffix>. Returns the root of the unpacked tree.
+    """
+    source = os.path.join(remote, tool, version)
+    if os.path.isdir(source):
+        tree = os.path.join(staging, "tree")
+        shutil.copytree(source, tree, symlinks=True)
+        return tree
+    for suffix in ARCHIVE_SUFFIXES:
+        if os.path.isfile(source + suffix):
+            tree = os.path.join(staging, "tree")
+            extract_archive(source + suffix, tree)
+            return _single_top_level_dir(tree) or tree
+    raise FileNotFoundError(f"{tool} {version} not found in {remote}")
+
+
+class ToolCache:
+    """
+    Content addressed store of unpacked tool trees (SDKs, toolchains, CLIs).
+    objects/<digest>/ holds each distinct tree once, refs/<tool>/<version>.json points at it and records
+    when it was last used, for LRU eviction.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or cache_root("tools")
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.refs_dir = os.path.join(self.root, "refs")
+        self.locks_dir = os.path.join(self.root, "locks")
+        self.staging_dir = os.path.join(self.root, "staging")
+        # Held while publishing and evicting, and shared by lookups, so that a tree is never removed
+        # between being looked up and being marked as used
+        self.store_lock = os.path.join(self.root, "store.lock")
+
+    def _ref_path(self, tool, version):
+        return os.path.join(self.refs_dir, tool, f"{version}.json")
+
+    def lookup(self, tool, version):
+        """
+        Function to return the path of a cached tool and mark it as used, or None on a miss.
+        """
+        ref_path = self._ref_path(tool, version)
+        with file_lock(self.store_lock, shared=True):
+            ref = read_json(ref_path)
+            if ref is None:
+                return None
+            path = os.path.join(self.objects_dir, ref["object"])
+            if not os.path.isdir(path):
+                return None
+            os.utime(ref_path)
+        return path
+
+    def publish(self, tool, version, tree):
+        """
+        Function to move an unpacked tree into the store and point tool/version at it.
+        A tree already stored under the same digest is reused, the new copy is left in staging.
+        Stored trees are read-only: workspaces link to them, a build writing into one would change the
+        tree of every runner using it.
+        """
+        digest, size = tree_digest(tree)
+        path = os.path.join(self.objects_dir, digest)
+        with file_lock(self.store_lock):
+            if not os.path.isdir(path):
+                os.makedirs(self.objects_dir, exist_ok=True)
+                # Same filesystem, so the whole tree appears at once
+                os.rename(tree, path)
+                set_writable(path, False)
+            atomic_write_json(
+                self._ref_path(tool, version),
+                {"tool": tool, "version": version, "object": digest, "size": size},
+            )
+        return path
+
+    def get(self, tool, version, remote):
+        """
+        Function to return the path of a tool, fetching it from the remote on a miss.
+        Runners missing the same tool at once wait for the first one instead of all fetching it.
+        """
+        path = self.lookup(tool, version)
+        if path is not None:
+            return path, True
+        with file_lock(os.path.join(self.locks_dir, f"{tool}-{version}.lock")):
+            path = self.lookup(tool, version)
+            if path is not None:
+                return path, True
+            os.makedirs(self.staging_dir, exist_ok=True)
+            staging = tempfile.mkdtemp(dir=self.staging_dir)
+            try:
+                tree = fetch_from_remote(remote, tool, version, staging)
+                return self.publish(tool, version, tree), False
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+
+    def entries(self):
+        """
+        Function to list the cached tools as (tool, version, object, size, last used) tuples.
+        """
+        entries = []
+        if not os.path.isdir(self.refs_dir):
+            return entries
+        for tool in sorted(os.listdir(self.refs_dir)):
+            tool_dir = os.path.join(self.refs_dir, tool)
+            for name in sorted(os.listdir(tool_dir)):
+                if not name.endswith(".json"):
+                    continue
+                ref_path = os.path.join(tool_dir, name)
+                ref = read_json(ref_path)
+                if ref is None:
+                    continue
+                entries.append(
+                    (
+                        ref["tool"],
+                        ref["version"],
+                        ref["object"],
+                        ref["size"],
+                        os.stat(ref_path).st_mtime,
+                    )
+                )
+        return entries
+
+    def evict(self, max_size, min_idle=MIN_IDLE_SECONDS):
+        """
+        Function to drop the least recently used tools until the store fits in max_size bytes.
+        Tools used within min_idle seconds are kept. Returns the evicted (tool, version) pairs.
+        """
+        evicted = []
+        with file_lock(self.store_lock):
+            entries = self.entries()
+            object_sizes = {entry[2]: entry[3] for entry in entries}
+            total = sum(object_sizes.values())
+            now = time.time()
+            for tool, version, digest, _, last_used in sorted(
+                entries, key=lambda entry: entry[4]
+            ):
+                if total <= max_size:
+                    break
+                if now - last_used < min_idle:
+                    continue
+                os.unlink(self._ref_path(tool, version))
+                evicted.append((tool, version))
+                # Trees shared by several versions only go with the last of them
+                if not any(
+                    entry[2] == digest and (entry[0], entry[1]) not in evicted
+                    for entry in entries
+                ):
+                    remove_tree(os.path.join(self.objects_dir, digest))
+                    total -= object_sizes[digest]
+            # Leftovers of interrupted fetches
+            if os.path.isdir(self.staging_dir):
+                for name in os.listdir(self.staging_dir):
+                    path = os.path.join(self.staging_dir, name)
+                    if now - os.stat(path).st_mtime > min_idle:
+                        shutil.rmtree(path, ignore_errors=True)
+        return evicted
+
+
+def resolve_project_tools(slcp_file, toolchain_file):
+    """
+    Function to return the (tool, version) pairs a project needs: its SDK from the .slcp and the GCC
+    version listed for that SDK in sdk_toolchain_dependencies.yml.
+    """
+    from target_matrix import load_yaml_file, lookup_toolchain, read_project_sdk
+
+    sdk_id, sdk_version = read_project_sdk(load_yaml_file(slcp_file))
+    gcc = lookup_toolchain(load_yaml_file(toolchain_file), sdk_id, sdk_version)
+    if gcc is None:
+        raise ValueError(f"No toolchain listed for {sdk_id} v{sdk_version}")
+    return [(sdk_id, sdk_version), ("gcc", gcc)]
+
+
+def link_tool(path, link):
+    """
+    Function to point link at a cached tree, replacing a previous link atomically.
+    """
+    temp_link = f"{link}.{os.getpid()}.tmp"
+    os.symlink(path, temp_link)
+    os.replace(temp_link, link)
+
+
+def main():
+    from target_matrix import TOOLCHAIN_FILE
+
+    parser = argparse.ArgumentParser(
+        description="Cache unpacked SDKs and tools, keyed by the versions the project needs."
+    )
+    parser.add_argument("--cache-dir", help="store location (default: in the cache)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    get_parser = subparsers.add_parser("get", help="print the path of a tool")
+    get_parser.add_argument("tool", help="e.g. gcc, simplicity_sdk, slc_cli")
+    get_parser.add_argument("version")
+    get_parser.add_argument("--link", help="symlink to point at the tool")
+
+    project_parser = subparsers.add_parser(
+        "project", help="fetch the SDK and GCC versions a project needs"
+    )
+    project_parser.add_argument("slcp", help="project file")
+    project_parser.add_argument("--toolchains", default=TOOLCHAIN_FILE)
+    project_parser.add_argument(
+        "--link-dir", help="directory to create '<tool>' symlinks in"
+    )
+
+    for subparser in (get_parser, project_parser):
+        subparser.add_argument(
+            "--remote",
+            required=True,
+            help="directory holding <tool>/<version>[.tar.xz]",
+        )
+        subparser.add_argument("--max-size", help="evict down to this size, e.g. 20G")
+
+    subparsers.add_parser("list", help="list the cached tools")
+    evict_parser = subparsers.add_parser("evict", help="drop least recently used tools")
+    evict_parser.add_argument("--max-size", required=True, help="e.g. 20G")
+    evict_parser.add_argument(
+        "--min-idle",
+        type=int,
+        default=MIN_IDLE_SECONDS,
+        help="keep tools used within this many seconds",
+    )
+    args = parser.parse_args()
+
+    cache = ToolCache(args.cache_dir)
+
+    if args.command == "list":
+        entries = cache.entries()
+        for tool, version, digest, size, last_used in entries:
+            used = time.strftime("%Y-%m-%d %H:%M", time.localtime(last_used))
+            print(
+                f"{tool} {version}: {format_size(size)}, last used {used}, {digest[:12]}"
+            )
+        total = sum({entry[2]: entry[3] for entry in entries}.values())
+        print(f"{len(entries)} tools, {format_size(total)}")
+        return
+
+    if args.command == "evict":
+        for tool, version in cache.evict(parse_size(args.max_size), args.min_idle):
+            print(f"Evicted {tool} {version}")
+        return
+
+    try:
+        if args.command == "get":
+            tools = [(args.tool, args.version)]
+        else:
+            tools = resolve_project_tools(args.slcp, args.toolchains)
+        for tool, version in tools:
+            start = time.monotonic()
+            path, hit = cache.get(tool, version, args.remote)
+            elapsed = time.monotonic() - start
+            print(
+                f"{tool} {version}: {'hit' if hit else 'fetched'} in {elapsed:.2f}s",
+                file=sys.stderr,
+            )
+            if args.command == "get":
+                if args.link:
+                    link_tool(path, args.link)
+                print(path)
+            elif args.link_dir:
+                os.makedirs(args.link_dir, exist_ok=True)
+                link_tool(path, os.path.join(args.link_dir, tool))
+                print(f"{tool}={path}")
+            else:
+                print(f"{tool}={path}")
+    except (OSError, ValueError) as e:
+        print(f"Error fetching tools: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.max_size:
+        for tool, version in cache.evict(parse_size(args.max_size)):
+            print(f"Evicted {tool} {version}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import argparse
+import os
+import re
+import sys
+from bisect import bisect_right
+
+from cache_utils import atomic_write_json, cache_root, read_json
+
+# Bumped whenever the layout of the compiled file changes
+COMPILED_FORMAT = 1
+TOOLCHAIN_FILE = os.path.join(".github", "sdk_toolchain_dependencies.yml")
+
+# Both "4.4.5" (gecko_sdk) and year based "2024.6.2" (simplicity_sdk) versions, with an optional pre-release
+VERSION = re.compile(r"v?(\d+(?:\.\d+)*)(?:-([0-9A-Za-z.-]+))?\Z")
+
+
+def version_key(version):
+    """
+    Function to turn a version string into a sortable (JSON friendly) list: numeric parts compared as
+    numbers, missing minor and patch as 0, and pre-releases sorted before their release.
+    Raises ValueError on anything else.
+    """
+    match = VERSION.match(str(version).strip())
+    if match is None:
+        raise ValueError(f"Invalid version '{version}'")
+    numbers = [int(part) for part in match.group(1).split(".")]
+    numbers += [0] * (3 - len(numbers))
+    prerelease = match.group(2)
+    return [numbers, 0, prerelease] if prerelease else [numbers, 1, ""]
+
+
+def compile_ranges(toolchains):
+    """
+    Function to compile the parsed sdk_toolchain_dependencies.yml into, for each SDK, the sorted list of
+    version ranges sharing the same toolchains: [first key, last key, first version, last version, tools].
+    """
+    compiled = {}
+    for sdk_id, releases in (toolchains or {}).items():
+        versions = sorted(
+            (version_key(version), str(version).lstrip("v"), dict(tools or {}))
+            for version, tools in (releases or {}).items()
+        )
+        ranges = []
+        for key, version, tools in versions:
+            if ranges and ranges[-1][4] == tools:
+                ranges[-1][1], ranges[-1][3] = key, version
+            else:
+                ranges.append([key, key, version, version, tools])
+        compiled[str(sdk_id)] = ranges
+    return compiled
+
+
+class ToolchainResolver:
+    """
+    SDK to toolchain versions, looked up by bisecting the compiled version ranges of the SDK.
+    """
+
+    def __init__(self, compiled):
+        self.ranges = compiled
+        self._starts = {
+            sdk_id: [entry[0] for entry in ranges]
+            for sdk_id, ranges in compiled.items()
+        }
+
+    def resolve(self, sdk_id, sdk_version):
+        """
+        Function to return the tools of an SDK version and the listed range it was resolved from.
+        Versions between two listed ones with the same toolchains resolve to them, as do later patch
+        releases of the last listed minor version. Pre-releases resolve like their release.
+        Returns (None, None) otherwise.
+        """
+        ranges = self.ranges.get(sdk_id)
+        if not ranges:
+            return None, None
+        key = [version_key(sdk_version)[0], 1, ""]
+        index = bisect_right(self._starts[sdk_id], key) - 1
+        if index < 0:
+            return None, None
+        _, last_key, first, last, tools = ranges[index]
+        if key <= last_key or key[0][:2] == last_key[0][:2]:
+            return tools, (first, last)
+        return None, None
+
+    def lookup(self, sdk_id, sdk_version, tool="gcc"):
+        tools, _ = self.resolve(sdk_id, sdk_version)
+        return str(tools[tool]) if tools and tools.get(tool) else None
+
+
+def load_resolver(toolchain_file=TOOLCHAIN_FILE, cache_dir=None):
+    """
+    Function to load the resolver of a toolchain file, from its compiled form on disk when the file did not
+    change (by mtime and size) since it was compiled.
+    """
+    info = os.stat(toolchain_file)
+    source = {"mtime_ns": info.st_mtime_ns, "size": info.st_size}
+    cache_dir = cache_dir or cache_root("toolchain_resolver")
+    name = re.sub(
+        r"[^A-Za-z0-9_.-]", "_", os.path.abspath(toolchain_file).strip(os.sep)
+    )
+    compiled_file = os.path.join(cache_dir, f"{name}.json")
+
+    data = read_json(compiled_file, {})
+    if data.get("format") == COMPILED_FORMAT and data.get("source") == source:
+        return ToolchainResolver(data["sdks"])
+
+    from yaml_io import safe_load
+
+    with open(toolchain_file, "r") as file:
+        compiled = compile_ranges(safe_load(file))
+    atomic_write_json(
+        compiled_file, {"format": COMPILED_FORMAT, "source": source, "sdks": compiled}
+    )
+    return ToolchainResolver(compiled)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Find the toolchain versions of an SDK release, including unlisted patch releases."
+    )
+    parser.add_argument("sdk_id", nargs="?", help="e.g. simplicity_sdk")
+    parser.add_argument("sdk_version", nargs="?", help="e.g. 2024.6.2")
+    parser.add_argument("--slcp", help="read the SDK id and version from a project")
+    parser.add_argument("--tool", default="gcc", help="gcc (default) or iar")
+    parser.add_argument("--toolchains", default=TOOLCHAIN_FILE)
+    parser.add_argument("--cache-dir", help="where to keep the compiled ranges")
+    parser.add_argument(
+        "--ranges", action="store_true", help="print the compiled ranges of every SDK"
+    )
+    args = parser.parse_args()
+
+    try:
+        resolver = load_resolver(args.toolchains, args.cache_dir)
+    except (OSError, ValueError) as e:
+        print(f"Error loading {args.toolchains}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.ranges:
+        for sdk_id, ranges in resolver.ranges.items():
+            for _, _, first, last, tools in ranges:
+                versions = first if first == last else f"{first} - {last}"
+                listed = ", ".join(
+                    f"{tool} {version}" for tool, version in tools.items()
+                )
+                print(f"{sdk_id} {versions}: {listed}")
+        return
+
+    if args.slcp:
+        from target_matrix import load_yaml_file, read_project_sdk
+
+        args.sdk_id, args.sdk_version = read_project_sdk(load_yaml_file(args.slcp))
+    if not args.sdk_id or not args.sdk_version:
+        parser.error("give an SDK id and version, or --slcp")
+
+    try:
+        tools, _ = resolver.resolve(args.sdk_id, args.sdk_version)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    if not tools or not tools.get(args.tool):
+        print(
+            f"No {args.tool} version known for {args.sdk_id} v{args.sdk_version}",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    print(tools[args.tool])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+_loader = None
+_dumper = None
+
+
+def _resolve_yaml_classes():
+    """
+    Function to pick the libyaml based CSafeLoader/CSafeDumper when PyYAML was built against libyaml,
+    and the pure Python SafeLoader/SafeDumper otherwise.
+    """
+    global _loader, _dumper
+    if _loader is None:
+        import yaml
+
+        try:
+            from yaml import CSafeDumper, CSafeLoader
+
+            _loader, _dumper = CSafeLoader, CSafeDumper
+        except ImportError:
+            _loader, _dumper = yaml.SafeLoader, yaml.SafeDumper
+    return _loader, _dumper
+
+
+def yaml_backend_name():
+    """
+    Function to describe the YAML implementation in use, for verbose output.
+    """
+    loader, dumper = _resolve_yaml_classes()
+    implementation = "libyaml" if loader.__name__.startswith("C") else "pure Python"
+    return f"{implementation} ({loader.__name__}/{dumper.__name__})"
+
+
+def safe_load(stream):
+    """
+    Function equivalent to yaml.safe_load, using libyaml when available.
+    """
+    import yaml
+
+    return yaml.load(stream, Loader=_resolve_yaml_classes()[0])
+
+
+def safe_dump(data, stream=None, **kwargs):
+    """
+    Function equivalent to yaml.safe_dump, using libyaml when available.
+    """
+    import yaml
+
+    return yaml.dump(data, stream, Dumper=_resolve_yaml_classes()[1], **kwargs)